@@ -1,27 +1,25 @@
 from fastapi import Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordBearer
-from jose import JWTError, jwt
-from sqlalchemy.orm import Session
-from db.session import get_db
-from db import models
-from utils.security import SECRET_KEY, ALGORITHM
+from jose import JWTError
+from services.user_cache import user_cache
+from utils.security import decode_access_token
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def get_current_user(token: str = Depends(oauth2_scheme)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
     try:
-        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        email: str = payload.get("sub")
-        if email is None:
-            raise credentials_exception
-    except JWTError:
+        payload = decode_access_token(token)
+        user_id = int(payload.get("sub"))
+    except (JWTError, TypeError, ValueError):
+        # Missing or non-numeric sub, e.g. tokens issued before subjects were user ids
         raise credentials_exception
-    user = db.query(models.User).filter(models.User.email == email).first()
+    # Primary-key lookup at most; cached with profile and active prompts, detached and shared
+    user = await user_cache.get_user(user_id)
     if user is None:
         raise credentials_exception
     return user
@@ -0,0 +1,60 @@
+import time
+import logging
+
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from services.metrics import http_request_duration, http_requests, http_requests_in_flight
+
+logger = logging.getLogger("synapse.access")
+
+
+class RequestMetricsMiddleware:
+    """
+    Per-route request count and latency, in-flight requests per method, plus
+    one structured access log line per request.
+
+    Pure ASGI rather than `@app.middleware("http")` so streamed responses are
+    timed until their last chunk and no body is buffered. Routes are labelled by
+    their template (`/papers/{paper_id}`), never the raw path, to keep label
+    cardinality bounded; the query string is left out of logs since it can carry
+    API keys. The route is only known once the router has dispatched, so the
+    in-flight gauge is per method.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status = 500
+        start = time.perf_counter()
+        http_requests_in_flight.inc(method=method)
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            duration = time.perf_counter() - start
+            route = getattr(scope.get("route"), "path", "unmatched")
+            http_requests_in_flight.dec(method=method)
+            http_requests.inc(method=method, route=route, status=status)
+            http_request_duration.observe(duration, method=method, route=route)
+            logger.info(
+                f"{method} {scope['path']} {status} {duration * 1000:.1f}ms",
+                extra={
+                    "method": method,
+                    "route": route,
+                    "path": scope["path"],
+                    "status": status,
+                    "duration_ms": round(duration * 1000, 2),
+                }
+            )
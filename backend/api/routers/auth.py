@@ -1,12 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from fastapi.security import OAuth2PasswordRequestForm
 from typing import Optional
 from pydantic import BaseModel
 from db.session import get_db
 from db import models
-from utils.security import get_password_hash, verify_password, create_access_token
-from datetime import timedelta
+from services.password_service import hash_password, verify_password
+from services.token_service import issue_tokens, rotate_refresh_token, revoke_refresh_token
 
 router = APIRouter(prefix="/auth", tags=["auth"])
 
@@ -19,39 +21,75 @@ class UserCreate(BaseModel):
 class Token(BaseModel):
     access_token: str
     token_type: str
+    refresh_token: str
+    expires_in: int # Access token lifetime in seconds
+
+class RefreshRequest(BaseModel):
+    refresh_token: str
+
+class LogoutRequest(BaseModel):
+    refresh_token: str
+    everywhere: bool = False
 
 @router.post("/signup", response_model=Token)
-def signup(user: UserCreate, db: Session = Depends(get_db)):
-    db_user = db.query(models.User).filter(models.User.email == user.email).first()
+async def signup(user: UserCreate, db: AsyncSession = Depends(get_db)):
+    db_user = await db.scalar(select(models.User).where(models.User.email == user.email))
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    hashed_password = get_password_hash(user.password)
-    db_user = models.User(email=user.email, hashed_password=hashed_password)
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
-
-    # Create Profile
-    db_profile = models.Profile(
-        user_id=db_user.id, 
-        full_name=user.full_name,
-        onboarding_data=user.onboarding_answers
+    # bcrypt is deliberately slow; it runs on the bounded hashing pool
+    hashed_password = await hash_password(user.password)
+    db_user = models.User(
+        email=user.email,
+        hashed_password=hashed_password,
+        # Inserted with the user in the same flush
+        profile=models.Profile(
+            full_name=user.full_name,
+            onboarding_data=user.onboarding_answers
+        )
     )
-    db.add(db_profile)
-    db.commit()
+    db.add(db_user)
+    await db.flush()
 
-    access_token = create_access_token(data={"sub": user.email})
-    return {"access_token": access_token, "token_type": "bearer"}
+    tokens = await issue_tokens(db, db_user)
+    await db.commit()
+    return tokens
 
 @router.post("/login", response_model=Token)
-def login(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.email == form_data.username).first()
-    if not user or not verify_password(form_data.password, user.hashed_password):
+async def login(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
+    # Profile feeds the access token claims
+    user = await db.scalar(
+        select(models.User).options(selectinload(models.User.profile)).where(models.User.email == form_data.username)
+    )
+    valid, new_hash = await verify_password(form_data.password, user.hashed_password) if user else (False, None)
+    if not valid:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    access_token = create_access_token(data={"sub": user.email})
-    return {"access_token": access_token, "token_type": "bearer"}
+    if new_hash:
+        # Stored hash predates the current BCRYPT_ROUNDS; upgrade it while we have the password
+        user.hashed_password = new_hash
+
+    tokens = await issue_tokens(db, user)
+    await db.commit()
+    return tokens
+
+@router.post("/refresh", response_model=Token)
+async def refresh(request: RefreshRequest, db: AsyncSession = Depends(get_db)):
+    # No password here: a valid refresh token is rotated for a new pair, so bcrypt only runs at login
+    tokens = await rotate_refresh_token(db, request.refresh_token)
+    if tokens is None:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Invalid or expired refresh token",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return tokens
+
+@router.post("/logout")
+async def logout(request: LogoutRequest, db: AsyncSession = Depends(get_db)):
+    # Access tokens are stateless and simply run out; logging out stops further refreshes
+    await revoke_refresh_token(db, request.refresh_token, everywhere=request.everywhere)
+    return {"message": "Logged out"}
@@ -1,13 +1,24 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
+import logging
+from fastapi import APIRouter, Depends, HTTPException, Request, status
+from sqlalchemy import or_, and_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import selectinload
 from typing import List, Optional
-from pydantic import BaseModel
-from db.session import get_db
-from db.models import User, ChatSession, ChatMessage
+from pydantic import BaseModel, Field
+from db.session import get_db, SessionLocal
+from db.models import User, ChatSession, ChatMessage, utcnow
 from api.deps import get_current_user
-from services.gemini_service import get_gemini_response
+from services.gemini_service import get_gemini_response, stream_gemini_response
+from utils.sse import sse_response
+from utils.disconnect import cancel_on_disconnect
+from utils.pagination import Page, DEFAULT_PAGE_SIZE, clamp_limit, encode_cursor, decode_cursor
+from services import library_search
+from services.chat_history import build_chat_history
+from services.retrieval_service import RAG_MAX_PAPERS
 import datetime
 
+logger = logging.getLogger(__name__)
+
 router = APIRouter(prefix="/chat", tags=["chat"])
 
 # Pydantic Models
@@ -16,7 +27,7 @@ class ChatSessionCreate(BaseModel):
 
 class MessageCreate(BaseModel):
     message: str
-    paper_ids: List[str] = []
+    paper_ids: List[str] = Field(default=[], max_length=RAG_MAX_PAPERS)
 
 class MessageResponse(BaseModel):
     id: int
@@ -27,21 +38,23 @@ class MessageResponse(BaseModel):
     class Config:
         from_attributes = True
 
-class ChatSessionResponse(BaseModel):
+class ChatSessionSummary(BaseModel):
     id: int
     title: str
     updated_at: datetime.datetime
-    messages: List[MessageResponse] = []
 
     class Config:
         from_attributes = True
 
+class ChatSessionResponse(ChatSessionSummary):
+    messages: List[MessageResponse] = []
+
 # Endpoints
 
 @router.post("/sessions", response_model=ChatSessionResponse)
 async def create_session(
     session: ChatSessionCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     db_session = ChatSession(
@@ -49,65 +62,114 @@ async def create_session(
         title=session.title
     )
     db.add(db_session)
-    db.commit()
-    db.refresh(db_session)
-    return db_session
+    await db.commit()
+    await db.refresh(db_session)
+    # A new session has no messages; don't touch the unloaded relationship
+    return {"id": db_session.id, "title": db_session.title, "updated_at": db_session.updated_at, "messages": []}
 
-@router.get("/sessions", response_model=List[ChatSessionResponse])
+@router.get("/sessions", response_model=Page[ChatSessionSummary])
 async def get_sessions(
-    db: Session = Depends(get_db),
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    sessions = db.query(ChatSession).filter(
-        ChatSession.user_id == current_user.id
-    ).order_by(ChatSession.updated_at.desc()).all()
-    return sessions
+    """Sidebar listing: most recently updated first, without messages."""
+    limit = clamp_limit(limit)
+    query = select(ChatSession).where(ChatSession.user_id == current_user.id)
+    if cursor:
+        updated_at, session_id = decode_cursor(cursor, datetime.datetime, int)
+        query = query.where(or_(
+            ChatSession.updated_at < updated_at,
+            and_(ChatSession.updated_at == updated_at, ChatSession.id < session_id)
+        ))
+    sessions = (await db.scalars(
+        query.order_by(ChatSession.updated_at.desc(), ChatSession.id.desc()).limit(limit + 1)
+    )).all()
+
+    next_cursor = None
+    if len(sessions) > limit:
+        sessions = sessions[:limit]
+        next_cursor = encode_cursor(sessions[-1].updated_at, sessions[-1].id)
+    return {"items": sessions, "next_cursor": next_cursor}
 
 @router.get("/sessions/{session_id}", response_model=ChatSessionResponse)
 async def get_session(
     session_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    session = db.query(ChatSession).filter(
+    session = await db.scalar(select(ChatSession).options(selectinload(ChatSession.messages)).where(
         ChatSession.id == session_id,
         ChatSession.user_id == current_user.id
-    ).first()
+    ))
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     return session
 
+@router.get("/sessions/{session_id}/messages", response_model=Page[MessageResponse])
+async def get_session_messages(
+    session_id: int,
+    limit: int = 50,
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Messages newest-first by page (each page in chronological order);
+    `next_cursor` loads the older page before it.
+    """
+    session_exists = await db.scalar(select(ChatSession.id).where(
+        ChatSession.id == session_id,
+        ChatSession.user_id == current_user.id
+    ))
+    if not session_exists:
+        raise HTTPException(status_code=404, detail="Session not found")
+
+    limit = clamp_limit(limit)
+    query = select(ChatMessage).where(ChatMessage.session_id == session_id)
+    if cursor:
+        (before_id,) = decode_cursor(cursor, int)
+        query = query.where(ChatMessage.id < before_id)
+    messages = (await db.scalars(query.order_by(ChatMessage.id.desc()).limit(limit + 1))).all()
+
+    next_cursor = None
+    if len(messages) > limit:
+        messages = messages[:limit]
+        next_cursor = encode_cursor(messages[-1].id)
+    return {"items": messages[::-1], "next_cursor": next_cursor}
+
 @router.delete("/sessions/{session_id}")
 async def delete_session(
     session_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    session = db.query(ChatSession).filter(
+    session = await db.scalar(select(ChatSession).where(
         ChatSession.id == session_id,
         ChatSession.user_id == current_user.id
-    ).first()
+    ))
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     
-    db.delete(session)
-    db.commit()
+    await library_search.remove_by_parent(db, library_search.KIND_MESSAGE, session_id)
+    await db.delete(session)
+    await db.commit()
     return {"message": "Session deleted"}
 
 @router.post("/sessions/{session_id}/message")
 async def send_message(
     session_id: int,
     message_data: MessageCreate,
-    db: Session = Depends(get_db),
+    http_request: Request,
+    stream: bool = False,
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    import logging
-    logger = logging.getLogger(__name__)
-    
-    session = db.query(ChatSession).filter(
+    session = await db.scalar(select(ChatSession).where(
         ChatSession.id == session_id,
         ChatSession.user_id == current_user.id
-    ).first()
+    ))
     if not session:
         raise HTTPException(status_code=404, detail="Session not found")
     
@@ -125,32 +187,67 @@ async def send_message(
         content=message_data.message
     )
     db.add(user_msg)
-    db.commit()
+    await db.flush()
+    await library_search.index_entry(
+        db, current_user.id, library_search.KIND_MESSAGE, user_msg.id, session_id,
+        session.title, user_msg.content
+    )
+    await db.commit()
     
     try:
-        # Get context from previous messages (last 10)
-        history = db.query(ChatMessage).filter(
-            ChatMessage.session_id == session_id
-        ).order_by(ChatMessage.created_at.desc()).limit(10).all()
-        
-        # Reverse to get chronological order
-        history = history[::-1]
-        
-        # Format history for Gemini (exclude the message we just added)
-        chat_history = []
-        for msg in history[:-1]:  # Exclude the last message (current user message)
-            chat_history.append({"role": msg.role, "parts": [msg.content]})
+        # Rolling summary + recent turns, fitted to the history token budget
+        chat_history = await build_chat_history(
+            db, session, user_msg.id,
+            current_user.profile.gemini_api_key,
+            current_user.profile.preferred_model
+        )
         
         logger.info(f"Sending message to Gemini for session {session_id}")
         
+        if stream:
+            user_id, session_title = current_user.id, session.title
+
+            async def save_response(ai_response_text: str):
+                # Runs after the stream ends, when the request session may be gone
+                async with SessionLocal() as stream_db:
+                    ai_msg = ChatMessage(
+                        session_id=session_id,
+                        role="assistant",
+                        content=ai_response_text
+                    )
+                    stream_db.add(ai_msg)
+                    await stream_db.flush()
+                    await library_search.index_entry(
+                        stream_db, user_id, library_search.KIND_MESSAGE, ai_msg.id, session_id,
+                        session_title, ai_response_text
+                    )
+                    await stream_db.execute(
+                        update(ChatSession).where(ChatSession.id == session_id).values(updated_at=utcnow())
+                    )
+                    await stream_db.commit()
+                    logger.info(f"Successfully streamed response for session {session_id}")
+
+            return sse_response(
+                stream_gemini_response(
+                    message_data.message,
+                    current_user.profile.gemini_api_key,
+                    model=current_user.profile.preferred_model,
+                    history=chat_history,
+                    paper_ids=message_data.paper_ids,
+                    user_id=current_user.id
+                ),
+                on_complete=save_response
+            )
+
         # Get AI response - this now raises HTTPException on errors
-        ai_response_text = await get_gemini_response(
+        ai_response_text = await cancel_on_disconnect(http_request, get_gemini_response(
             message_data.message,
             current_user.profile.gemini_api_key,
             model=current_user.profile.preferred_model,
             history=chat_history,
-            context=""  # Context can be added from paper_ids if needed
-        )
+            paper_ids=message_data.paper_ids,  # Relevant passages are retrieved from these papers
+            user_id=current_user.id
+        ))
         
         # Save AI message
         ai_msg = ChatMessage(
@@ -159,23 +256,28 @@ async def send_message(
             content=ai_response_text
         )
         db.add(ai_msg)
+        await db.flush()
+        await library_search.index_entry(
+            db, current_user.id, library_search.KIND_MESSAGE, ai_msg.id, session_id,
+            session.title, ai_response_text
+        )
         
         # Update session timestamp
-        session.updated_at = datetime.datetime.now()
+        session.updated_at = utcnow()
         
-        db.commit()
+        await db.commit()
         
         logger.info(f"Successfully generated response for session {session_id}")
         return {"response": ai_response_text}
         
     except HTTPException:
         # Roll back the transaction if there's an error
-        db.rollback()
+        await db.rollback()
         # Re-raise the HTTP exception (already has proper status code and detail)
         raise
     except Exception as e:
         # Roll back the transaction
-        db.rollback()
+        await db.rollback()
         logger.error(f"Unexpected error in send_message: {str(e)}")
         raise HTTPException(
             status_code=500,
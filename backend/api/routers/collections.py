@@ -1,15 +1,26 @@
 from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List, Optional
+from sqlalchemy import func, select
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import defer, joinedload
+from typing import List, Literal, Optional
 from pydantic import BaseModel
 from db.session import get_db
-from db.models import User, Collection, CollectionItem
+from db.models import User, Collection, CollectionItem, Paper
 from api.deps import get_current_user
+from services.arxiv_service import split_arxiv_id
+from services.paper_service import ensure_paper, get_or_fetch_papers
+from services.collection_service import apply_batch
+from services import library_search
+from utils.pagination import Page, DEFAULT_PAGE_SIZE, clamp_limit, encode_cursor, decode_cursor
 
 router = APIRouter(prefix="/collections", tags=["collections"])
 
 from datetime import datetime
 
+# Keeps a single batch inside SQLite's bound-parameter limit and one arXiv request
+MAX_BATCH_OPERATIONS = 1000
+
 # Pydantic Models
 class CollectionCreate(BaseModel):
     name: str
@@ -17,19 +28,53 @@ class CollectionCreate(BaseModel):
 
 class CollectionItemCreate(BaseModel):
     paper_id: str
-    paper_title: str
-    paper_summary: str
+    # Ignored when arXiv knows the paper; otherwise shown for this item only
+    paper_title: Optional[str] = None
+    paper_summary: Optional[str] = None
 
 class CollectionItemResponse(BaseModel):
     id: int
     paper_id: str
-    paper_title: str
-    paper_summary: str
+    paper_title: Optional[str] = None
+    paper_summary: Optional[str] = None
     added_at: datetime
 
     class Config:
         from_attributes = True
 
+class CollectionOperation(BaseModel):
+    action: Literal["add", "remove", "move"]
+    paper_id: str
+    collection_id: int
+    # Required for "move"
+    target_collection_id: Optional[int] = None
+    paper_title: Optional[str] = None
+    paper_summary: Optional[str] = None
+
+class CollectionBatchRequest(BaseModel):
+    operations: List[CollectionOperation]
+
+class CollectionOperationResult(BaseModel):
+    index: int
+    action: str
+    paper_id: str
+    collection_id: int
+    status: str
+    item_id: Optional[int] = None
+
+class CollectionBatchResponse(BaseModel):
+    results: List[CollectionOperationResult]
+
+class CollectionSummary(BaseModel):
+    id: int
+    name: str
+    description: Optional[str]
+    created_at: datetime
+    item_count: int = 0
+
+    class Config:
+        from_attributes = True
+
 class CollectionResponse(BaseModel):
     id: int
     name: str
@@ -40,12 +85,38 @@ class CollectionResponse(BaseModel):
     class Config:
         from_attributes = True
 
+def _item_response(item: CollectionItem, include_summary: bool) -> dict:
+    return {
+        "id": item.id,
+        "paper_id": item.paper_id,
+        "paper_title": item.paper_title,
+        "paper_summary": item.paper_summary if include_summary else None,
+        "added_at": item.added_at,
+    }
+
+def _item_query(include_summary: bool):
+    paper = joinedload(CollectionItem.paper)
+    options = [paper]
+    if not include_summary:
+        # Don't read abstracts from disk just to drop them
+        options = [paper.defer(Paper.summary), defer(CollectionItem.summary_override)]
+    return select(CollectionItem).options(*options)
+
+async def _get_owned_collection(db: AsyncSession, collection_id: int, user_id: int) -> Collection:
+    collection = await db.scalar(select(Collection).where(
+        Collection.id == collection_id,
+        Collection.user_id == user_id
+    ))
+    if not collection:
+        raise HTTPException(status_code=404, detail="Collection not found")
+    return collection
+
 # Endpoints
 
 @router.post("/", response_model=CollectionResponse)
 async def create_collection(
     collection: CollectionCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
     db_collection = Collection(
@@ -54,104 +125,190 @@ async def create_collection(
         description=collection.description
     )
     db.add(db_collection)
-    db.commit()
-    db.refresh(db_collection)
-    return db_collection
+    await db.commit()
+    await db.refresh(db_collection)
+    # A new collection has no items; don't touch the unloaded relationship
+    return {
+        "id": db_collection.id,
+        "name": db_collection.name,
+        "description": db_collection.description,
+        "created_at": db_collection.created_at,
+        "items": [],
+    }
 
-@router.get("/", response_model=List[CollectionResponse])
+@router.post("/batch", response_model=CollectionBatchResponse)
+async def batch_collection_items(
+    batch: CollectionBatchRequest,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Add, remove or move many papers across the user's collections in one
+    transaction. Every operation gets a result; failures (unknown collection
+    or paper, duplicates) don't abort the rest of the batch.
+    """
+    if len(batch.operations) > MAX_BATCH_OPERATIONS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BATCH_OPERATIONS} operations per batch")
+    for op in batch.operations:
+        if op.action == "move" and op.target_collection_id is None:
+            raise HTTPException(status_code=400, detail="target_collection_id is required for move")
+
+    results = await apply_batch(db, current_user.id, [op.dict() for op in batch.operations])
+    return {"results": results}
+
+@router.get("/", response_model=Page[CollectionSummary])
 async def get_collections(
-    db: Session = Depends(get_db),
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    return current_user.collections
+    """Collections in creation order with item counts; items are fetched per collection."""
+    limit = clamp_limit(limit)
+    # Correlated count: an index range per listed collection, not a pass over every item
+    item_count = select(func.count(CollectionItem.id)).where(
+        CollectionItem.collection_id == Collection.id
+    ).correlate(Collection).scalar_subquery()
+
+    query = select(Collection, item_count).where(Collection.user_id == current_user.id)
+    if cursor:
+        (after_id,) = decode_cursor(cursor, int)
+        query = query.where(Collection.id > after_id)
+    rows = (await db.execute(query.order_by(Collection.id).limit(limit + 1))).all()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = encode_cursor(rows[-1][0].id)
+    items = [
+        CollectionSummary(
+            id=collection.id,
+            name=collection.name,
+            description=collection.description,
+            created_at=collection.created_at,
+            item_count=item_count
+        )
+        for collection, item_count in rows
+    ]
+    return {"items": items, "next_cursor": next_cursor}
 
 @router.get("/{collection_id}", response_model=CollectionResponse)
 async def get_collection(
     collection_id: int,
-    db: Session = Depends(get_db),
+    include_summary: bool = True,
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    collection = db.query(Collection).filter(
-        Collection.id == collection_id,
-        Collection.user_id == current_user.id
-    ).first()
-    if not collection:
-        raise HTTPException(status_code=404, detail="Collection not found")
-    return collection
+    collection = await _get_owned_collection(db, collection_id, current_user.id)
+    items = (await db.scalars(_item_query(include_summary).where(
+        CollectionItem.collection_id == collection_id
+    ).order_by(CollectionItem.id))).all()
+    return {
+        "id": collection.id,
+        "name": collection.name,
+        "description": collection.description,
+        "created_at": collection.created_at,
+        "items": [_item_response(item, include_summary) for item in items],
+    }
+
+@router.get("/{collection_id}/items", response_model=Page[CollectionItemResponse])
+async def get_collection_items(
+    collection_id: int,
+    limit: int = DEFAULT_PAGE_SIZE,
+    cursor: Optional[str] = None,
+    include_summary: bool = True,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    await _get_owned_collection(db, collection_id, current_user.id)
+
+    limit = clamp_limit(limit)
+    query = _item_query(include_summary).where(CollectionItem.collection_id == collection_id)
+    if cursor:
+        (after_id,) = decode_cursor(cursor, int)
+        query = query.where(CollectionItem.id > after_id)
+    items = (await db.scalars(query.order_by(CollectionItem.id).limit(limit + 1))).all()
+
+    next_cursor = None
+    if len(items) > limit:
+        items = items[:limit]
+        next_cursor = encode_cursor(items[-1].id)
+    return {"items": [_item_response(item, include_summary) for item in items], "next_cursor": next_cursor}
 
 @router.delete("/{collection_id}")
 async def delete_collection(
     collection_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    collection = db.query(Collection).filter(
-        Collection.id == collection_id,
-        Collection.user_id == current_user.id
-    ).first()
-    if not collection:
-        raise HTTPException(status_code=404, detail="Collection not found")
-    
-    db.delete(collection)
-    db.commit()
+    collection = await _get_owned_collection(db, collection_id, current_user.id)
+
+    await library_search.remove_by_parent(db, library_search.KIND_PAPER, collection_id)
+    await db.delete(collection)
+    await db.commit()
     return {"message": "Collection deleted"}
 
 @router.post("/{collection_id}/items", response_model=CollectionItemResponse)
 async def add_item_to_collection(
     collection_id: int,
     item: CollectionItemCreate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    collection = db.query(Collection).filter(
-        Collection.id == collection_id,
-        Collection.user_id == current_user.id
-    ).first()
-    if not collection:
-        raise HTTPException(status_code=404, detail="Collection not found")
-    
-    # Check if already exists
-    existing = db.query(CollectionItem).filter(
-        CollectionItem.collection_id == collection_id,
-        CollectionItem.paper_id == item.paper_id
-    ).first()
-    
-    if existing:
-        raise HTTPException(status_code=400, detail="Paper already in collection")
+    await _get_owned_collection(db, collection_id, current_user.id)
+
+    paper_id, _ = split_arxiv_id(item.paper_id)
+
+    # arXiv metadata is stored once in `papers` and shared by every
+    # collection; client-supplied metadata only stands in, on this item, for
+    # papers arXiv can't resolve
+    title_override = summary_override = None
+    if not await get_or_fetch_papers(db, [paper_id]):
+        if not item.paper_title:
+            raise HTTPException(status_code=404, detail="Paper not found")
+        await ensure_paper(db, paper_id, commit=False)
+        title_override, summary_override = item.paper_title, item.paper_summary
 
     db_item = CollectionItem(
         collection_id=collection_id,
-        paper_id=item.paper_id,
-        paper_title=item.paper_title,
-        paper_summary=item.paper_summary
+        paper_id=paper_id,
+        title_override=title_override,
+        summary_override=summary_override
     )
     db.add(db_item)
-    db.commit()
-    db.refresh(db_item)
+    try:
+        # The (collection_id, paper_id) unique index rejects duplicates atomically
+        await db.flush()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="Paper already in collection")
+    # Loads the paper row (joined) along with server defaults
+    await db.refresh(db_item)
+    await library_search.index_entry(
+        db, current_user.id, library_search.KIND_PAPER, db_item.id, collection_id,
+        db_item.paper_title, db_item.paper_summary
+    )
+    await db.commit()
     return db_item
 
-@router.delete("/{collection_id}/items/{paper_id}")
+@router.delete("/{collection_id}/items/{paper_id:path}")
 async def remove_item_from_collection(
     collection_id: int,
     paper_id: str,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    collection = db.query(Collection).filter(
-        Collection.id == collection_id,
-        Collection.user_id == current_user.id
-    ).first()
-    if not collection:
-        raise HTTPException(status_code=404, detail="Collection not found")
-    
-    item = db.query(CollectionItem).filter(
+    await _get_owned_collection(db, collection_id, current_user.id)
+
+    item = await db.scalar(select(CollectionItem).where(
         CollectionItem.collection_id == collection_id,
-        CollectionItem.paper_id == paper_id
-    ).first()
+        CollectionItem.paper_id == split_arxiv_id(paper_id)[0]
+    ))
     
     if not item:
         raise HTTPException(status_code=404, detail="Item not found in collection")
     
-    db.delete(item)
-    db.commit()
+    await library_search.remove_entries(db, library_search.KIND_PAPER, [item.id])
+    await db.delete(item)
+    await db.commit()
     return {"message": "Item removed from collection"}
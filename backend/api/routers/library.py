@@ -0,0 +1,39 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import List, Optional
+from pydantic import BaseModel
+from db.session import get_db
+from db.models import User
+from api.deps import get_current_user
+from services import library_search
+from utils.pagination import DEFAULT_PAGE_SIZE, clamp_limit
+
+router = APIRouter(prefix="/library", tags=["library"])
+
+# Pydantic Models
+class LibrarySearchResult(BaseModel):
+    kind: str # "paper" (collection item) or "message" (chat message)
+    ref_id: int
+    parent_id: int # collection id or chat session id
+    title: str
+    snippet: str
+    score: float
+
+# Endpoints
+
+@router.get("/search", response_model=List[LibrarySearchResult])
+async def search_library(
+    q: str,
+    kind: Optional[str] = None,
+    limit: int = DEFAULT_PAGE_SIZE,
+    offset: int = 0,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    if not library_search.fts_enabled():
+        raise HTTPException(status_code=501, detail="Library search is not available on this database")
+    if kind is not None and kind not in (library_search.KIND_PAPER, library_search.KIND_MESSAGE):
+        raise HTTPException(status_code=400, detail="kind must be 'paper' or 'message'")
+    if offset < 0:
+        raise HTTPException(status_code=400, detail="offset must not be negative")
+    return await library_search.search_library(db, current_user.id, q, kind=kind, limit=clamp_limit(limit), offset=offset)
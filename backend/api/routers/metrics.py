@@ -0,0 +1,60 @@
+from fastapi import APIRouter
+from fastapi.responses import Response
+
+from services.metrics import CONTENT_TYPE, registry
+from services.cache_service import search_cache
+from services.pdf_cache import pdf_cache
+from services.llm_cache import llm_cache
+from services.user_cache import user_cache
+from services.llm_executor import llm_executor
+from services.rate_limiter import gemini_limiter
+from services.write_batcher import paper_view_writer
+
+router = APIRouter(tags=["metrics"])
+
+
+def _collect_service_stats():
+    """Cache, executor and limiter counters, read from the services' own stats at scrape time."""
+    caches = {"search": search_cache.stats(), "pdf": pdf_cache.stats(), "user": user_cache.stats()}
+    for endpoint, counts in llm_cache.stats().items():
+        caches[f"llm_{endpoint}"] = counts
+
+    yield "synapse_cache_hits_total", "Cache hits.", "counter", [
+        ({"cache": name}, stats["hits"]) for name, stats in caches.items()
+    ]
+    yield "synapse_cache_misses_total", "Cache misses.", "counter", [
+        ({"cache": name}, stats["misses"]) for name, stats in caches.items()
+    ]
+    yield "synapse_cache_hit_ratio", "Cache hits over lookups since start.", "gauge", [
+        ({"cache": name}, stats["hit_ratio"]) for name, stats in caches.items()
+    ]
+
+    executor = llm_executor.stats()
+    yield "synapse_llm_executor_pending", "LLM calls queued or running.", "gauge", [({}, executor["pending"])]
+    yield "synapse_llm_executor_abandoned_running", "LLM calls still running after their caller left.", "gauge", [
+        ({}, executor["abandoned_running"])
+    ]
+    yield "synapse_llm_executor_rejected_total", "LLM calls refused because the executor was full.", "counter", [
+        ({}, executor["rejected"])
+    ]
+
+    limiter = gemini_limiter.stats()
+    yield "synapse_gemini_limiter_in_flight", "Gemini calls holding a key slot.", "gauge", [({}, limiter["in_flight"])]
+    yield "synapse_gemini_limiter_queued", "Gemini calls waiting for a key slot.", "gauge", [({}, limiter["queued"])]
+    yield "synapse_gemini_limiter_rejected_total", "Gemini calls refused by the rate limiter.", "counter", [
+        ({"scope": "user"}, limiter["rejected_user"]),
+        ({"scope": "key"}, limiter["rejected_key"]),
+    ]
+
+    writer = paper_view_writer.stats()
+    yield "synapse_paper_view_rows_written_total", "Paper views flushed to the database.", "counter", [
+        ({}, writer["rows"])
+    ]
+
+
+registry.register_collector(_collect_service_stats)
+
+
+@router.get("/metrics", include_in_schema=False)
+async def metrics():
+    return Response(registry.render(), media_type=CONTENT_TYPE)
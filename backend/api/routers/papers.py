@@ -0,0 +1,78 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import contains_eager
+from typing import List, Optional
+from pydantic import BaseModel
+from db.session import get_db
+from db.models import User, PaperView, utcnow
+from api.deps import get_current_user
+from services.paper_service import get_or_fetch_papers
+from services.write_batcher import paper_view_writer
+
+router = APIRouter(prefix="/papers", tags=["papers"])
+
+from datetime import datetime
+
+# Pydantic Models
+class PaperResponse(BaseModel):
+    arxiv_id: str
+    version: Optional[int] = None
+    title: Optional[str] = None
+    summary: Optional[str] = None
+    authors: List[str] = []
+    published: Optional[str] = None
+    pdf_url: Optional[str] = None
+
+    class Config:
+        from_attributes = True
+
+class PaperViewCreate(BaseModel):
+    paper_id: str
+
+class PaperViewResponse(BaseModel):
+    paper: PaperResponse
+    viewed_at: datetime
+
+    class Config:
+        from_attributes = True
+
+# Endpoints
+
+@router.get("/recent", response_model=List[PaperViewResponse])
+async def recently_viewed(
+    limit: int = 20,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    result = await db.scalars(
+        select(PaperView).join(PaperView.paper).options(contains_eager(PaperView.paper)).where(
+            PaperView.user_id == current_user.id
+        ).order_by(PaperView.viewed_at.desc()).limit(limit)
+    )
+    return result.all()
+
+@router.post("/views", response_model=PaperViewResponse)
+async def record_view(
+    view: PaperViewCreate,
+    db: AsyncSession = Depends(get_db),
+    current_user: User = Depends(get_current_user)
+):
+    papers = await get_or_fetch_papers(db, [view.paper_id])
+    if not papers:
+        raise HTTPException(status_code=404, detail="Paper not found")
+
+    # Views are high-volume appends; concurrent ones share a single commit
+    viewed_at = utcnow()
+    await paper_view_writer.add({"user_id": current_user.id, "paper_id": papers[0].arxiv_id, "viewed_at": viewed_at})
+    return {"paper": papers[0], "viewed_at": viewed_at}
+
+@router.get("/{arxiv_id:path}", response_model=PaperResponse)
+async def get_paper(
+    arxiv_id: str,
+    db: AsyncSession = Depends(get_db)
+):
+    papers = await get_or_fetch_papers(db, [arxiv_id])
+    if not papers:
+        raise HTTPException(status_code=404, detail="Paper not found")
+    return papers[0]
@@ -1,10 +1,28 @@
-from fastapi import APIRouter, HTTPException, Depends
+import json
+import logging
+import httpx
+from typing import Optional
+from fastapi import APIRouter, HTTPException, Depends, Request
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from services.arxiv_service import search_arxiv, get_random_paper
-from services.gemini_service import get_gemini_response
-from services.pdf_service import extract_text_from_pdf
+from services.arxiv_service import search_arxiv, stream_arxiv, get_random_paper, normalize_search_params
+from services.cache_service import search_cache, make_cache_key
+from services.gemini_service import get_gemini_response, stream_gemini_response
+from services.llm_executor import llm_executor
+from services.rate_limiter import gemini_limiter
+from services.pdf_service import extract_text_from_pdf, iter_pdf_pages, parse_page_range
+from services.pdf_cache import pdf_cache
+from services.paper_service import upsert_papers
 from api.deps import get_current_user
+from services.llm_cache import llm_cache, llm_cache_key, LLM_CACHE_ENABLED
+from services.user_cache import user_cache
+from utils.sse import sse_response, sse_text_response
+from utils.disconnect import cancel_on_disconnect
 from db import models
+from sqlalchemy.ext.asyncio import AsyncSession
+from db.session import get_db, SessionLocal
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(tags=["research"])
 
@@ -16,69 +34,187 @@ class ELI5Request(BaseModel):
     text: str
 
 @router.get("/search")
-async def search(query: str, start: int = 0, max_results: int = 10, sort_by: str = "submittedDate", sort_order: str = "descending"):
+async def search(query: str, start: int = 0, max_results: int = 10, sort_by: str = "submittedDate", sort_order: str = "descending", db: AsyncSession = Depends(get_db)):
     try:
-        results = await search_arxiv(query, start, max_results, sort_by, sort_order)
+        params = normalize_search_params(query, start, max_results, sort_by, sort_order)
+
+        async def fetch():
+            papers = await search_arxiv(*params)
+            # Persist metadata once per upstream fetch, not per cache hit
+            await upsert_papers(db, papers)
+            return papers
+
+        results = await search_cache.get_or_set(make_cache_key("search", *params), fetch)
         return results
+    except HTTPException:
+        raise
+    except httpx.HTTPError as e:
+        logger.warning(f"arXiv search failed: {e!r}")
+        raise HTTPException(status_code=502, detail="arXiv is unavailable, please try again later")
     except Exception as e:
-        import traceback
-        traceback.print_exc()
-        print(f"Search error: {e}")
+        logger.exception(f"Search error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.get("/search/stream")
+async def search_stream(query: str, start: int = 0, max_results: int = 10, sort_by: str = "submittedDate", sort_order: str = "descending"):
+    """Same as /search but returns NDJSON, one paper per line, as entries are parsed."""
+    params = normalize_search_params(query, start, max_results, sort_by, sort_order)
+    cache_key = make_cache_key("search", *params)
+
+    async def generate():
+        cached = await search_cache.get(cache_key)
+        if cached is not None:
+            for paper in cached:
+                yield json.dumps(paper) + "\n"
+            return
+
+        papers = []
+        try:
+            async for paper in stream_arxiv(*params):
+                papers.append(paper)
+                yield json.dumps(paper) + "\n"
+        except Exception as e:
+            logger.exception(f"Search stream error: {e}")
+            yield json.dumps({"error": str(e)}) + "\n"
+            return
+
+        await search_cache.set(cache_key, papers)
+        # The request-scoped session may already be closed while streaming
+        async with SessionLocal() as db:
+            await upsert_papers(db, papers)
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+@router.get("/cache/stats")
+async def cache_stats():
+    return {"search": search_cache.stats(), "pdf": pdf_cache.stats(), "llm": llm_cache.stats(), "users": user_cache.stats()}
+
+@router.get("/llm/stats")
+async def llm_stats():
+    """Gemini call accounting: executor (incl. abandoned calls) and rate limiter."""
+    return {"executor": llm_executor.stats(), "limiter": gemini_limiter.stats()}
+
 @router.get("/random")
-async def random_paper():
+async def random_paper(db: AsyncSession = Depends(get_db)):
     try:
         paper = await get_random_paper()
         if not paper:
             raise HTTPException(status_code=404, detail="No paper found")
+        await upsert_papers(db, [paper])
         return paper
+    except HTTPException:
+        raise
+    except httpx.HTTPError as e:
+        logger.warning(f"arXiv random paper lookup failed: {e!r}")
+        raise HTTPException(status_code=502, detail="arXiv is unavailable, please try again later")
     except Exception as e:
+        logger.exception(f"Random paper error: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
-from sqlalchemy.orm import Session
-from db.session import get_db
-
 @router.post("/chat")
-async def chat(request: ChatRequest, current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
+async def chat(request: ChatRequest, http_request: Request, stream: bool = False, current_user: models.User = Depends(get_current_user)):
     try:
         # Get User Config
         api_key = current_user.profile.gemini_api_key if current_user.profile else None
         model_name = current_user.profile.preferred_model if current_user.profile else "gemini-1.5-flash"
         
         # Get Active Prompt
-        active_prompt = db.query(models.PromptTemplate).filter(
-            models.PromptTemplate.user_id == current_user.id,
-            models.PromptTemplate.type == "chat",
-            models.PromptTemplate.is_active == True
-        ).first()
+        active_prompt = await user_cache.get_active_prompt(current_user, "chat")
         
         system_instruction = active_prompt.content if active_prompt else None
 
-        response = await get_gemini_response(
+        if stream:
+            return sse_response(stream_gemini_response(
+                request.user_query,
+                api_key=api_key,
+                model=model_name,
+                context=request.papers_context,
+                system_instruction=system_instruction,
+                user_id=current_user.id
+            ))
+
+        response = await cancel_on_disconnect(http_request, get_gemini_response(
             request.user_query, 
             api_key=api_key, 
             model=model_name, 
             context=request.papers_context,
-            system_instruction=system_instruction
-        )
+            system_instruction=system_instruction,
+            user_id=current_user.id
+        ))
         return response
+    except HTTPException:
+        # Keep 400/429/504 from gemini_service as they are
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+def _parse_pages(pages: Optional[str]):
+    if pages is None:
+        return None
+    try:
+        return parse_page_range(pages)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Invalid page range. Use e.g. '1-3,7'.")
+
 @router.post("/extract")
-async def extract(pdf_url: str):
+async def extract(pdf_url: str, pages: Optional[str] = None, max_chars: int = 10000):
+    page_indices = _parse_pages(pages)
     try:
-        text = await extract_text_from_pdf(pdf_url)
-        return {"text": text[:10000]} # Limit for now
+        text = await extract_text_from_pdf(pdf_url, pages=page_indices, max_chars=max_chars)
+        return {"text": text}
+    except HTTPException:
+        raise
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
 
+@router.post("/extract/stream")
+async def extract_stream(pdf_url: str, pages: Optional[str] = None, max_chars: Optional[int] = None):
+    """Stream NDJSON lines of {"page": n, "text": ...} as each page is extracted."""
+    page_indices = _parse_pages(pages)
+
+    async def generate():
+        try:
+            async for page_number, text in iter_pdf_pages(pdf_url, pages=page_indices, max_chars=max_chars):
+                yield json.dumps({"page": page_number, "text": text}) + "\n"
+        except HTTPException as e:
+            yield json.dumps({"error": e.detail}) + "\n"
+        except Exception as e:
+            logger.exception(f"Extract stream error: {e}")
+            yield json.dumps({"error": str(e)}) + "\n"
+
+    return StreamingResponse(generate(), media_type="application/x-ndjson")
+
+async def _generate_cached(endpoint: str, prompt: str, api_key: str, model_name: str, system_instruction, use_cache: bool, stream: bool, db: AsyncSession, user_id: int, http_request: Request):
+    """
+    Answer a deterministic prompt (summarize/ELI5), reusing a cached answer for
+    identical (model, system_instruction, prompt) when caching is allowed.
+    """
+    key = None
+    if LLM_CACHE_ENABLED and use_cache:
+        key = llm_cache_key(model_name, system_instruction, prompt)
+        cached = await llm_cache.get(db, endpoint, key)
+        if cached is not None:
+            return sse_text_response(cached) if stream else cached
+    else:
+        llm_cache.bypass(endpoint)
+
+    if stream:
+        on_complete = (lambda text: llm_cache.set(endpoint, key, model_name, text)) if key else None
+        return sse_response(
+            stream_gemini_response(prompt, api_key=api_key, model=model_name, system_instruction=system_instruction, user_id=user_id),
+            on_complete=on_complete
+        )
+
+    response = await cancel_on_disconnect(
+        http_request,
+        get_gemini_response(prompt, api_key=api_key, model=model_name, system_instruction=system_instruction, user_id=user_id)
+    )
+    if key:
+        await llm_cache.set(endpoint, key, model_name, response, db=db)
+    return response
+
 @router.post("/eli5")
-async def eli5(request: ELI5Request, current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
-    import logging
-    logger = logging.getLogger(__name__)
-    
+async def eli5(request: ELI5Request, http_request: Request, stream: bool = False, current_user: models.User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
     # Validate API key
     if not current_user.profile or not current_user.profile.gemini_api_key:
         raise HTTPException(
@@ -90,11 +226,7 @@ async def eli5(request: ELI5Request, current_user: models.User = Depends(get_cur
         api_key = current_user.profile.gemini_api_key
         model_name = current_user.profile.preferred_model if current_user.profile.preferred_model else "gemini-1.5-flash"
         
-        active_prompt = db.query(models.PromptTemplate).filter(
-            models.PromptTemplate.user_id == current_user.id,
-            models.PromptTemplate.type == "eli5",
-            models.PromptTemplate.is_active == True
-        ).first()
+        active_prompt = await user_cache.get_active_prompt(current_user, "eli5")
         
         system_instruction = active_prompt.content if active_prompt else None
         
@@ -103,10 +235,14 @@ async def eli5(request: ELI5Request, current_user: models.User = Depends(get_cur
         # Fallback prompt if no template
         if not system_instruction:
             prompt = f"Explain the following text like I'm 5 years old. Keep it simple, fun, and use analogies if possible:\n\n{request.text}"
-            response = await get_gemini_response(prompt, api_key=api_key, model=model_name)
         else:
             # Use template
-            response = await get_gemini_response(request.text, api_key=api_key, model=model_name, system_instruction=system_instruction)
+            prompt = request.text
+
+        use_cache = active_prompt.cache_enabled if active_prompt and active_prompt.cache_enabled is not None else True
+        response = await _generate_cached(
+            "eli5", prompt, api_key, model_name, system_instruction, use_cache, stream, db, current_user.id, http_request
+        )
         
         logger.info("ELI5 request completed successfully")
         return response
@@ -115,16 +251,11 @@ async def eli5(request: ELI5Request, current_user: models.User = Depends(get_cur
         # Re-raise HTTP exceptions (from gemini_service)
         raise
     except Exception as e:
-        import traceback
-        traceback.print_exc()
-        logger.error(f"ELI5 error: {e}")
+        logger.exception(f"ELI5 error: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to generate ELI5 explanation: {str(e)}")
 
 @router.post("/summarize")
-async def summarize(request: ELI5Request, current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
-    import logging
-    logger = logging.getLogger(__name__)
-    
+async def summarize(request: ELI5Request, http_request: Request, stream: bool = False, current_user: models.User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
     # Validate API key
     if not current_user.profile or not current_user.profile.gemini_api_key:
         raise HTTPException(
@@ -136,11 +267,7 @@ async def summarize(request: ELI5Request, current_user: models.User = Depends(ge
         api_key = current_user.profile.gemini_api_key
         model_name = current_user.profile.preferred_model if current_user.profile.preferred_model else "gemini-1.5-flash"
         
-        active_prompt = db.query(models.PromptTemplate).filter(
-            models.PromptTemplate.user_id == current_user.id,
-            models.PromptTemplate.type == "summarize",
-            models.PromptTemplate.is_active == True
-        ).first()
+        active_prompt = await user_cache.get_active_prompt(current_user, "summarize")
         
         system_instruction = active_prompt.content if active_prompt else None
         
@@ -148,9 +275,13 @@ async def summarize(request: ELI5Request, current_user: models.User = Depends(ge
         
         if not system_instruction:
             prompt = f"Provide a comprehensive, professional academic summary of the following text. Highlight key findings, methodology, and implications:\n\n{request.text}"
-            response = await get_gemini_response(prompt, api_key=api_key, model=model_name)
         else:
-            response = await get_gemini_response(request.text, api_key=api_key, model=model_name, system_instruction=system_instruction)
+            prompt = request.text
+
+        use_cache = active_prompt.cache_enabled if active_prompt and active_prompt.cache_enabled is not None else True
+        response = await _generate_cached(
+            "summarize", prompt, api_key, model_name, system_instruction, use_cache, stream, db, current_user.id, http_request
+        )
         
         logger.info("Summarize request completed successfully")
         return response
@@ -159,7 +290,5 @@ async def summarize(request: ELI5Request, current_user: models.User = Depends(ge
         # Re-raise HTTP exceptions (from gemini_service)
         raise
     except Exception as e:
-        import traceback
-        traceback.print_exc()
-        logger.error(f"Summarize error: {e}")
+        logger.exception(f"Summarize error: {e}")
         raise HTTPException(status_code=500, detail=f"Failed to generate summary: {str(e)}")
@@ -1,10 +1,15 @@
+import logging
 from fastapi import APIRouter, Depends, HTTPException
-from sqlalchemy.orm import Session
+from sqlalchemy import select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from typing import List, Optional
 from pydantic import BaseModel
 from db.session import get_db
 from db import models
 from api.deps import get_current_user
+from services.user_cache import user_cache
+
+logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/user", tags=["user"])
 
@@ -18,12 +23,14 @@ class PromptTemplateCreate(BaseModel):
     type: str
     content: str
     model: Optional[str] = None
+    cache_enabled: bool = True
 
 class PromptTemplateUpdate(BaseModel):
     name: Optional[str] = None
     content: Optional[str] = None
     model: Optional[str] = None
     is_active: Optional[bool] = None
+    cache_enabled: Optional[bool] = None
 
 class PromptTemplateResponse(BaseModel):
     id: int
@@ -32,6 +39,7 @@ class PromptTemplateResponse(BaseModel):
     content: str
     model: Optional[str] = None
     is_active: bool
+    cache_enabled: Optional[bool] = True
 
     class Config:
         from_attributes = True
@@ -48,12 +56,12 @@ def read_users_me(current_user: models.User = Depends(get_current_user)):
     }
 
 @router.patch("/profile")
-def update_profile(profile_data: ProfileUpdate, current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
-    if not current_user.profile:
+async def update_profile(profile_data: ProfileUpdate, current_user: models.User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    # current_user is a shared cached copy; edit the row through this session
+    profile = await db.scalar(select(models.Profile).where(models.Profile.user_id == current_user.id))
+    if not profile:
         profile = models.Profile(user_id=current_user.id)
         db.add(profile)
-    else:
-        profile = current_user.profile
     
     if profile_data.full_name is not None:
         profile.full_name = profile_data.full_name
@@ -62,19 +70,21 @@ def update_profile(profile_data: ProfileUpdate, current_user: models.User = Depe
     if profile_data.profile_image is not None:
         profile.profile_image = profile_data.profile_image
         
-    db.commit()
+    await db.commit()
+    user_cache.invalidate(current_user.id)
     return {"message": "Profile updated successfully"}
 
 @router.post("/api-key")
-def update_api_key(api_key: str, current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
-    if not current_user.profile:
+async def update_api_key(api_key: str, current_user: models.User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    # current_user is a shared cached copy; edit the row through this session
+    profile = await db.scalar(select(models.Profile).where(models.Profile.user_id == current_user.id))
+    if not profile:
         profile = models.Profile(user_id=current_user.id)
         db.add(profile)
-    else:
-        profile = current_user.profile
     
     profile.gemini_api_key = api_key
-    db.commit()
+    await db.commit()
+    user_cache.invalidate(current_user.id)
     return {"message": "API Key updated successfully"}
 
 @router.get("/models")
@@ -84,32 +94,35 @@ def list_models(current_user: models.User = Depends(get_current_user)):
     
     try:
         import google.generativeai as genai
-        genai.configure(api_key=current_user.profile.gemini_api_key)
+        from services.gemini_clients import gemini_clients
+        client = gemini_clients.get_model_client(current_user.profile.gemini_api_key)
         models_list = []
-        for m in genai.list_models():
+        for m in genai.list_models(client=client):
             if 'generateContent' in m.supported_generation_methods:
                 models_list.append({"name": m.name, "displayName": m.display_name})
         return models_list
     except Exception as e:
-        print(f"Error fetching models: {e}")
+        logger.warning(f"Error fetching models: {e}")
         return []
 
 # Prompt Template Endpoints
 @router.get("/prompts", response_model=List[PromptTemplateResponse])
-def get_prompts(current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
-    return db.query(models.PromptTemplate).filter(models.PromptTemplate.user_id == current_user.id).all()
+async def get_prompts(current_user: models.User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    result = await db.scalars(select(models.PromptTemplate).where(models.PromptTemplate.user_id == current_user.id))
+    return result.all()
 
 @router.post("/prompts", response_model=PromptTemplateResponse)
-def create_prompt(prompt: PromptTemplateCreate, current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
+async def create_prompt(prompt: PromptTemplateCreate, current_user: models.User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
     db_prompt = models.PromptTemplate(**prompt.dict(), user_id=current_user.id)
     db.add(db_prompt)
-    db.commit()
-    db.refresh(db_prompt)
+    await db.commit()
+    user_cache.invalidate(current_user.id)
+    await db.refresh(db_prompt)
     return db_prompt
 
 @router.put("/prompts/{prompt_id}")
-def update_prompt(prompt_id: int, prompt_data: PromptTemplateUpdate, current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
-    db_prompt = db.query(models.PromptTemplate).filter(models.PromptTemplate.id == prompt_id, models.PromptTemplate.user_id == current_user.id).first()
+async def update_prompt(prompt_id: int, prompt_data: PromptTemplateUpdate, current_user: models.User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    db_prompt = await db.scalar(select(models.PromptTemplate).where(models.PromptTemplate.id == prompt_id, models.PromptTemplate.user_id == current_user.id))
     if not db_prompt:
         raise HTTPException(status_code=404, detail="Prompt not found")
     
@@ -119,24 +132,28 @@ def update_prompt(prompt_id: int, prompt_data: PromptTemplateUpdate, current_use
         db_prompt.content = prompt_data.content
     if prompt_data.model is not None:
         db_prompt.model = prompt_data.model
+    if prompt_data.cache_enabled is not None:
+        db_prompt.cache_enabled = prompt_data.cache_enabled
     if prompt_data.is_active is not None:
         # If setting to active, deactivate others of same type
         if prompt_data.is_active:
-            db.query(models.PromptTemplate).filter(
+            await db.execute(update(models.PromptTemplate).where(
                 models.PromptTemplate.user_id == current_user.id,
                 models.PromptTemplate.type == db_prompt.type
-            ).update({"is_active": False})
+            ).values(is_active=False))
         db_prompt.is_active = prompt_data.is_active
         
-    db.commit()
+    await db.commit()
+    user_cache.invalidate(current_user.id)
     return {"message": "Prompt updated"}
 
 @router.delete("/prompts/{prompt_id}")
-def delete_prompt(prompt_id: int, current_user: models.User = Depends(get_current_user), db: Session = Depends(get_db)):
-    db_prompt = db.query(models.PromptTemplate).filter(models.PromptTemplate.id == prompt_id, models.PromptTemplate.user_id == current_user.id).first()
+async def delete_prompt(prompt_id: int, current_user: models.User = Depends(get_current_user), db: AsyncSession = Depends(get_db)):
+    db_prompt = await db.scalar(select(models.PromptTemplate).where(models.PromptTemplate.id == prompt_id, models.PromptTemplate.user_id == current_user.id))
     if not db_prompt:
         raise HTTPException(status_code=404, detail="Prompt not found")
     
-    db.delete(db_prompt)
-    db.commit()
+    await db.delete(db_prompt)
+    await db.commit()
+    user_cache.invalidate(current_user.id)
     return {"message": "Prompt deleted"}
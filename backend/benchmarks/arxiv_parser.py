@@ -0,0 +1,101 @@
+"""
+Benchmark: streaming arXiv Atom parser vs. the original ElementTree parser.
+
+Run from the backend directory:
+    python -m benchmarks.arxiv_parser [entries ...]
+"""
+import sys
+import time
+import tracemalloc
+import xml.etree.ElementTree as ET
+
+from services.arxiv_service import ArxivFeedParser, parse_arxiv_response
+
+CHUNK_SIZE = 64 * 1024
+
+
+def make_feed(n: int) -> bytes:
+    entries = []
+    for i in range(n):
+        entries.append(f"""<entry>
+<id>http://arxiv.org/abs/2310.{i:05d}v2</id>
+<updated>2023-10-18T17:59:59Z</updated>
+<published>2023-10-18T17:59:59Z</published>
+<title>Paper number {i}
+ on something</title>
+<summary>  {'Abstract text of a realistic length. ' * 40}
+</summary>
+<author><name>Author A{i}</name></author>
+<author><name>Author B{i}</name></author>
+<author><name>Author C{i}</name></author>
+<arxiv:comment>12 pages, 4 figures</arxiv:comment>
+<link href="http://arxiv.org/abs/2310.{i:05d}v2" rel="alternate" type="text/html"/>
+<link title="pdf" href="http://arxiv.org/pdf/2310.{i:05d}v2" rel="related" type="application/pdf"/>
+<arxiv:primary_category term="cs.LG" scheme="http://arxiv.org/schemas/atom"/>
+<category term="cs.LG" scheme="http://arxiv.org/schemas/atom"/>
+</entry>""")
+    return (
+        '<?xml version="1.0" encoding="UTF-8"?>\n'
+        '<feed xmlns="http://www.w3.org/2005/Atom" xmlns:arxiv="http://arxiv.org/schemas/atom">\n'
+        '<title type="html">ArXiv Query</title>\n'
+        + "".join(entries)
+        + "\n</feed>"
+    ).encode("utf-8")
+
+
+def legacy_parse(xml_data: str):
+    """The original implementation: decode, build the full tree, find/findall per field."""
+    root = ET.fromstring(xml_data)
+    ns = {'atom': 'http://www.w3.org/2005/Atom', 'arxiv': 'http://arxiv.org/schemas/atom'}
+    papers = []
+    for entry in root.findall('atom:entry', ns):
+        papers.append({
+            "id": entry.find('atom:id', ns).text,
+            "title": entry.find('atom:title', ns).text.strip().replace('\n', ' '),
+            "summary": entry.find('atom:summary', ns).text.strip().replace('\n', ' '),
+            "authors": [author.find('atom:name', ns).text for author in entry.findall('atom:author', ns)],
+            "published": entry.find('atom:published', ns).text,
+            "pdf_url": next((link.attrib['href'] for link in entry.findall('atom:link', ns) if link.attrib.get('title') == 'pdf'), None)
+        })
+    return papers
+
+
+def streaming_parse(body: bytes):
+    """Feed the body in network-sized chunks, as `stream_arxiv` does."""
+    parser = ArxivFeedParser()
+    count = 0
+    for offset in range(0, len(body), CHUNK_SIZE):
+        count += len(parser.feed(body[offset:offset + CHUNK_SIZE]))
+    return count + len(parser.close())
+
+
+def measure(fn, repeat: int = 5):
+    best = float("inf")
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        best = min(best, time.perf_counter() - start)
+    tracemalloc.start()
+    fn()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak
+
+
+def main(sizes):
+    print(f"{'entries':>8} {'parser':>10} {'best ms':>10} {'peak MiB':>10}")
+    for n in sizes:
+        body = make_feed(n)
+        assert [p["id"] for p in parse_arxiv_response(body)] == [p["id"] for p in legacy_parse(body.decode())]
+        runs = {
+            "legacy": lambda: legacy_parse(body.decode("utf-8")),
+            "bulk": lambda: parse_arxiv_response(body),
+            "streaming": lambda: streaming_parse(body),
+        }
+        for name, fn in runs.items():
+            seconds, peak = measure(fn)
+            print(f"{n:>8} {name:>10} {seconds * 1000:>10.1f} {peak / 2**20:>10.2f}")
+
+
+if __name__ == "__main__":
+    main([int(arg) for arg in sys.argv[1:]] or [100, 1000, 5000])
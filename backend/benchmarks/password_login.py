@@ -0,0 +1,75 @@
+"""
+Benchmark: a burst of logins and what it does to the rest of the app.
+
+Verifies `logins` passwords concurrently while a heartbeat task ticks every
+millisecond, and reports login throughput alongside the worst event-loop
+stall the heartbeat saw (a proxy for latency of every other endpoint).
+Compares bcrypt on the event loop, on Starlette's shared thread pool, and on
+the bounded hashing pool in services/password_service.
+
+Run from the backend directory (BCRYPT_ROUNDS applies as in the app):
+    python -m benchmarks.password_login [logins]
+"""
+import sys
+import time
+import asyncio
+import statistics
+
+from fastapi.concurrency import run_in_threadpool
+
+from services import password_service
+from utils.security import BCRYPT_ROUNDS, get_password_hash, verify_password
+
+HEARTBEAT_SECONDS = 0.001
+
+
+async def _heartbeat(lags: list, stop: asyncio.Event) -> None:
+    while not stop.is_set():
+        start = time.perf_counter()
+        await asyncio.sleep(HEARTBEAT_SECONDS)
+        lags.append(time.perf_counter() - start - HEARTBEAT_SECONDS)
+
+
+async def _inline(password: str, hashed: str) -> None:
+    verify_password(password, hashed)
+
+
+async def _threadpool(password: str, hashed: str) -> None:
+    await run_in_threadpool(verify_password, password, hashed)
+
+
+async def _bounded_pool(password: str, hashed: str) -> None:
+    await password_service.verify_password(password, hashed)
+
+
+async def run(label: str, verify, logins: int, hashed: str) -> None:
+    lags, stop = [], asyncio.Event()
+    heartbeat = asyncio.create_task(_heartbeat(lags, stop))
+    await asyncio.sleep(0)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(verify("correct horse", hashed) for _ in range(logins)))
+    elapsed = time.perf_counter() - start
+
+    stop.set()
+    await heartbeat
+    worst = max(lags) if lags else elapsed
+    p99 = statistics.quantiles(lags, n=100)[98] if len(lags) >= 100 else worst
+    print(f"{label:<28} {logins / elapsed:8.1f} logins/s   loop stall p99 {p99 * 1000:8.1f} ms  max {worst * 1000:8.1f} ms")
+
+
+async def main(logins: int) -> None:
+    hashed = get_password_hash("correct horse")
+    print(
+        f"{logins} concurrent logins, BCRYPT_ROUNDS={BCRYPT_ROUNDS}, "
+        f"PASSWORD_HASH_WORKERS={password_service.PASSWORD_HASH_WORKERS}\n"
+    )
+    await run("bcrypt on the event loop", _inline, logins, hashed)
+    await run("shared thread pool", _threadpool, logins, hashed)
+    await run("bounded hashing pool", _bounded_pool, logins, hashed)
+    password_service.shutdown_password_executor()
+
+
+if __name__ == "__main__":
+    logins = int(sys.argv[1]) if len(sys.argv) > 1 else 16
+    asyncio.run(main(logins))
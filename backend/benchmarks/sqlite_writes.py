@@ -0,0 +1,84 @@
+"""
+Benchmark: SQLite write throughput for PaperView-style appends.
+
+Compares the default rollback journal with one commit per row, the tuned
+pragmas (WAL, synchronous=NORMAL, ...) with one commit per row, and the
+tuned pragmas with the group-commit WriteBatcher.
+
+Run from the backend directory:
+    python -m benchmarks.sqlite_writes [rows] [concurrency]
+"""
+import os
+import sys
+import time
+import asyncio
+import tempfile
+
+from sqlalchemy import insert
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from db.session import Base, make_engine
+from db.models import PaperView, utcnow
+from services.write_batcher import WriteBatcher
+
+
+def _row(i: int) -> dict:
+    return {"user_id": i % 50, "paper_id": f"2310.{i % 1000:05d}", "viewed_at": utcnow()}
+
+
+async def _per_row_commits(session_factory, rows: int, concurrency: int) -> None:
+    # Mirrors the old endpoint: every request opens a session and commits its own row
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def write(i: int):
+        async with semaphore:
+            async with session_factory() as db:
+                await db.execute(insert(PaperView), [_row(i)])
+                await db.commit()
+
+    await asyncio.gather(*(write(i) for i in range(rows)))
+
+
+async def _batched(session_factory, rows: int, concurrency: int) -> WriteBatcher:
+    batcher = WriteBatcher(PaperView, session_factory=session_factory)
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def write(i: int):
+        async with semaphore:
+            await batcher.add(_row(i))
+
+    await asyncio.gather(*(write(i) for i in range(rows)))
+    await batcher.close()
+    return batcher
+
+
+async def run(label: str, tuned: bool, batched: bool, rows: int, concurrency: int) -> None:
+    with tempfile.TemporaryDirectory() as tmp:
+        engine = make_engine(f"sqlite+aiosqlite:///{os.path.join(tmp, 'bench.db')}", sqlite_tuning=tuned)
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+        session_factory = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+
+        start = time.perf_counter()
+        extra = ""
+        if batched:
+            batcher = await _batched(session_factory, rows, concurrency)
+            extra = f"  ({batcher.batches} commits)"
+        else:
+            await _per_row_commits(session_factory, rows, concurrency)
+        elapsed = time.perf_counter() - start
+        await engine.dispose()
+    print(f"{label:<34} {elapsed * 1000:9.1f} ms  {rows / elapsed:10.0f} rows/s{extra}")
+
+
+async def main(rows: int, concurrency: int) -> None:
+    print(f"{rows} PaperView inserts, {concurrency} concurrent writers\n")
+    await run("default journal, commit per row", tuned=False, batched=False, rows=rows, concurrency=concurrency)
+    await run("WAL + pragmas, commit per row", tuned=True, batched=False, rows=rows, concurrency=concurrency)
+    await run("WAL + pragmas, group commit", tuned=True, batched=True, rows=rows, concurrency=concurrency)
+
+
+if __name__ == "__main__":
+    rows = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 32
+    asyncio.run(main(rows, concurrency))
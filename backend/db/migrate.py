@@ -0,0 +1,33 @@
+import os
+import logging
+
+from alembic import command
+from alembic.config import Config
+from alembic.runtime.migration import MigrationContext
+from sqlalchemy import inspect
+
+logger = logging.getLogger(__name__)
+
+ALEMBIC_INI = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "alembic.ini")
+# Schema that create_all produced before migrations existed
+BASELINE_REVISION = "0001"
+
+
+def upgrade_database(connection) -> None:
+    """
+    Apply pending migrations on a sync connection, i.e. through
+    `AsyncConnection.run_sync` at startup.
+
+    Databases created by the old create_all path have tables but no
+    alembic_version; they are stamped at the baseline first. create_all
+    added new tables but never new columns, so such a database can be
+    anywhere between the baseline and the current models; the revisions
+    that follow the baseline only build what is missing.
+    """
+    config = Config(ALEMBIC_INI)
+    config.attributes["connection"] = connection
+    current = MigrationContext.configure(connection).get_current_revision()
+    if current is None and inspect(connection).has_table("users"):
+        logger.info(f"Existing unversioned database; stamping revision {BASELINE_REVISION}")
+        command.stamp(config, BASELINE_REVISION)
+    command.upgrade(config, "head")
@@ -1,7 +1,11 @@
-from sqlalchemy import Boolean, Column, ForeignKey, Integer, String, DateTime, Text, JSON
+from sqlalchemy import Boolean, Column, ForeignKey, Index, Integer, String, DateTime, Text, JSON, UniqueConstraint
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from db.session import Base
+import datetime
+
+def utcnow():
+    return datetime.datetime.utcnow()
 
 class User(Base):
     __tablename__ = "users"
@@ -29,6 +33,10 @@ class Profile(Base):
 
 class PromptTemplate(Base):
     __tablename__ = "prompt_templates"
+    __table_args__ = (
+        # Active-template lookup on every summarize/ELI5/chat request
+        Index("ix_prompt_templates_user_id_type_is_active", "user_id", "type", "is_active"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
@@ -37,6 +45,7 @@ class PromptTemplate(Base):
     content = Column(Text)
     model = Column(String, nullable=True) # Specific model for this template
     is_active = Column(Boolean, default=False)
+    cache_enabled = Column(Boolean, default=True) # Reuse cached answers for identical inputs
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
     user = relationship("User", back_populates="templates")
@@ -48,7 +57,7 @@ class Collection(Base):
     __tablename__ = "collections"
 
     id = Column(Integer, primary_key=True, index=True)
-    user_id = Column(Integer, ForeignKey("users.id"))
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
     name = Column(String)
     description = Column(String, nullable=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
@@ -56,32 +65,74 @@ class Collection(Base):
     user = relationship("User", back_populates="collections")
     items = relationship("CollectionItem", back_populates="collection")
 
+class Paper(Base):
+    __tablename__ = "papers"
+
+    id = Column(Integer, primary_key=True, index=True)
+    arxiv_id = Column(String, unique=True, index=True) # e.g. "2310.12345" (no version suffix)
+    version = Column(Integer, default=1)
+    title = Column(String)
+    summary = Column(Text)
+    authors = Column(JSON, default=list)
+    published = Column(String, nullable=True) # ISO 8601 as returned by arXiv
+    pdf_url = Column(String, nullable=True)
+    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+
 class CollectionItem(Base):
     __tablename__ = "collection_items"
+    __table_args__ = (
+        UniqueConstraint("collection_id", "paper_id", name="uq_collection_items_collection_paper"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     collection_id = Column(Integer, ForeignKey("collections.id"))
-    paper_id = Column(String)
-    paper_title = Column(String)
-    paper_summary = Column(Text)
+    paper_id = Column(String, ForeignKey("papers.arxiv_id"), index=True)
+    # Client-supplied metadata for ids arXiv can't resolve; kept on the item
+    # so one user's values never show up in anyone else's collections
+    title_override = Column(String, nullable=True)
+    summary_override = Column(Text, nullable=True)
     added_at = Column(DateTime(timezone=True), server_default=func.now())
 
     collection = relationship("Collection", back_populates="items")
+    paper = relationship("Paper", lazy="joined")
+
+    # Paper metadata lives once in `papers`; these keep the API shape unchanged
+    @property
+    def paper_title(self):
+        if self.title_override is not None:
+            return self.title_override
+        return self.paper.title if self.paper else None
+
+    @property
+    def paper_summary(self):
+        if self.summary_override is not None:
+            return self.summary_override
+        return self.paper.summary if self.paper else None
 
 class ChatSession(Base):
     __tablename__ = "chat_sessions"
+    __table_args__ = (
+        # Sidebar listing: a user's sessions by most recent activity
+        Index("ix_chat_sessions_user_id_updated_at", "user_id", "updated_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
     title = Column(String)
+    history_summary = Column(Text, nullable=True) # Rolling summary of older turns
+    summary_until_id = Column(Integer, default=0) # Last ChatMessage.id folded into the summary
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    updated_at = Column(DateTime(timezone=True), server_default=func.now(), onupdate=func.now())
+    # Python-side timestamps keep one stored format, which keyset pagination compares on
+    updated_at = Column(DateTime(timezone=True), default=utcnow, server_default=func.now(), onupdate=utcnow)
 
     user = relationship("User", back_populates="chat_sessions")
-    messages = relationship("ChatMessage", back_populates="session", cascade="all, delete-orphan")
+    messages = relationship("ChatMessage", back_populates="session", cascade="all, delete-orphan", order_by="ChatMessage.id")
 
 class ChatMessage(Base):
     __tablename__ = "chat_messages"
+    __table_args__ = (
+        Index("ix_chat_messages_session_id_created_at", "session_id", "created_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     session_id = Column(Integer, ForeignKey("chat_sessions.id"))
@@ -99,10 +150,38 @@ User.paper_views = relationship("PaperView", back_populates="user")
 
 class PaperView(Base):
     __tablename__ = "paper_views"
+    __table_args__ = (
+        # Recently viewed papers per user
+        Index("ix_paper_views_user_id_viewed_at", "user_id", "viewed_at"),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     user_id = Column(Integer, ForeignKey("users.id"))
-    paper_id = Column(String)
+    paper_id = Column(String, ForeignKey("papers.arxiv_id"), index=True)
     viewed_at = Column(DateTime(timezone=True), server_default=func.now())
 
     user = relationship("User", back_populates="paper_views")
+    paper = relationship("Paper")
+
+class RefreshToken(Base):
+    __tablename__ = "refresh_tokens"
+
+    id = Column(Integer, primary_key=True, index=True)
+    user_id = Column(Integer, ForeignKey("users.id"), index=True)
+    token_hash = Column(String, unique=True, index=True) # sha256 of the opaque token; the token itself is never stored
+    family_id = Column(String, index=True) # Shared by every rotation of one login, so reuse revokes the whole chain
+    created_at = Column(DateTime(timezone=True), default=utcnow)
+    expires_at = Column(DateTime(timezone=True))
+    revoked_at = Column(DateTime(timezone=True), nullable=True)
+
+class LLMResponseCache(Base):
+    __tablename__ = "llm_response_cache"
+
+    id = Column(Integer, primary_key=True, index=True)
+    cache_key = Column(String, unique=True, index=True) # sha256 of (model, system_instruction, prompt)
+    endpoint = Column(String) # e.g. "summarize", "eli5"
+    model = Column(String)
+    response = Column(Text)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    last_used_at = Column(DateTime(timezone=True), server_default=func.now(), index=True)
+    expires_at = Column(DateTime(timezone=True), index=True)
@@ -1,14 +1,43 @@
-from fastapi import FastAPI, Request
-import time
+import asyncio
+from contextlib import asynccontextmanager
+from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from db.session import engine
-from db import models
-from api.routers import auth, user, research, collections, chat
+from db.migrate import upgrade_database
+from api.middleware import RequestMetricsMiddleware
+from api.routers import auth, user, research, collections, chat, papers, library, metrics
+from services.http_client import init_http_client, close_http_client
+from services.pdf_service import shutdown_pdf_executor
+from services.pdf_cache import pdf_cache
+from services.password_service import shutdown_password_executor
+from services.llm_executor import llm_executor
+from services.library_search import init_library_index
+from services.write_batcher import paper_view_writer
+from services.metrics import instrument_engine
+from utils.log import configure_logging
 
-# Create Database Tables
-models.Base.metadata.create_all(bind=engine)
+configure_logging()
+instrument_engine(engine)
 
-app = FastAPI(title="Synapse API", description="Backend for Synapse Research Tool")
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Bring the schema up to date (Alembic migrations in migrations/)
+    async with engine.begin() as conn:
+        await conn.run_sync(upgrade_database)
+        await conn.run_sync(init_library_index)
+    # One pooled keep-alive client shared by arXiv search and PDF downloads
+    await init_http_client()
+    # Size/recency index of the on-disk PDF cache, built once instead of per write
+    await asyncio.to_thread(pdf_cache.load_index)
+    yield
+    await close_http_client()
+    shutdown_pdf_executor()
+    shutdown_password_executor()
+    llm_executor.shutdown()
+    await paper_view_writer.close()
+    await engine.dispose()
+
+app = FastAPI(title="Synapse API", description="Backend for Synapse Research Tool", lifespan=lifespan)
 
 # CORS Configuration
 app.add_middleware(
@@ -19,14 +48,8 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Logging Middleware
-@app.middleware("http")
-async def log_requests(request: Request, call_next):
-    start_time = time.time()
-    response = await call_next(request)
-    process_time = time.time() - start_time
-    print(f"[{request.method}] {request.url} - {response.status_code} - {process_time:.4f}s")
-    return response
+# Request metrics and access logging (outermost, so it times CORS too)
+app.add_middleware(RequestMetricsMiddleware)
 
 # Include Routers
 app.include_router(auth.router)
@@ -34,6 +57,9 @@ app.include_router(user.router)
 app.include_router(research.router)
 app.include_router(collections.router)
 app.include_router(chat.router)
+app.include_router(papers.router)
+app.include_router(library.router)
+app.include_router(metrics.router)
 
 @app.get("/")
 async def root():
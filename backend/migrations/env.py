@@ -0,0 +1,60 @@
+import asyncio
+from logging.config import fileConfig
+
+from alembic import context
+
+from db.session import Base, engine
+from db import models  # noqa: F401  (registers every table on Base.metadata)
+
+config = context.config
+# When the API runs migrations on startup it passes its own connection and
+# keeps its logging configuration
+connection = config.attributes.get("connection")
+if connection is None and config.config_file_name is not None:
+    fileConfig(config.config_file_name, disable_existing_loggers=False)
+
+target_metadata = Base.metadata
+
+
+def include_object(object, name, type_, reflected, compare_to):
+    # The FTS5 index and its shadow tables are managed by services/library_search.py
+    if type_ == "table" and name.startswith("library_fts"):
+        return False
+    return True
+
+
+def _configure(**kwargs) -> None:
+    context.configure(
+        target_metadata=target_metadata,
+        include_object=include_object,
+        # SQLite can't ALTER most constraints in place; batch mode rebuilds the table
+        render_as_batch=engine.dialect.name == "sqlite",
+        **kwargs,
+    )
+
+
+def run_migrations_offline() -> None:
+    _configure(url=engine.url.render_as_string(hide_password=False), literal_binds=True)
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+def do_run_migrations(sync_connection) -> None:
+    _configure(connection=sync_connection)
+    with context.begin_transaction():
+        context.run_migrations()
+
+
+async def run_async_migrations() -> None:
+    async with engine.connect() as async_connection:
+        await async_connection.run_sync(do_run_migrations)
+        await async_connection.commit()
+    await engine.dispose()
+
+
+if context.is_offline_mode():
+    run_migrations_offline()
+elif connection is not None:
+    do_run_migrations(connection)
+else:
+    asyncio.run(run_async_migrations())
@@ -0,0 +1,159 @@
+"""baseline schema
+
+The schema as the original create_all built it, before the papers table,
+the LLM response cache and chat summaries existed. Unversioned databases
+are stamped at this revision on startup; the revisions after it check what
+a later create_all may already have built.
+
+Revision ID: 0001
+Revises:
+Create Date: 2026-10-17 06:14:30.824553
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0001'
+down_revision = None
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    op.create_table('users',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('email', sa.String(), nullable=True),
+    sa.Column('hashed_password', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_users_email'), ['email'], unique=True)
+        batch_op.create_index(batch_op.f('ix_users_id'), ['id'], unique=False)
+
+    op.create_table('chat_sessions',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('title', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('chat_sessions', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_chat_sessions_id'), ['id'], unique=False)
+
+    op.create_table('collections',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('name', sa.String(), nullable=True),
+    sa.Column('description', sa.String(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('collections', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_collections_id'), ['id'], unique=False)
+
+    op.create_table('paper_views',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('paper_id', sa.String(), nullable=True),
+    sa.Column('viewed_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('paper_views', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_paper_views_id'), ['id'], unique=False)
+
+    op.create_table('profiles',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('full_name', sa.String(), nullable=True),
+    sa.Column('gemini_api_key', sa.String(), nullable=True),
+    sa.Column('profile_image', sa.String(), nullable=True),
+    sa.Column('preferred_model', sa.String(), nullable=True),
+    sa.Column('onboarding_data', sa.JSON(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id')
+    )
+    with op.batch_alter_table('profiles', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_profiles_id'), ['id'], unique=False)
+
+    op.create_table('prompt_templates',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=True),
+    sa.Column('name', sa.String(), nullable=True),
+    sa.Column('type', sa.String(), nullable=True),
+    sa.Column('content', sa.Text(), nullable=True),
+    sa.Column('model', sa.String(), nullable=True),
+    sa.Column('is_active', sa.Boolean(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('prompt_templates', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_prompt_templates_id'), ['id'], unique=False)
+
+    op.create_table('chat_messages',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('session_id', sa.Integer(), nullable=True),
+    sa.Column('role', sa.String(), nullable=True),
+    sa.Column('content', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.ForeignKeyConstraint(['session_id'], ['chat_sessions.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('chat_messages', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_chat_messages_id'), ['id'], unique=False)
+
+    op.create_table('collection_items',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('collection_id', sa.Integer(), nullable=True),
+    sa.Column('paper_id', sa.String(), nullable=True),
+    sa.Column('paper_title', sa.String(), nullable=True),
+    sa.Column('paper_summary', sa.Text(), nullable=True),
+    sa.Column('added_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+    sa.ForeignKeyConstraint(['collection_id'], ['collections.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('collection_items', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_collection_items_id'), ['id'], unique=False)
+
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('collection_items', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_collection_items_id'))
+
+    op.drop_table('collection_items')
+    with op.batch_alter_table('chat_messages', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_chat_messages_id'))
+
+    op.drop_table('chat_messages')
+    with op.batch_alter_table('prompt_templates', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_prompt_templates_id'))
+
+    op.drop_table('prompt_templates')
+    with op.batch_alter_table('profiles', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_profiles_id'))
+
+    op.drop_table('profiles')
+    with op.batch_alter_table('paper_views', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_paper_views_id'))
+
+    op.drop_table('paper_views')
+    with op.batch_alter_table('collections', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_collections_id'))
+
+    op.drop_table('collections')
+    with op.batch_alter_table('chat_sessions', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_chat_sessions_id'))
+
+    op.drop_table('chat_sessions')
+    with op.batch_alter_table('users', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_users_id'))
+        batch_op.drop_index(batch_op.f('ix_users_email'))
+
+    op.drop_table('users')
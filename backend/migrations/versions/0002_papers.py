@@ -0,0 +1,153 @@
+"""papers table
+
+arXiv metadata moves into one `papers` row per paper; collection items and
+paper views reference it by bare arXiv id instead of copying the title and
+abstract. Existing items are folded in before the copied columns go: their
+ids are normalised (no URL, no version suffix) and each paper gets a row
+built from the newest saved version's title and abstract.
+
+A database that create_all already brought part of the way (papers table
+present, old columns still there) is upgraded from wherever it stands.
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-17 07:02:11.480213
+"""
+import re
+
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0002'
+down_revision = '0001'
+branch_labels = None
+depends_on = None
+
+# services.arxiv_service.split_arxiv_id as of this revision; frozen so later
+# changes to the app can't alter what this migration does
+_ARXIV_ID_RE = re.compile(r"^(?:https?://(?:export\.)?arxiv\.org/(?:abs|pdf)/)?(?P<id>.+?)(?:v(?P<version>\d+))?(?:\.pdf)?$")
+
+papers = sa.table(
+    'papers',
+    sa.column('arxiv_id', sa.String),
+    sa.column('version', sa.Integer),
+    sa.column('title', sa.String),
+    sa.column('summary', sa.Text),
+    sa.column('authors', sa.JSON),
+)
+collection_items = sa.table(
+    'collection_items',
+    sa.column('id', sa.Integer),
+    sa.column('paper_id', sa.String),
+    sa.column('paper_title', sa.String),
+    sa.column('paper_summary', sa.Text),
+)
+paper_views = sa.table(
+    'paper_views',
+    sa.column('id', sa.Integer),
+    sa.column('paper_id', sa.String),
+)
+
+
+def _split_arxiv_id(raw_id):
+    match = _ARXIV_ID_RE.match(raw_id.strip())
+    if not match:
+        return raw_id.strip(), None
+    version = match.group('version')
+    return match.group('id'), int(version) if version else None
+
+
+def _normalise_paper_ids(bind, table) -> None:
+    for row in bind.execute(sa.select(table.c.id, table.c.paper_id).where(table.c.paper_id.isnot(None))).all():
+        arxiv_id, _ = _split_arxiv_id(row.paper_id)
+        if arxiv_id != row.paper_id:
+            bind.execute(table.update().where(table.c.id == row.id).values(paper_id=arxiv_id))
+
+
+def _copy_items_into_papers(bind) -> None:
+    known = set(bind.execute(sa.select(papers.c.arxiv_id)).scalars())
+    new_papers = {}
+    rows = bind.execute(sa.select(
+        collection_items.c.paper_id, collection_items.c.paper_title, collection_items.c.paper_summary
+    ).where(collection_items.c.paper_id.isnot(None))).all()
+    for row in rows:
+        arxiv_id, version = _split_arxiv_id(row.paper_id)
+        if arxiv_id in known:
+            continue
+        version = version or 1
+        current = new_papers.get(arxiv_id)
+        if current is None or version > current['version']:
+            new_papers[arxiv_id] = {
+                'arxiv_id': arxiv_id,
+                'version': version,
+                'title': row.paper_title,
+                'summary': row.paper_summary,
+                'authors': [],
+            }
+    if new_papers:
+        bind.execute(papers.insert(), list(new_papers.values()))
+
+
+def upgrade() -> None:
+    bind = op.get_bind()
+    inspector = sa.inspect(bind)
+
+    if not inspector.has_table('papers'):
+        op.create_table('papers',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('arxiv_id', sa.String(), nullable=True),
+        sa.Column('version', sa.Integer(), nullable=True),
+        sa.Column('title', sa.String(), nullable=True),
+        sa.Column('summary', sa.Text(), nullable=True),
+        sa.Column('authors', sa.JSON(), nullable=True),
+        sa.Column('published', sa.String(), nullable=True),
+        sa.Column('pdf_url', sa.String(), nullable=True),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+        )
+        with op.batch_alter_table('papers', schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_papers_arxiv_id'), ['arxiv_id'], unique=True)
+            batch_op.create_index(batch_op.f('ix_papers_id'), ['id'], unique=False)
+
+    item_columns = {column['name'] for column in inspector.get_columns('collection_items')}
+    if 'paper_title' in item_columns:
+        _copy_items_into_papers(bind)
+    _normalise_paper_ids(bind, collection_items)
+    _normalise_paper_ids(bind, paper_views)
+
+    for table in ('collection_items', 'paper_views'):
+        has_fk = any(fk['referred_table'] == 'papers' for fk in inspector.get_foreign_keys(table))
+        has_index = f'ix_{table}_paper_id' in {index['name'] for index in inspector.get_indexes(table)}
+        with op.batch_alter_table(table, schema=None) as batch_op:
+            if table == 'collection_items' and 'paper_title' in item_columns:
+                batch_op.drop_column('paper_title')
+                batch_op.drop_column('paper_summary')
+            if not has_fk:
+                batch_op.create_foreign_key(f'fk_{table}_paper_id_papers', 'papers', ['paper_id'], ['arxiv_id'])
+            if not has_index:
+                batch_op.create_index(batch_op.f(f'ix_{table}_paper_id'), ['paper_id'], unique=False)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('paper_views', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_paper_views_paper_id'))
+        batch_op.drop_constraint('fk_paper_views_paper_id_papers', type_='foreignkey')
+
+    with op.batch_alter_table('collection_items', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('paper_title', sa.String(), nullable=True))
+        batch_op.add_column(sa.Column('paper_summary', sa.Text(), nullable=True))
+        batch_op.drop_index(batch_op.f('ix_collection_items_paper_id'))
+        batch_op.drop_constraint('fk_collection_items_paper_id_papers', type_='foreignkey')
+
+    op.execute(
+        "UPDATE collection_items SET "
+        "paper_title = (SELECT title FROM papers WHERE papers.arxiv_id = collection_items.paper_id), "
+        "paper_summary = (SELECT summary FROM papers WHERE papers.arxiv_id = collection_items.paper_id)"
+    )
+
+    with op.batch_alter_table('papers', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_papers_id'))
+        batch_op.drop_index(batch_op.f('ix_papers_arxiv_id'))
+
+    op.drop_table('papers')
@@ -0,0 +1,57 @@
+"""llm response cache
+
+Stored summarize/ELI5 answers keyed by a hash of (model, system
+instruction, prompt), and a per-template cache_enabled switch. Skips
+whatever create_all already built.
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-17 07:02:48.117902
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0003'
+down_revision = '0002'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    inspector = sa.inspect(op.get_bind())
+
+    if not inspector.has_table('llm_response_cache'):
+        op.create_table('llm_response_cache',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('cache_key', sa.String(), nullable=True),
+        sa.Column('endpoint', sa.String(), nullable=True),
+        sa.Column('model', sa.String(), nullable=True),
+        sa.Column('response', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+        sa.Column('last_used_at', sa.DateTime(timezone=True), server_default=sa.text('(CURRENT_TIMESTAMP)'), nullable=True),
+        sa.Column('expires_at', sa.DateTime(timezone=True), nullable=True),
+        sa.PrimaryKeyConstraint('id')
+        )
+        with op.batch_alter_table('llm_response_cache', schema=None) as batch_op:
+            batch_op.create_index(batch_op.f('ix_llm_response_cache_cache_key'), ['cache_key'], unique=True)
+            batch_op.create_index(batch_op.f('ix_llm_response_cache_expires_at'), ['expires_at'], unique=False)
+            batch_op.create_index(batch_op.f('ix_llm_response_cache_id'), ['id'], unique=False)
+            batch_op.create_index(batch_op.f('ix_llm_response_cache_last_used_at'), ['last_used_at'], unique=False)
+
+    if 'cache_enabled' not in {column['name'] for column in inspector.get_columns('prompt_templates')}:
+        with op.batch_alter_table('prompt_templates', schema=None) as batch_op:
+            batch_op.add_column(sa.Column('cache_enabled', sa.Boolean(), nullable=True))
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('prompt_templates', schema=None) as batch_op:
+        batch_op.drop_column('cache_enabled')
+
+    with op.batch_alter_table('llm_response_cache', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_llm_response_cache_last_used_at'))
+        batch_op.drop_index(batch_op.f('ix_llm_response_cache_id'))
+        batch_op.drop_index(batch_op.f('ix_llm_response_cache_expires_at'))
+        batch_op.drop_index(batch_op.f('ix_llm_response_cache_cache_key'))
+
+    op.drop_table('llm_response_cache')
@@ -0,0 +1,33 @@
+"""chat history summary
+
+Rolling summary of older chat turns, and the last message id folded into
+it. Existing sessions start with no summary.
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-17 07:03:20.664015
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0004'
+down_revision = '0003'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    columns = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('chat_sessions')}
+    with op.batch_alter_table('chat_sessions', schema=None) as batch_op:
+        if 'history_summary' not in columns:
+            batch_op.add_column(sa.Column('history_summary', sa.Text(), nullable=True))
+        if 'summary_until_id' not in columns:
+            batch_op.add_column(sa.Column('summary_until_id', sa.Integer(), nullable=True))
+    op.execute("UPDATE chat_sessions SET summary_until_id = 0 WHERE summary_until_id IS NULL")
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('chat_sessions', schema=None) as batch_op:
+        batch_op.drop_column('summary_until_id')
+        batch_op.drop_column('history_summary')
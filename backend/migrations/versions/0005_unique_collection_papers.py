@@ -0,0 +1,35 @@
+"""unique collection papers
+
+One row per paper per collection. Duplicates saved before the constraint
+(including ones that only became duplicates when 0002 normalised their
+ids) are collapsed onto the earliest row first.
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-17 07:03:52.290476
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0005'
+down_revision = '0004'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    constraints = {constraint['name'] for constraint in sa.inspect(op.get_bind()).get_unique_constraints('collection_items')}
+    if 'uq_collection_items_collection_paper' in constraints:
+        return
+    op.execute(
+        "DELETE FROM collection_items WHERE id NOT IN "
+        "(SELECT MIN(id) FROM collection_items GROUP BY collection_id, paper_id)"
+    )
+    with op.batch_alter_table('collection_items', schema=None) as batch_op:
+        batch_op.create_unique_constraint('uq_collection_items_collection_paper', ['collection_id', 'paper_id'])
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('collection_items', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_collection_items_collection_paper', type_='unique')
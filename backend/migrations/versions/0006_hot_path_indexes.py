@@ -0,0 +1,52 @@
+"""hot path indexes
+
+Composite indexes for the per-user listings and lookups the routers run on
+every request. collection_items (collection_id, paper_id) is already
+covered by uq_collection_items_collection_paper.
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-17 06:14:43.952203
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0006'
+down_revision = '0005'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    with op.batch_alter_table('chat_messages', schema=None) as batch_op:
+        batch_op.create_index('ix_chat_messages_session_id_created_at', ['session_id', 'created_at'], unique=False)
+
+    with op.batch_alter_table('chat_sessions', schema=None) as batch_op:
+        batch_op.create_index('ix_chat_sessions_user_id_updated_at', ['user_id', 'updated_at'], unique=False)
+
+    with op.batch_alter_table('collections', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_collections_user_id'), ['user_id'], unique=False)
+
+    with op.batch_alter_table('paper_views', schema=None) as batch_op:
+        batch_op.create_index('ix_paper_views_user_id_viewed_at', ['user_id', 'viewed_at'], unique=False)
+
+    with op.batch_alter_table('prompt_templates', schema=None) as batch_op:
+        batch_op.create_index('ix_prompt_templates_user_id_type_is_active', ['user_id', 'type', 'is_active'], unique=False)
+
+
+def downgrade() -> None:
+    with op.batch_alter_table('prompt_templates', schema=None) as batch_op:
+        batch_op.drop_index('ix_prompt_templates_user_id_type_is_active')
+
+    with op.batch_alter_table('paper_views', schema=None) as batch_op:
+        batch_op.drop_index('ix_paper_views_user_id_viewed_at')
+
+    with op.batch_alter_table('collections', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_collections_user_id'))
+
+    with op.batch_alter_table('chat_sessions', schema=None) as batch_op:
+        batch_op.drop_index('ix_chat_sessions_user_id_updated_at')
+
+    with op.batch_alter_table('chat_messages', schema=None) as batch_op:
+        batch_op.drop_index('ix_chat_messages_session_id_created_at')
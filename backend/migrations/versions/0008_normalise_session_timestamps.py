@@ -0,0 +1,35 @@
+"""normalise session timestamps
+
+Chat sessions are paged by (updated_at, id). Rows written before
+updated_at was set in Python hold SQLite's second-precision
+CURRENT_TIMESTAMP ("2026-10-17 06:41:01"), while SQLAlchemy stores and
+binds "2026-10-17 06:41:01.000000"; the two never compare equal, so a
+cursor on such a row returned it again on every page. Rewrite them in
+SQLAlchemy's storage format. Other databases store a real timestamp type.
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-17 07:31:06.205377
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0008'
+down_revision = '0007'
+branch_labels = None
+depends_on = None
+
+
+def upgrade() -> None:
+    if op.get_bind().dialect.name != 'sqlite':
+        return
+    op.execute(
+        "UPDATE chat_sessions SET updated_at = updated_at || '.000000' "
+        "WHERE length(updated_at) = 19"
+    )
+
+
+def downgrade() -> None:
+    # The normalised values are still valid timestamps
+    pass
@@ -0,0 +1,57 @@
+"""collection item overrides
+
+Title and abstract supplied by a client are stored on the collection item
+instead of in the shared `papers` row, so they only show in that user's
+collection. `papers` rows that never came from arXiv (no published date:
+created from client metadata, or folded in by 0002) hand their title and
+abstract to the items that reference them and become bare placeholders,
+which a later lookup can fill from arXiv. The library search index is
+dropped so startup rebuilds it from the per-item values.
+
+Revision ID: 0009
+Revises: 0008
+Create Date: 2026-10-17 09:12:44.518230
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+revision = '0009'
+down_revision = '0008'
+branch_labels = None
+depends_on = None
+
+_CLIENT_PAPERS = "SELECT arxiv_id FROM papers WHERE published IS NULL AND (title IS NOT NULL OR summary IS NOT NULL)"
+
+
+def upgrade() -> None:
+    columns = {column['name'] for column in sa.inspect(op.get_bind()).get_columns('collection_items')}
+    with op.batch_alter_table('collection_items', schema=None) as batch_op:
+        if 'title_override' not in columns:
+            batch_op.add_column(sa.Column('title_override', sa.String(), nullable=True))
+        if 'summary_override' not in columns:
+            batch_op.add_column(sa.Column('summary_override', sa.Text(), nullable=True))
+
+    op.execute(
+        "UPDATE collection_items SET "
+        "title_override = (SELECT p.title FROM papers p WHERE p.arxiv_id = collection_items.paper_id), "
+        "summary_override = (SELECT p.summary FROM papers p WHERE p.arxiv_id = collection_items.paper_id) "
+        f"WHERE paper_id IN ({_CLIENT_PAPERS})"
+    )
+    op.execute("UPDATE papers SET title = NULL, summary = NULL WHERE published IS NULL")
+
+    if op.get_bind().dialect.name == 'sqlite':
+        # services/library_search.py recreates and backfills it on startup
+        op.execute("DROP TABLE IF EXISTS library_fts")
+
+
+def downgrade() -> None:
+    op.execute(
+        "UPDATE papers SET "
+        "title = (SELECT MAX(ci.title_override) FROM collection_items ci WHERE ci.paper_id = papers.arxiv_id), "
+        "summary = (SELECT MAX(ci.summary_override) FROM collection_items ci WHERE ci.paper_id = papers.arxiv_id) "
+        "WHERE published IS NULL"
+    )
+    with op.batch_alter_table('collection_items', schema=None) as batch_op:
+        batch_op.drop_column('summary_override')
+        batch_op.drop_column('title_override')
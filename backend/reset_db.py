@@ -6,8 +6,14 @@ This is useful after adding new columns to existing tables.
 IMPORTANT: This will DELETE all existing data!
 """
 import os
-from db.session import engine, Base
-from db.models import User, Profile, Collection, CollectionItem, PromptTemplate
+import asyncio
+from db.session import engine
+from db.migrate import upgrade_database
+
+async def create_tables():
+    async with engine.begin() as conn:
+        await conn.run_sync(upgrade_database)
+    await engine.dispose()
 
 def reset_database():
     db_path = "synapse.db"
@@ -29,7 +35,7 @@ def reset_database():
             return
     
     # Create all tables with new schema
-    Base.metadata.create_all(bind=engine)
+    asyncio.run(create_tables())
     print("✅ Database recreated with latest schema!")
     print("\nℹ️  You can now start the backend server.")
 
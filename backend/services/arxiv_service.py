@@ -1,10 +1,41 @@
-import httpx
+import re
 import xml.etree.ElementTree as ET
+from services.http_client import get_http_client
+from services.metrics import time_upstream
 
 ARXIV_API_URL = "https://export.arxiv.org/api/query"
+# Ids per `id_list` lookup; keeps the GET URL short (~1 KB) for large batches
+ARXIV_ID_BATCH = 100
 
 import random
 
+_ARXIV_ID_RE = re.compile(r"^(?:https?://(?:export\.)?arxiv\.org/(?:abs|pdf)/)?(?P<id>.+?)(?:v(?P<version>\d+))?(?:\.pdf)?$")
+
+def split_arxiv_id(raw_id: str):
+    """
+    Split an arXiv identifier or abs/pdf URL into (id, version).
+
+    "http://arxiv.org/abs/2310.12345v2" -> ("2310.12345", 2)
+    "hep-th/9901001" -> ("hep-th/9901001", None)
+    """
+    match = _ARXIV_ID_RE.match(raw_id.strip())
+    if not match:
+        return raw_id.strip(), None
+    version = match.group("version")
+    return match.group("id"), int(version) if version else None
+
+# Bare identifiers arXiv can resolve: "2310.12345" (and "0704.0001"-style
+# four-digit numbers) or the pre-2007 "archive(.SUBJ)/YYMMNNN" scheme
+_ARXIV_BARE_ID_RE = re.compile(r"^(?:\d{4}\.\d{4,5}|[a-z]+(?:-[a-z]+)*(?:\.[A-Z]{2})?/\d{7})$")
+
+def is_valid_arxiv_id(arxiv_id: str) -> bool:
+    """True for a bare arXiv id as returned by `split_arxiv_id` (no version)."""
+    return bool(_ARXIV_BARE_ID_RE.match(arxiv_id))
+
+def normalize_search_params(query: str, start: int = 0, max_results: int = 10, sort_by: str = "submittedDate", sort_order: str = "descending"):
+    """Canonical form of a search so equivalent requests share one cache entry."""
+    return (" ".join(query.split()), int(start), int(max_results), sort_by.strip(), sort_order.strip().lower())
+
 async def search_arxiv(query: str, start: int = 0, max_results: int = 10, sort_by: str = "submittedDate", sort_order: str = "descending"):
     params = {
         "search_query": f"all:{query}",
@@ -14,11 +45,29 @@ async def search_arxiv(query: str, start: int = 0, max_results: int = 10, sort_b
         "sortOrder": sort_order
     }
     
-    async with httpx.AsyncClient(follow_redirects=True) as client:
+    client = get_http_client()
+    with time_upstream("arxiv_fetch"):
         response = await client.get(ARXIV_API_URL, params=params)
         response.raise_for_status()
         
-    return parse_arxiv_response(response.text)
+    return parse_arxiv_response(response.content)
+
+async def fetch_arxiv_papers(arxiv_ids: list):
+    """
+    Look papers up directly by arXiv id (uses the `id_list` API).
+
+    Large lists are split into sequential requests of ARXIV_ID_BATCH ids.
+    """
+    papers = []
+    client = get_http_client()
+    for start in range(0, len(arxiv_ids), ARXIV_ID_BATCH):
+        chunk = arxiv_ids[start:start + ARXIV_ID_BATCH]
+        params = {"id_list": ",".join(chunk), "max_results": len(chunk)}
+        with time_upstream("arxiv_fetch"):
+            response = await client.get(ARXIV_API_URL, params=params)
+            response.raise_for_status()
+        papers.extend(parse_arxiv_response(response.content))
+    return papers
 
 async def get_random_paper():
     topics = [
@@ -37,20 +86,109 @@ async def get_random_paper():
         return random.choice(papers)
     return None
 
-def parse_arxiv_response(xml_data: str):
-    root = ET.fromstring(xml_data)
-    ns = {'atom': 'http://www.w3.org/2005/Atom', 'arxiv': 'http://arxiv.org/schemas/atom'}
-    
-    papers = []
-    for entry in root.findall('atom:entry', ns):
-        paper = {
-            "id": entry.find('atom:id', ns).text,
-            "title": entry.find('atom:title', ns).text.strip().replace('\n', ' '),
-            "summary": entry.find('atom:summary', ns).text.strip().replace('\n', ' '),
-            "authors": [author.find('atom:name', ns).text for author in entry.findall('atom:author', ns)],
-            "published": entry.find('atom:published', ns).text,
-            "pdf_url": next((link.attrib['href'] for link in entry.findall('atom:link', ns) if link.attrib.get('title') == 'pdf'), None)
-        }
-        papers.append(paper)
-        
-    return papers
+_ATOM = "{http://www.w3.org/2005/Atom}"
+_ENTRY_TAG = _ATOM + "entry"
+_ID_TAG = _ATOM + "id"
+_TITLE_TAG = _ATOM + "title"
+_SUMMARY_TAG = _ATOM + "summary"
+_AUTHOR_TAG = _ATOM + "author"
+_NAME_TAG = _ATOM + "name"
+_PUBLISHED_TAG = _ATOM + "published"
+_LINK_TAG = _ATOM + "link"
+
+def _clean(text):
+    return text.strip().replace('\n', ' ') if text else ""
+
+def _entry_to_paper(entry) -> dict:
+    """Convert one Atom <entry> to a paper dict in a single pass over its children."""
+    raw_id = title = summary = published = pdf_url = None
+    authors = []
+    for child in entry:
+        tag = child.tag
+        if tag == _ID_TAG:
+            raw_id = child.text
+        elif tag == _TITLE_TAG:
+            title = child.text
+        elif tag == _SUMMARY_TAG:
+            summary = child.text
+        elif tag == _AUTHOR_TAG:
+            name = child.find(_NAME_TAG)
+            if name is not None:
+                authors.append(name.text)
+        elif tag == _PUBLISHED_TAG:
+            published = child.text
+        elif tag == _LINK_TAG and pdf_url is None and child.get('title') == 'pdf':
+            pdf_url = child.get('href')
+
+    arxiv_id, version = split_arxiv_id(raw_id or "")
+    return {
+        "id": raw_id,
+        "arxiv_id": arxiv_id,
+        "version": version or 1,
+        "title": _clean(title),
+        "summary": _clean(summary),
+        "authors": authors,
+        "published": published,
+        "pdf_url": pdf_url
+    }
+
+class ArxivFeedParser:
+    """
+    Incremental Atom parser: feed it raw bytes as they arrive and collect
+    completed papers. Finished entries are detached from the tree so memory
+    stays bounded by one entry regardless of feed size.
+    """
+
+    def __init__(self):
+        self._parser = ET.XMLPullParser(events=("start", "end"))
+        self._root = None
+
+    def feed(self, data: bytes) -> list:
+        self._parser.feed(data)
+        return self._drain()
+
+    def close(self) -> list:
+        self._parser.close()
+        return self._drain()
+
+    def _drain(self) -> list:
+        papers = []
+        for event, elem in self._parser.read_events():
+            if event == "start":
+                if self._root is None:
+                    self._root = elem
+            elif elem.tag == _ENTRY_TAG:
+                papers.append(_entry_to_paper(elem))
+                elem.clear()
+                if self._root is not None:
+                    self._root.remove(elem)
+        return papers
+
+async def stream_arxiv(query: str, start: int = 0, max_results: int = 10, sort_by: str = "submittedDate", sort_order: str = "descending"):
+    """Yield papers as soon as each <entry> has been received and parsed."""
+    params = {
+        "search_query": f"all:{query}",
+        "start": start,
+        "max_results": max_results,
+        "sortBy": sort_by,
+        "sortOrder": sort_order
+    }
+
+    parser = ArxivFeedParser()
+    client = get_http_client()
+    # Timed until the feed is fully received, including time spent by the consumer between papers
+    with time_upstream("arxiv_fetch"):
+        async with client.stream("GET", ARXIV_API_URL, params=params) as response:
+            response.raise_for_status()
+            async for chunk in response.aiter_bytes():
+                for paper in parser.feed(chunk):
+                    yield paper
+    for paper in parser.close():
+        yield paper
+
+def parse_arxiv_response(xml_data):
+    """Parse a complete Atom feed (str or bytes) into a list of paper dicts."""
+    if isinstance(xml_data, str):
+        xml_data = xml_data.encode("utf-8")
+    parser = ArxivFeedParser()
+    return parser.feed(xml_data) + parser.close()
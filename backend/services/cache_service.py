@@ -0,0 +1,306 @@
+import os
+import json
+import time
+import asyncio
+import hashlib
+import logging
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+SEARCH_CACHE_BACKEND = os.getenv("SEARCH_CACHE_BACKEND", "memory")  # "memory" or "redis"
+SEARCH_CACHE_TTL_SECONDS = int(os.getenv("SEARCH_CACHE_TTL_SECONDS", "600"))
+SEARCH_CACHE_MAX_ENTRIES = int(os.getenv("SEARCH_CACHE_MAX_ENTRIES", "2048"))
+SEARCH_CACHE_MAX_BYTES = int(os.getenv("SEARCH_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+REDIS_URL = os.getenv("REDIS_URL")
+
+
+def _estimate_size(value: Any) -> int:
+    """Approximate memory footprint of a cached value by its JSON size."""
+    try:
+        return len(json.dumps(value, default=str))
+    except (TypeError, ValueError):
+        return len(repr(value))
+
+
+class LRUCache:
+    """
+    In-process LRU cache with per-entry TTL and a bounded memory budget.
+
+    Entries are evicted least-recently-used first when either `max_entries`
+    or `max_bytes` is exceeded. Not thread-safe; intended for use from the
+    event loop.
+    """
+
+    def __init__(self, max_entries: int = 1024, max_bytes: Optional[int] = None, default_ttl: Optional[float] = None):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.default_ttl = default_ttl
+        self._data: "OrderedDict[str, tuple]" = OrderedDict()  # key -> (value, expires_at, size)
+        self.current_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: str) -> bool:
+        return self.get(key, count=False) is not None
+
+    def get(self, key: str, count: bool = True) -> Any:
+        entry = self._data.get(key)
+        if entry is None:
+            if count:
+                self.misses += 1
+            return None
+        value, expires_at, _ = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            self._remove(key)
+            self.expirations += 1
+            if count:
+                self.misses += 1
+            return None
+        self._data.move_to_end(key)
+        if count:
+            self.hits += 1
+        return value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        ttl = self.default_ttl if ttl is None else ttl
+        expires_at = time.monotonic() + ttl if ttl else None
+        size = _estimate_size(value) if self.max_bytes else 0
+        if self.max_bytes and size > self.max_bytes:
+            # Never worth evicting the whole cache for one oversized value
+            return
+        if key in self._data:
+            self._remove(key)
+        self._data[key] = (value, expires_at, size)
+        self.current_bytes += size
+        self._evict()
+
+    def delete(self, key: str) -> None:
+        if key in self._data:
+            self._remove(key)
+
+    def clear(self) -> None:
+        self._data.clear()
+        self.current_bytes = 0
+
+    def _remove(self, key: str) -> None:
+        _, _, size = self._data.pop(key)
+        self.current_bytes -= size
+
+    def _evict(self) -> None:
+        while self._data and (
+            len(self._data) > self.max_entries
+            or (self.max_bytes and self.current_bytes > self.max_bytes)
+        ):
+            key, (_, _, size) = self._data.popitem(last=False)
+            self.current_bytes -= size
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "entries": len(self._data),
+            "bytes": self.current_bytes,
+            "max_entries": self.max_entries,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+        }
+
+
+class MemoryCacheBackend:
+    """Async adapter around `LRUCache` so it can be swapped for Redis."""
+
+    name = "memory"
+
+    def __init__(self, max_entries: int, max_bytes: Optional[int] = None):
+        self._cache = LRUCache(max_entries=max_entries, max_bytes=max_bytes)
+
+    async def get(self, key: str) -> Any:
+        return self._cache.get(key, count=False)
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        self._cache.set(key, value, ttl)
+
+    async def delete(self, key: str) -> None:
+        self._cache.delete(key)
+
+    async def clear(self) -> None:
+        self._cache.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        return self._cache.stats()
+
+
+class RedisCacheBackend:
+    """
+    Redis-compatible backend. Values are stored as JSON with a native TTL.
+
+    `client` only needs async `get`, `set(key, value, ex=...)`, `delete` and
+    `scan_iter`, so `redis.asyncio.Redis` or any local stand-in works.
+    """
+
+    name = "redis"
+
+    def __init__(self, client, prefix: str = "synapse:"):
+        self.client = client
+        self.prefix = prefix
+
+    async def get(self, key: str) -> Any:
+        raw = await self.client.get(self.prefix + key)
+        if raw is None:
+            return None
+        return json.loads(raw)
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        await self.client.set(self.prefix + key, json.dumps(value, default=str), ex=int(ttl) if ttl else None)
+
+    async def delete(self, key: str) -> None:
+        await self.client.delete(self.prefix + key)
+
+    async def clear(self) -> None:
+        async for key in self.client.scan_iter(match=self.prefix + "*"):
+            await self.client.delete(key)
+
+    def stats(self) -> Dict[str, Any]:
+        # Size and eviction accounting is Redis' job (see INFO stats)
+        return {}
+
+
+class ResultCache:
+    """
+    Read-through cache with request coalescing.
+
+    Concurrent misses for the same key share a single in-flight fetch, so a
+    burst of identical requests produces one upstream call. If the caller
+    running the fetch is cancelled, its waiters retry rather than fail.
+    """
+
+    def __init__(self, backend, ttl: Optional[float] = None, name: str = "cache"):
+        self.backend = backend
+        self.ttl = ttl
+        self.name = name
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.errors = 0
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+    async def get_or_set(self, key: str, factory: Callable[[], Awaitable[Any]], ttl: Optional[float] = None) -> Any:
+        try:
+            cached = await self.backend.get(key)
+        except Exception as e:
+            # A broken cache must never break the request path
+            self.errors += 1
+            logger.warning(f"{self.name} cache read failed: {e}")
+            cached = None
+        if cached is not None:
+            self.hits += 1
+            return cached
+
+        inflight = self._inflight.get(key)
+        while inflight is not None:
+            self.coalesced += 1
+            try:
+                return await asyncio.shield(inflight)
+            except asyncio.CancelledError:
+                # The caller doing the fetch went away, not us: retry, and the
+                # first waiter back takes over the fill for the rest
+                if not inflight.cancelled() or asyncio.current_task().cancelling():
+                    raise
+            inflight = self._inflight.get(key)
+
+        self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            value = await factory()
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except BaseException as e:
+            future.set_exception(e)
+            # Mark retrieved so waiter-less failures don't log "never retrieved"
+            future.exception()
+            raise
+        else:
+            future.set_result(value)
+            if value is not None:
+                await self.set(key, value, ttl)
+            return value
+        finally:
+            self._inflight.pop(key, None)
+
+    async def get(self, key: str) -> Any:
+        """Plain lookup (counted) for callers that can't use `get_or_set`, e.g. streams."""
+        try:
+            value = await self.backend.get(key)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"{self.name} cache read failed: {e}")
+            value = None
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        try:
+            await self.backend.set(key, value, self.ttl if ttl is None else ttl)
+        except Exception as e:
+            self.errors += 1
+            logger.warning(f"{self.name} cache write failed: {e}")
+
+    async def invalidate(self, key: str) -> None:
+        await self.backend.delete(key)
+
+    async def clear(self) -> None:
+        await self.backend.clear()
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses + self.coalesced
+        return {
+            "backend": self.backend.name,
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "errors": self.errors,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            **self.backend.stats(),
+        }
+
+
+def make_cache_key(namespace: str, *parts: Any) -> str:
+    """Stable, fixed-length key for an arbitrary tuple of JSON-able parts."""
+    digest = hashlib.sha256(json.dumps(parts, default=str).encode("utf-8")).hexdigest()
+    return f"{namespace}:{digest}"
+
+
+def _build_backend(kind: str, max_entries: int, max_bytes: Optional[int]):
+    if kind == "redis":
+        if not REDIS_URL:
+            logger.warning("Redis cache backend requested but REDIS_URL is not set; using memory backend")
+        else:
+            try:
+                import redis.asyncio as redis
+                return RedisCacheBackend(redis.from_url(REDIS_URL))
+            except ImportError:
+                logger.warning("Redis cache backend requested but 'redis' is not installed; using memory backend")
+    return MemoryCacheBackend(max_entries=max_entries, max_bytes=max_bytes)
+
+
+search_cache = ResultCache(
+    _build_backend(SEARCH_CACHE_BACKEND, SEARCH_CACHE_MAX_ENTRIES, SEARCH_CACHE_MAX_BYTES),
+    ttl=SEARCH_CACHE_TTL_SECONDS,
+    name="search",
+)
@@ -0,0 +1,101 @@
+import os
+import logging
+from typing import List
+
+from dotenv import load_dotenv
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.models import ChatSession, ChatMessage
+from services.gemini_service import get_gemini_response
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Prompt budget for previous turns (summary + verbatim recent messages)
+CHAT_HISTORY_TOKEN_BUDGET = int(os.getenv("CHAT_HISTORY_TOKEN_BUDGET", "2000"))
+# When the budget is exceeded, older turns are folded until recent turns fit in this
+CHAT_HISTORY_TARGET_TOKENS = int(os.getenv("CHAT_HISTORY_TARGET_TOKENS", str(CHAT_HISTORY_TOKEN_BUDGET // 2)))
+CHAT_SUMMARY_MAX_TOKENS = int(os.getenv("CHAT_SUMMARY_MAX_TOKENS", "400"))
+# Upper bound on unsummarized rows loaded per turn (protects very old sessions)
+CHAT_HISTORY_MAX_MESSAGES = int(os.getenv("CHAT_HISTORY_MAX_MESSAGES", "100"))
+
+SUMMARY_INSTRUCTION = (
+    "You maintain a running summary of a conversation between a user and a research assistant. "
+    f"Merge the new turns into the existing summary in at most {CHAT_SUMMARY_MAX_TOKENS * 3 // 4} words. "
+    "Keep facts, paper names, decisions and open questions; drop pleasantries. Reply with the summary only."
+)
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 characters per token for English text)."""
+    return max(1, len(text) // 4) if text else 0
+
+
+def _format_turns(messages: List[ChatMessage]) -> str:
+    return "\n".join(f"{msg.role}: {msg.content}" for msg in messages)
+
+
+async def _fold_into_summary(session: ChatSession, messages: List[ChatMessage], api_key: str, model: str) -> str:
+    prompt = (
+        f"Existing summary:\n{session.history_summary or '(none)'}\n\n"
+        f"New turns:\n{_format_turns(messages)}"
+    )
+    return await get_gemini_response(
+        prompt, api_key=api_key, model=model, system_instruction=SUMMARY_INSTRUCTION, user_id=session.user_id
+    )
+
+
+async def build_chat_history(db: AsyncSession, session: ChatSession, current_message_id: int, api_key: str, model: str) -> List[dict]:
+    """
+    Return Gemini-ready history for `session` that fits CHAT_HISTORY_TOKEN_BUDGET.
+
+    Only turns newer than the stored rolling summary are loaded. When they
+    overflow the budget, the oldest are folded into `session.history_summary`
+    (one extra LLM call) until recent turns fit CHAT_HISTORY_TARGET_TOKENS, so
+    summarisation happens once every few turns rather than every turn.
+    """
+    query = select(ChatMessage).where(
+        ChatMessage.session_id == session.id,
+        ChatMessage.id != current_message_id
+    )
+    if session.summary_until_id:
+        query = query.where(ChatMessage.id > session.summary_until_id)
+    recent = (await db.scalars(query.order_by(ChatMessage.id.desc()).limit(CHAT_HISTORY_MAX_MESSAGES))).all()[::-1]
+
+    summary_tokens = estimate_tokens(session.history_summary or "")
+    total = summary_tokens + sum(estimate_tokens(msg.content) for msg in recent)
+
+    if total > CHAT_HISTORY_TOKEN_BUDGET and recent:
+        # Keep the newest turns that fit the target; fold everything older
+        kept, kept_tokens = [], 0
+        for msg in reversed(recent):
+            tokens = estimate_tokens(msg.content)
+            if kept and kept_tokens + tokens > CHAT_HISTORY_TARGET_TOKENS:
+                break
+            kept.append(msg)
+            kept_tokens += tokens
+        kept.reverse()
+        folded = recent[:len(recent) - len(kept)]
+
+        if folded:
+            try:
+                summary = await _fold_into_summary(session, folded, api_key, model)
+            except Exception as e:
+                # Fall back to plain truncation; try summarising again next turn
+                logger.warning(f"History summarisation failed for session {session.id}: {e}")
+            else:
+                session.history_summary = summary
+                session.summary_until_id = folded[-1].id
+                await db.commit()
+                logger.info(f"Folded {len(folded)} messages into summary for session {session.id}")
+            recent = kept
+
+    history = []
+    if session.history_summary:
+        history.append({"role": "user", "parts": [f"Summary of our conversation so far:\n{session.history_summary}"]})
+        history.append({"role": "assistant", "parts": ["Understood."]})
+    for msg in recent:
+        history.append({"role": msg.role, "parts": [msg.content]})
+    return history
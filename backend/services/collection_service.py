@@ -0,0 +1,159 @@
+import logging
+from typing import Dict, List, Tuple
+
+from sqlalchemy import delete, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.models import Collection, CollectionItem, utcnow
+from services.arxiv_service import split_arxiv_id
+from services.paper_service import insert_for, ensure_papers, get_papers, get_or_fetch_papers
+from services import library_search
+
+logger = logging.getLogger(__name__)
+
+ACTION_ADD = "add"
+ACTION_REMOVE = "remove"
+ACTION_MOVE = "move"
+
+STATUS_ADDED = "added"
+STATUS_REMOVED = "removed"
+STATUS_MOVED = "moved"
+STATUS_EXISTS = "exists"
+STATUS_NOT_IN_COLLECTION = "not_in_collection"
+STATUS_COLLECTION_NOT_FOUND = "collection_not_found"
+STATUS_PAPER_NOT_FOUND = "paper_not_found"
+
+Key = Tuple[int, str]
+
+
+async def apply_batch(db: AsyncSession, user_id: int, operations: List[dict]) -> List[dict]:
+    """
+    Apply add/remove/move operations for one user's collections atomically.
+
+    Each operation is a dict with `action`, `paper_id`, `collection_id` and,
+    for moves, `target_collection_id` (adds may carry `paper_title` /
+    `paper_summary`, used only for papers arXiv can't resolve). Operations are evaluated in order against the current
+    membership, then the net difference is written with one bulk DELETE and
+    one `INSERT ... ON CONFLICT DO NOTHING`, and committed once.
+
+    Returns one result dict per operation, in input order.
+    """
+    ops = [{**op, "paper_id": split_arxiv_id(op["paper_id"])[0]} for op in operations]
+    paper_ids = list(dict.fromkeys(op["paper_id"] for op in ops))
+
+    # One ownership check covering every collection the batch touches
+    collection_ids = {op["collection_id"] for op in ops}
+    collection_ids.update(op["target_collection_id"] for op in ops if op.get("target_collection_id") is not None)
+    owned = set(await db.scalars(select(Collection.id).where(
+        Collection.id.in_(collection_ids),
+        Collection.user_id == user_id
+    )))
+
+    existing: Dict[Key, CollectionItem] = {}
+    if owned:
+        rows = await db.scalars(select(CollectionItem).where(
+            CollectionItem.collection_id.in_(owned),
+            CollectionItem.paper_id.in_(paper_ids)
+        ))
+        existing = {(item.collection_id, item.paper_id): item for item in rows}
+
+    # Papers for adds are resolved locally or fetched from arXiv first, so no
+    # write lock is held across the request. Client metadata is ignored for
+    # papers arXiv knows and kept per item for the rest, which get a
+    # placeholder `papers` row. Nothing commits until the end of the batch.
+    adds = [op for op in ops if op["action"] == ACTION_ADD and op["collection_id"] in owned]
+    resolved = {paper.arxiv_id for paper in await get_or_fetch_papers(db, [op["paper_id"] for op in adds], commit=False)} if adds else set()
+    overrides: Dict[str, Tuple[str, str]] = {}
+    for op in adds:
+        if op["paper_id"] not in resolved and op.get("paper_title"):
+            overrides.setdefault(op["paper_id"], (op["paper_title"], op.get("paper_summary")))
+    await ensure_papers(db, list(overrides), commit=False)
+    known = resolved | set(overrides)
+
+    # Replay the batch in memory; `state` maps membership to the added_at and
+    # per-item metadata to keep
+    state = {key: (item.added_at, item.title_override, item.summary_override) for key, item in existing.items()}
+    writers: Dict[Key, int] = {}
+    results = []
+    for index, op in enumerate(ops):
+        action, paper_id, source = op["action"], op["paper_id"], op["collection_id"]
+        target = op.get("target_collection_id")
+        result = {"index": index, "action": action, "paper_id": paper_id, "collection_id": source, "item_id": None}
+        results.append(result)
+
+        if source not in owned or (action == ACTION_MOVE and target not in owned):
+            result["status"] = STATUS_COLLECTION_NOT_FOUND
+        elif action == ACTION_ADD:
+            if (source, paper_id) in state:
+                result["status"] = STATUS_EXISTS
+            elif paper_id not in known:
+                result["status"] = STATUS_PAPER_NOT_FOUND
+            else:
+                state[(source, paper_id)] = (None, *overrides.get(paper_id, (None, None)))
+                writers[(source, paper_id)] = index
+                result["status"] = STATUS_ADDED
+        elif (source, paper_id) not in state:
+            result["status"] = STATUS_NOT_IN_COLLECTION
+        elif action == ACTION_REMOVE:
+            del state[(source, paper_id)]
+            result["status"] = STATUS_REMOVED
+        else:
+            result["collection_id"] = target
+            if source != target:
+                kept = state.pop((source, paper_id))
+                if (target, paper_id) not in state:
+                    state[(target, paper_id)] = kept
+                    writers[(target, paper_id)] = index
+            result["status"] = STATUS_MOVED
+
+    deleted = [item.id for key, item in existing.items() if key not in state]
+    inserts = [key for key in state if key not in existing]
+
+    if deleted:
+        await library_search.remove_entries(db, library_search.KIND_PAPER, deleted)
+        await db.execute(delete(CollectionItem).where(CollectionItem.id.in_(deleted)))
+
+    if inserts:
+        insert = insert_for(db)
+        rows = []
+        for collection_id, paper_id in inserts:
+            added_at, title_override, summary_override = state[(collection_id, paper_id)]
+            rows.append({
+                "collection_id": collection_id,
+                "paper_id": paper_id,
+                "added_at": added_at or utcnow(),
+                "title_override": title_override,
+                "summary_override": summary_override,
+            })
+        stmt = insert(CollectionItem).values(rows)
+        stmt = stmt.on_conflict_do_nothing(
+            index_elements=[CollectionItem.collection_id, CollectionItem.paper_id]
+        ).returning(CollectionItem.id, CollectionItem.collection_id, CollectionItem.paper_id)
+        inserted = {(row.collection_id, row.paper_id): row.id for row in await db.execute(stmt)}
+
+        for key in inserts:
+            item_id = inserted.get(key)
+            if item_id is None:
+                # A concurrent request saved it first
+                results[writers[key]]["status"] = STATUS_EXISTS
+            else:
+                results[writers[key]]["item_id"] = item_id
+
+        papers = {paper.arxiv_id: paper for paper in await get_papers(db, list({key[1] for key in inserted}))}
+        entries = []
+        for (collection_id, paper_id), item_id in inserted.items():
+            _, title_override, summary_override = state[(collection_id, paper_id)]
+            paper = papers.get(paper_id)
+            entries.append({
+                "user_id": user_id,
+                "kind": library_search.KIND_PAPER,
+                "ref_id": item_id,
+                "parent_id": collection_id,
+                "title": title_override if title_override is not None else (paper.title if paper else None),
+                "body": summary_override if summary_override is not None else (paper.summary if paper else None),
+            })
+        await library_search.index_entries(db, entries)
+
+    await db.commit()
+    logger.info(f"Batch for user {user_id}: {len(ops)} operations, {len(inserts)} inserted, {len(deleted)} deleted")
+    return results
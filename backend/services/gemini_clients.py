@@ -0,0 +1,107 @@
+import os
+import logging
+import threading
+from collections import OrderedDict
+
+import google.ai.generativelanguage as glm
+import google.generativeai as genai
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+GEMINI_CLIENT_CACHE_KEYS = int(os.getenv("GEMINI_CLIENT_CACHE_KEYS", "256"))
+GEMINI_MODEL_CACHE_SIZE = int(os.getenv("GEMINI_MODEL_CACHE_SIZE", "512"))
+
+_CLIENT_CLASSES = {
+    "generative": glm.GenerativeServiceClient,
+    "model": glm.ModelServiceClient,
+}
+
+
+class GeminiClientRegistry:
+    """
+    Per-API-key Gemini clients and model handles, LRU-bounded.
+
+    `genai.configure` mutates process-global state, so two users with
+    different keys racing through it can end up sending requests with each
+    other's key. Instead every key gets its own `google.ai.generativelanguage`
+    service clients and `GenerativeModel` handles are bound to those clients
+    and reused across requests.
+
+    `GenerativeModel` has no public way to pass a client, so the binding sets
+    the attribute it otherwise fills lazily with the global default client;
+    requirements.txt pins the SDK to the 0.8 series this was checked against,
+    and an SDK without that attribute is refused rather than silently sharing
+    the global key.
+    """
+
+    def __init__(self, max_keys: int = GEMINI_CLIENT_CACHE_KEYS, max_models: int = GEMINI_MODEL_CACHE_SIZE):
+        self.max_keys = max_keys
+        self.max_models = max_models
+        self._clients: "OrderedDict[str, dict]" = OrderedDict()
+        self._models: "OrderedDict[tuple, genai.GenerativeModel]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _get_client(self, api_key: str, name: str):
+        # Caller holds the lock
+        clients = self._clients.get(api_key)
+        if clients is None:
+            clients = {}
+            self._clients[api_key] = clients
+            while len(self._clients) > self.max_keys:
+                self._clients.popitem(last=False)
+                self.evictions += 1
+        else:
+            self._clients.move_to_end(api_key)
+
+        client = clients.get(name)
+        if client is None:
+            client = _CLIENT_CLASSES[name](client_options={"api_key": api_key})
+            clients[name] = client
+        return client
+
+    def get_model(self, api_key: str, model_name: str) -> genai.GenerativeModel:
+        key = (api_key, model_name)
+        with self._lock:
+            model = self._models.get(key)
+            if model is not None:
+                self._models.move_to_end(key)
+                self.hits += 1
+                return model
+
+            self.misses += 1
+            model = genai.GenerativeModel(model_name)
+            if not hasattr(model, "_client"):
+                raise RuntimeError(
+                    f"google-generativeai {genai.__version__} doesn't support per-key clients; "
+                    "install the version pinned in requirements.txt"
+                )
+            # Bind the model to this key's client instead of the global default
+            model._client = self._get_client(api_key, "generative")
+            self._models[key] = model
+            while len(self._models) > self.max_models:
+                self._models.popitem(last=False)
+                self.evictions += 1
+            return model
+
+    def get_model_client(self, api_key: str):
+        """ModelService client for `genai.list_models(client=...)`."""
+        with self._lock:
+            return self._get_client(api_key, "model")
+
+    def stats(self) -> dict:
+        return {
+            "keys": len(self._clients),
+            "models": len(self._models),
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+        }
+
+
+gemini_clients = GeminiClientRegistry()
@@ -1,7 +1,15 @@
 import os
+import re
 import asyncio
 import logging
-import google.generativeai as genai
+import threading
+from typing import AsyncIterator, Optional
+from google.api_core import exceptions as google_exceptions
+from services.gemini_clients import gemini_clients
+from services.llm_executor import llm_executor
+from services.metrics import time_upstream
+from services.rate_limiter import gemini_limiter, RateLimitExceeded
+from services.retrieval_service import build_context
 from dotenv import load_dotenv
 from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
 from fastapi import HTTPException
@@ -12,11 +20,29 @@ load_dotenv()
 logger = logging.getLogger(__name__)
 
 GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-if GEMINI_API_KEY:
-    genai.configure(api_key=GEMINI_API_KEY)
 
 # Timeout constant
 GEMINI_TIMEOUT_SECONDS = 30
+GEMINI_RETRY_ATTEMPTS = int(os.getenv("GEMINI_RETRY_ATTEMPTS", "3"))
+# Upstream 429s: wait this long when Gemini gives no hint, and give up (429 to
+# the client) rather than hold a request open when it asks for longer than the max
+GEMINI_DEFAULT_BACKOFF_SECONDS = float(os.getenv("GEMINI_DEFAULT_BACKOFF_SECONDS", "5"))
+GEMINI_MAX_BACKOFF_SECONDS = float(os.getenv("GEMINI_MAX_BACKOFF_SECONDS", "20"))
+
+# What Gemini raises when the key is over quota or the service is shedding load
+UPSTREAM_RATE_LIMIT_ERRORS = (
+    google_exceptions.ResourceExhausted,
+    google_exceptions.TooManyRequests,
+    google_exceptions.ServiceUnavailable,
+)
+
+DEFAULT_SYSTEM_PROMPT = "You are a research assistant helping a user understand scientific papers."
+CONTEXT_INSTRUCTIONS = (
+    "Instructions:\n"
+    "1. Answer based on the context provided.\n"
+    "2. If the answer is not in the context, use your general knowledge but mention that it's not in the papers.\n"
+    "3. Be concise and helpful."
+)
 
 
 async def _generate_response_internal(
@@ -25,49 +51,164 @@ async def _generate_response_internal(
 ) -> str:
     """Internal function to generate response from Gemini."""
     try:
-        response = await asyncio.to_thread(chat.send_message, full_message)
+        # The SDK deadline matches ours, so a call we stop waiting for doesn't hold its thread much longer
+        with time_upstream("gemini"):
+            response = await llm_executor.run(
+                chat.send_message, full_message, request_options={"timeout": GEMINI_TIMEOUT_SECONDS}
+            )
         return response.text
     except Exception as e:
         logger.error(f"Gemini API error: {str(e)}")
         raise
 
 
+class GeminiRateLimited(RateLimitExceeded):
+    """Gemini itself answered 429/503; `retry_after` is its backoff hint."""
+
+    def __init__(self, retry_after: float):
+        super().__init__(retry_after, "upstream")
+
+
+def _backoff_hint(error: Exception) -> float:
+    """Seconds Gemini asked us to wait: RetryInfo details, else "retry in Ns" in the message."""
+    for detail in getattr(error, "details", None) or []:
+        delay = getattr(detail, "retry_delay", None)
+        if delay is not None:
+            return delay.seconds + delay.nanos / 1e9
+    match = re.search(r"retry in ([\d.]+)\s*s", str(error), re.IGNORECASE)
+    if match:
+        return float(match.group(1))
+    return GEMINI_DEFAULT_BACKOFF_SECONDS
+
+
+def _upstream_rate_limited(error: Exception, api_key: str) -> GeminiRateLimited:
+    delay = _backoff_hint(error)
+    # Everyone on this key waits, not just the caller that hit the limit
+    gemini_limiter.backoff(api_key, delay)
+    logger.warning(f"Gemini rate limited the key; backing off {delay:.1f}s")
+    return GeminiRateLimited(delay)
+
+
+def _too_many_requests(error: RateLimitExceeded) -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail="AI request rate limit reached. Please retry shortly.",
+        headers={"Retry-After": error.retry_after_header}
+    )
+
+
+_exponential_wait = wait_exponential(multiplier=1, min=2, max=10)
+
+
+def _retry_wait(retry_state) -> float:
+    # Honor the server's backoff hint; exponential backoff for everything else
+    error = retry_state.outcome.exception()
+    if isinstance(error, GeminiRateLimited):
+        return error.retry_after
+    return _exponential_wait(retry_state)
+
+
 @retry(
-    stop=stop_after_attempt(3),
-    wait=wait_exponential(multiplier=1, min=2, max=10),
-    retry=retry_if_exception_type((ConnectionError, TimeoutError)),
+    stop=stop_after_attempt(GEMINI_RETRY_ATTEMPTS),
+    wait=_retry_wait,
+    retry=retry_if_exception_type((ConnectionError, TimeoutError, GeminiRateLimited)),
     reraise=True
 )
 async def _get_gemini_response_with_retry(
     chat,
-    full_message: str
+    full_message: str,
+    api_key: str,
+    user_id: Optional[int] = None
 ) -> str:
     """Wrapper with retry logic for transient failures."""
     try:
-        # Apply timeout to the entire operation
-        response_text = await asyncio.wait_for(
-            _generate_response_internal(chat, full_message),
-            timeout=GEMINI_TIMEOUT_SECONDS
-        )
+        # Each attempt waits its turn on the key's limiter, so retries don't jump the queue
+        async with gemini_limiter.slot(api_key, user_id):
+            # Apply timeout to the entire operation
+            response_text = await asyncio.wait_for(
+                _generate_response_internal(chat, full_message),
+                timeout=GEMINI_TIMEOUT_SECONDS
+            )
         return response_text
+    except UPSTREAM_RATE_LIMIT_ERRORS as e:
+        error = _upstream_rate_limited(e, api_key)
+        if error.retry_after > GEMINI_MAX_BACKOFF_SECONDS:
+            raise _too_many_requests(error)
+        raise error
     except asyncio.TimeoutError as e:
         logger.error(f"Gemini request timed out after {GEMINI_TIMEOUT_SECONDS}s")
         raise HTTPException(
             status_code=504,
             detail=f"AI request timed out after {GEMINI_TIMEOUT_SECONDS} seconds. Please try a shorter query."
         )
+    except RateLimitExceeded:
+        raise
     except Exception as e:
         logger.error(f"Error in Gemini response generation: {str(e)}")
         raise
 
 
+def _require_api_key(api_key: str = None) -> str:
+    # Validate API key
+    active_key = api_key or GEMINI_API_KEY
+    if not active_key:
+        logger.error("No Gemini API key configured")
+        raise HTTPException(
+            status_code=400,
+            detail="Gemini API key not configured. Please add it in Settings."
+        )
+    return active_key
+
+
+def _prepare_chat(
+    message: str,
+    api_key: str = None,
+    model: str = "gemini-1.5-flash",
+    history: list = [],
+    context: str = "",
+    system_instruction: str = None
+):
+    """Validate the key and build (chat, full_message) for a Gemini request."""
+    active_key = _require_api_key(api_key)
+
+    # Normalize model name - remove 'models/' prefix if present
+    normalized_model = model.replace("models/", "") if model else "gemini-1.5-flash"
+    
+    logger.info(f"Generating response with model: {normalized_model}")
+    
+    # Reuse a model handle bound to this key's own client (no global configure)
+    gemini_model = gemini_clients.get_model(active_key, normalized_model)
+    
+    # Construct system prompt; the paper instructions are only sent with context
+    base_prompt = system_instruction or DEFAULT_SYSTEM_PROMPT
+    if context:
+        system_prompt = f"{base_prompt}\n\nContext from selected papers:\n{context}\n\n{CONTEXT_INSTRUCTIONS}"
+    else:
+        system_prompt = f"{base_prompt}\n\nBe concise and helpful."
+    
+    # Format history - map 'assistant' to 'model' for Gemini
+    formatted_history = []
+    for msg in history:
+        role = 'model' if msg['role'] == 'assistant' else 'user'
+        formatted_history.append({'role': role, 'parts': msg['parts']})
+        
+    # Start chat session with history
+    chat = gemini_model.start_chat(history=formatted_history)
+    
+    # Prepare full message with context
+    full_message = f"{system_prompt}\n\nUser Question: {message}"
+    return chat, full_message
+
+
 async def get_gemini_response(
     message: str, 
     api_key: str = None, 
     model: str = "gemini-1.5-flash", 
     history: list = [], 
     context: str = "",
-    system_instruction: str = None
+    system_instruction: str = None,
+    paper_ids: list = None,
+    user_id: Optional[int] = None
 ) -> str:
     """
     Get response from Gemini AI with timeout and retry logic.
@@ -77,74 +218,32 @@ async def get_gemini_response(
         api_key: Gemini API key (uses env var if not provided)
         model: Model name (e.g., "gemini-1.5-flash")
         history: Chat history in format [{'role': 'user'/'assistant', 'parts': [...]}]
-        context: Additional context (e.g., paper contents)
+        context: Additional context (e.g., paper contents); large context is
+            reduced to the passages most relevant to the message
         system_instruction: Custom system instruction
+        paper_ids: arXiv ids whose full text is searched for relevant passages
+        user_id: Caller, for the per-user rate limit and fair queueing
         
     Returns:
         AI response text
         
     Raises:
-        HTTPException: For various error conditions (400, 504, 500)
+        HTTPException: For various error conditions (400, 429, 504, 500)
     """
-    # Validate API key
-    active_key = api_key or GEMINI_API_KEY
-    if not active_key:
-        logger.error("No Gemini API key configured")
-        raise HTTPException(
-            status_code=400,
-            detail="Gemini API key not configured. Please add it in Settings."
-        )
-        
     try:
-        # Configure with the active key
-        genai.configure(api_key=active_key)
-        
-        # Normalize model name - remove 'models/' prefix if present
-        normalized_model = model.replace("models/", "") if model else "gemini-1.5-flash"
-        
-        logger.info(f"Generating response with model: {normalized_model}")
-        
-        # Create model instance
-        gemini_model = genai.GenerativeModel(normalized_model)
-        
-        # Construct system prompt with context
-        base_prompt = """
-        You are a research assistant helping a user understand scientific papers.
-        """
-        
-        if system_instruction:
-            base_prompt = system_instruction
-
-        system_prompt = f"""
-        {base_prompt}
-        
-        Context from selected papers:
-        {context}
-        
-        Instructions:
-        1. Answer based on the context provided.
-        2. If the answer is not in the context, use your general knowledge but mention that it's not in the papers.
-        3. Be concise and helpful.
-        """
-        
-        # Format history - map 'assistant' to 'model' for Gemini
-        formatted_history = []
-        for msg in history:
-            role = 'model' if msg['role'] == 'assistant' else 'user'
-            formatted_history.append({'role': role, 'parts': msg['parts']})
-            
-        # Start chat session with history
-        chat = gemini_model.start_chat(history=formatted_history)
-        
-        # Prepare full message with context
-        full_message = f"{system_prompt}\n\nUser Question: {message}"
+        active_key = _require_api_key(api_key)
+        gemini_limiter.check_user(user_id)
+        context = await build_context(message, context, paper_ids)
+        chat, full_message = _prepare_chat(message, api_key, model, history, context, system_instruction)
         
         # Get response with retry and timeout
-        response_text = await _get_gemini_response_with_retry(chat, full_message)
+        response_text = await _get_gemini_response_with_retry(chat, full_message, active_key, user_id)
         
         logger.info("Successfully generated response")
         return response_text
         
+    except RateLimitExceeded as e:
+        raise _too_many_requests(e)
     except HTTPException:
         # Re-raise HTTP exceptions (already formatted)
         raise
@@ -155,3 +254,129 @@ async def get_gemini_response(
             detail=f"Failed to generate AI response: {str(e)}"
         )
 
+
+async def _stream_chat(chat, full_message: str, api_key: str, user_id: Optional[int] = None) -> AsyncIterator[str]:
+    """
+    Bridge the SDK's blocking streamed iterator onto the event loop.
+
+    A worker thread pulls chunks and hands them over through a queue; the
+    timeout applies to the first token and to every gap between chunks. If
+    the consumer goes away (client disconnect, timeout) the worker is told to
+    stop and quits at the next chunk. The key's slot is freed as soon as the
+    upstream call ends, not when a slow client has read the last chunk.
+    """
+    loop = asyncio.get_running_loop()
+    queue: asyncio.Queue = asyncio.Queue()
+    done = object()
+    stop = threading.Event()
+
+    def call_soon(callback, *args):
+        try:
+            loop.call_soon_threadsafe(callback, *args)
+        except RuntimeError:
+            # Event loop already closed (client gone during shutdown)
+            pass
+
+    def put(item):
+        call_soon(queue.put_nowait, item)
+
+    def produce():
+        # Timed on the worker thread, so a stream abandoned by its client still reports its real duration
+        try:
+            with time_upstream("gemini"):
+                for chunk in chat.send_message(full_message, stream=True, request_options={"timeout": GEMINI_TIMEOUT_SECONDS}):
+                    if stop.is_set():
+                        break
+                    text = chunk.text
+                    if text:
+                        put(text)
+        except Exception as e:
+            put(e)
+        finally:
+            put(done)
+
+    try:
+        release = await gemini_limiter.acquire(api_key, user_id)
+    except RateLimitExceeded as e:
+        raise _too_many_requests(e)
+
+    finished = False
+    producer = None
+    try:
+        producer = llm_executor.start(produce)
+        # Straight onto the loop, not through the queue: runs once the call is
+        # over (or cancelled while queued) however far behind the reader is
+        producer.add_done_callback(lambda _: call_soon(release))
+        while True:
+            try:
+                item = await asyncio.wait_for(queue.get(), timeout=GEMINI_TIMEOUT_SECONDS)
+            except asyncio.TimeoutError:
+                logger.error(f"Gemini stream stalled for {GEMINI_TIMEOUT_SECONDS}s")
+                raise HTTPException(
+                    status_code=504,
+                    detail=f"AI request timed out after {GEMINI_TIMEOUT_SECONDS} seconds. Please try a shorter query."
+                )
+            # An error is the producer's last item before `done`
+            finished = item is done or isinstance(item, Exception)
+            if item is done:
+                return
+            if isinstance(item, UPSTREAM_RATE_LIMIT_ERRORS):
+                # Chunks may already be out, so a stream is never retried
+                raise _too_many_requests(_upstream_rate_limited(item, api_key))
+            if isinstance(item, Exception):
+                logger.error(f"Gemini API error: {str(item)}")
+                raise HTTPException(
+                    status_code=500,
+                    detail=f"Failed to generate AI response: {str(item)}"
+                )
+            yield item
+    finally:
+        if not finished and producer is not None:
+            stop.set()
+            llm_executor.abandon(producer)
+        release()
+
+
+async def _stream_response(message, api_key, model, history, context, system_instruction, paper_ids, user_id) -> AsyncIterator[str]:
+    try:
+        context = await build_context(message, context, paper_ids)
+        chat, full_message = _prepare_chat(message, api_key, model, history, context, system_instruction)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Unexpected error in stream_gemini_response: {str(e)}")
+        raise HTTPException(
+            status_code=500,
+            detail=f"Failed to generate AI response: {str(e)}"
+        )
+    async for text in _stream_chat(chat, full_message, _require_api_key(api_key), user_id):
+        yield text
+
+
+def stream_gemini_response(
+    message: str,
+    api_key: str = None,
+    model: str = "gemini-1.5-flash",
+    history: list = [],
+    context: str = "",
+    system_instruction: str = None,
+    paper_ids: list = None,
+    user_id: Optional[int] = None
+) -> AsyncIterator[str]:
+    """
+    Streaming variant of `get_gemini_response`: returns an async iterator of
+    text chunks.
+
+    A missing API key, an exhausted per-user quota or a full key queue is
+    raised immediately as HTTPException so endpoints can still answer with a proper status code
+    before the stream starts.
+    """
+    active_key = _require_api_key(api_key)
+    try:
+        # A key queue that is already full is refused here too, as a real 429
+        # rather than an error event on a 200 stream
+        gemini_limiter.check_key(active_key, user_id)
+        gemini_limiter.check_user(user_id)
+    except RateLimitExceeded as e:
+        raise _too_many_requests(e)
+    return _stream_response(message, api_key, model, history, context, system_instruction, paper_ids, user_id)
@@ -0,0 +1,211 @@
+import re
+import html
+import logging
+from typing import Iterable, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+
+logger = logging.getLogger(__name__)
+
+FTS_TABLE = "library_fts"
+
+KIND_PAPER = "paper"
+KIND_MESSAGE = "message"
+
+# Each kind's source table and parent column. An entry's FTS rowid is derived
+# from (kind, ref_id), so rows are found and deleted by rowid instead of by
+# scanning the UNINDEXED columns.
+_SOURCES = {
+    KIND_PAPER: ("collection_items", "collection_id"),
+    KIND_MESSAGE: ("chat_messages", "session_id"),
+}
+_KIND_CODES = {kind: code for code, kind in enumerate(_SOURCES)}
+
+_TOKEN_RE = re.compile(r"\w+", re.UNICODE)
+
+# highlight()/snippet() markers; private-use characters, swapped for <mark>
+# once the stored text has been HTML-escaped
+_MARK_OPEN = "\ue000"
+_MARK_CLOSE = "\ue001"
+
+# Column order matters for snippet()/bm25() below. user_id is indexed so
+# MATCH itself is scoped to one user.
+_CREATE_SQL = f"""
+CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+    user_id,
+    kind UNINDEXED,
+    ref_id UNINDEXED,
+    parent_id UNINDEXED,
+    title,
+    body,
+    tokenize = 'porter unicode61',
+    prefix = '2 3'
+)
+"""
+
+_BACKFILL_SQL = [
+    f"""
+    INSERT INTO {FTS_TABLE} (rowid, user_id, kind, ref_id, parent_id, title, body)
+    SELECT ci.id * {len(_SOURCES)} + {_KIND_CODES[KIND_PAPER]}, c.user_id, '{KIND_PAPER}', ci.id, ci.collection_id,
+           COALESCE(ci.title_override, p.title), COALESCE(ci.summary_override, p.summary)
+    FROM collection_items ci
+    JOIN collections c ON c.id = ci.collection_id
+    JOIN papers p ON p.arxiv_id = ci.paper_id
+    """,
+    f"""
+    INSERT INTO {FTS_TABLE} (rowid, user_id, kind, ref_id, parent_id, title, body)
+    SELECT m.id * {len(_SOURCES)} + {_KIND_CODES[KIND_MESSAGE]}, s.user_id, '{KIND_MESSAGE}', m.id, m.session_id, s.title, m.content
+    FROM chat_messages m
+    JOIN chat_sessions s ON s.id = m.session_id
+    """,
+]
+
+_INSERT_SQL = (
+    f"INSERT OR REPLACE INTO {FTS_TABLE} (rowid, user_id, kind, ref_id, parent_id, title, body) "
+    "VALUES (:rowid, :user_id, :kind, :ref_id, :parent_id, :title, :body)"
+)
+
+_fts_enabled = False
+
+
+def fts_enabled() -> bool:
+    return _fts_enabled
+
+
+def _rowid(kind: str, ref_id: int) -> int:
+    return ref_id * len(_SOURCES) + _KIND_CODES[kind]
+
+
+def _normalise_sql(sql: str) -> str:
+    return " ".join(sql.replace("IF NOT EXISTS ", "").split())
+
+
+def init_library_index(conn) -> None:
+    """
+    Create the FTS5 index (SQLite only) and backfill it the first time, or
+    rebuild it when it was created with a different layout. Other databases
+    leave library search disabled.
+
+    Takes a sync connection inside a transaction, i.e. run it through
+    `AsyncConnection.run_sync` at startup.
+    """
+    global _fts_enabled
+    if conn.dialect.name != "sqlite":
+        logger.info("Library full-text search needs SQLite FTS5; disabled for this database")
+        return
+    existing = conn.execute(
+        text("SELECT sql FROM sqlite_master WHERE type = 'table' AND name = :name"),
+        {"name": FTS_TABLE},
+    ).scalar()
+    if existing is not None and _normalise_sql(existing) != _normalise_sql(_CREATE_SQL):
+        conn.execute(text(f"DROP TABLE {FTS_TABLE}"))
+        logger.info("Library search index layout changed; rebuilding")
+        existing = None
+    conn.execute(text(_CREATE_SQL))
+    if existing is None:
+        for sql in _BACKFILL_SQL:
+            conn.execute(text(sql))
+        logger.info("Library search index created and backfilled")
+    _fts_enabled = True
+
+
+async def index_entry(db: AsyncSession, user_id: int, kind: str, ref_id: int, parent_id: int, title: Optional[str], body: Optional[str]) -> None:
+    """Add one searchable row. Runs in the caller's transaction."""
+    if not _fts_enabled:
+        return
+    await db.execute(text(_INSERT_SQL), {
+        "rowid": _rowid(kind, ref_id), "user_id": user_id, "kind": kind, "ref_id": ref_id,
+        "parent_id": parent_id, "title": title or "", "body": body or "",
+    })
+
+
+async def index_entries(db: AsyncSession, entries: List[dict]) -> None:
+    """
+    Bulk form of `index_entry`: one executemany for dicts with user_id, kind,
+    ref_id, parent_id, title and body.
+    """
+    if not _fts_enabled or not entries:
+        return
+    await db.execute(text(_INSERT_SQL), [
+        {
+            **entry,
+            "rowid": _rowid(entry["kind"], entry["ref_id"]),
+            "title": entry.get("title") or "",
+            "body": entry.get("body") or "",
+        }
+        for entry in entries
+    ])
+
+
+async def remove_entries(db: AsyncSession, kind: str, ref_ids: Iterable[int]) -> None:
+    if not _fts_enabled:
+        return
+    ids = list(ref_ids)
+    if not ids:
+        return
+    params = {f"id{i}": _rowid(kind, ref_id) for i, ref_id in enumerate(ids)}
+    placeholders = ", ".join(f":{name}" for name in params)
+    await db.execute(text(f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})"), params)
+
+
+async def remove_by_parent(db: AsyncSession, kind: str, parent_id: int) -> None:
+    """
+    Drop every row of a collection or chat session. Call it before the
+    parent's items are deleted: their ids are read from the source table.
+    """
+    if not _fts_enabled:
+        return
+    table, parent_column = _SOURCES[kind]
+    await db.execute(
+        text(
+            f"DELETE FROM {FTS_TABLE} WHERE rowid IN "
+            f"(SELECT id * {len(_SOURCES)} + {_KIND_CODES[kind]} FROM {table} WHERE {parent_column} = :parent_id)"
+        ),
+        {"parent_id": parent_id},
+    )
+
+
+def build_match_query(query: str) -> Optional[str]:
+    """
+    Turn free text into a safe FTS5 MATCH expression: every word is quoted
+    (so user input can't inject FTS syntax) and prefix-matched, ANDed together.
+    """
+    tokens = _TOKEN_RE.findall(query)
+    if not tokens:
+        return None
+    return " ".join(f'"{token}"*' for token in tokens)
+
+
+def _render(fragment: str) -> str:
+    """HTML-escape highlighted stored text, then turn the markers into <mark>."""
+    return html.escape(fragment or "").replace(_MARK_OPEN, "<mark>").replace(_MARK_CLOSE, "</mark>")
+
+
+async def search_library(db: AsyncSession, user_id: int, query: str, kind: Optional[str] = None, limit: int = 20, offset: int = 0) -> List[dict]:
+    """
+    BM25-ranked search over a user's saved papers and chat messages.
+
+    Titles and snippets are HTML-escaped with matches wrapped in <mark>.
+    """
+    words = build_match_query(query)
+    if words is None:
+        return []
+    # The user's own rows are selected by the full-text index itself; the
+    # query words only match title and body
+    match = f'user_id : "{int(user_id)}" AND {{title body}} : ({words})'
+    sql = f"""
+        SELECT kind, ref_id, parent_id,
+               highlight({FTS_TABLE}, 4, '{_MARK_OPEN}', '{_MARK_CLOSE}') AS title,
+               snippet({FTS_TABLE}, 5, '{_MARK_OPEN}', '{_MARK_CLOSE}', '…', 16) AS snippet,
+               bm25({FTS_TABLE}, 0, 0, 0, 0, 5.0, 1.0) AS score
+        FROM {FTS_TABLE}
+        WHERE {FTS_TABLE} MATCH :match
+    """
+    params = {"match": match, "limit": limit, "offset": offset}
+    if kind:
+        sql += " AND kind = :kind"
+        params["kind"] = kind
+    sql += " ORDER BY score LIMIT :limit OFFSET :offset"
+    rows = (await db.execute(text(sql), params)).mappings().all()
+    return [{**row, "title": _render(row["title"]), "snippet": _render(row["snippet"])} for row in rows]
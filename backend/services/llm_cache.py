@@ -0,0 +1,104 @@
+import os
+import hashlib
+import logging
+import datetime
+from collections import defaultdict
+from typing import Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import delete, func, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.models import LLMResponseCache, utcnow
+from db.session import SessionLocal
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE_ENABLED", "true").lower() in ("1", "true", "yes")
+LLM_CACHE_TTL_SECONDS = int(os.getenv("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("LLM_CACHE_MAX_ENTRIES", "10000"))
+
+
+def llm_cache_key(model: str, system_instruction: Optional[str], prompt: str) -> str:
+    """Content hash of everything that determines a deterministic LLM answer."""
+    digest = hashlib.sha256()
+    for part in (model or "", system_instruction or "", prompt):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class LLMResponseStore:
+    """
+    SQLite-backed cache of generated answers for summarize/ELI5.
+
+    Entries expire after `ttl` seconds and the least recently used rows are
+    deleted once the table grows past `max_entries`. Hit/miss counters are
+    kept per endpoint.
+    """
+
+    def __init__(self, ttl: int = LLM_CACHE_TTL_SECONDS, max_entries: int = LLM_CACHE_MAX_ENTRIES):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.counters = defaultdict(lambda: {"hits": 0, "misses": 0, "bypassed": 0})
+
+    def bypass(self, endpoint: str) -> None:
+        """Record a request that skipped the cache (disabled or opted out)."""
+        self.counters[endpoint]["bypassed"] += 1
+
+    async def get(self, db: AsyncSession, endpoint: str, key: str) -> Optional[str]:
+        now = utcnow()
+        # Expiry is compared in SQL, like refresh tokens, so it works the same
+        # against SQLite's naive strings and Postgres' timestamptz
+        entry = await db.scalar(select(LLMResponseCache).where(
+            LLMResponseCache.cache_key == key,
+            or_(LLMResponseCache.expires_at.is_(None), LLMResponseCache.expires_at > now)
+        ))
+        if entry is None:
+            self.counters[endpoint]["misses"] += 1
+            return None
+        entry.last_used_at = now
+        await db.commit()
+        self.counters[endpoint]["hits"] += 1
+        return entry.response
+
+    async def set(self, endpoint: str, key: str, model: str, response: str, db: Optional[AsyncSession] = None) -> None:
+        """Store an answer. Opens its own session when called after a stream ends."""
+        if db is None:
+            async with SessionLocal() as own_db:
+                await self.set(endpoint, key, model, response, db=own_db)
+            return
+        try:
+            now = utcnow()
+            entry = await db.scalar(select(LLMResponseCache).where(LLMResponseCache.cache_key == key))
+            if entry is None:
+                entry = LLMResponseCache(cache_key=key, endpoint=endpoint, model=model)
+                db.add(entry)
+            entry.response = response
+            entry.last_used_at = now
+            entry.expires_at = now + datetime.timedelta(seconds=self.ttl)
+            await db.commit()
+            await self._evict(db, now)
+        except Exception as e:
+            await db.rollback()
+            logger.warning(f"Failed to cache {endpoint} response: {e}")
+
+    async def _evict(self, db: AsyncSession, now: datetime.datetime) -> None:
+        await db.execute(delete(LLMResponseCache).where(LLMResponseCache.expires_at <= now))
+        overflow = await db.scalar(select(func.count(LLMResponseCache.id))) - self.max_entries
+        if overflow > 0:
+            oldest = select(LLMResponseCache.id).order_by(LLMResponseCache.last_used_at.asc()).limit(overflow)
+            await db.execute(delete(LLMResponseCache).where(LLMResponseCache.id.in_(oldest.scalar_subquery())))
+        await db.commit()
+
+    def stats(self) -> dict:
+        result = {}
+        for endpoint, counts in self.counters.items():
+            lookups = counts["hits"] + counts["misses"]
+            result[endpoint] = {**counts, "hit_ratio": round(counts["hits"] / lookups, 4) if lookups else 0.0}
+        return result
+
+
+llm_cache = LLMResponseStore()
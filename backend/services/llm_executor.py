@@ -0,0 +1,124 @@
+import os
+import time
+import asyncio
+import logging
+import functools
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, Optional
+
+from dotenv import load_dotenv
+from fastapi import HTTPException
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# The Gemini SDK blocks a thread per call; these threads are separate from
+# asyncio's default executor so a slow upstream can't starve `to_thread` users
+GEMINI_WORKERS = int(os.getenv("GEMINI_WORKERS", "16"))
+GEMINI_EXECUTOR_MAX_QUEUE = int(os.getenv("GEMINI_EXECUTOR_MAX_QUEUE", str(GEMINI_WORKERS * 4)))
+
+
+class LLMExecutor:
+    """
+    Bounded thread pool for blocking LLM SDK calls.
+
+    A call whose caller goes away (timeout, client disconnect) is cancelled
+    outright if it hasn't started; otherwise the thread can't be interrupted
+    and the call is counted as abandoned until it returns. Streams get a stop
+    event so their worker quits at the next chunk. Submissions beyond
+    `max_workers + max_queue` are refused with a 503.
+    """
+
+    def __init__(self, max_workers: int = GEMINI_WORKERS, max_queue: int = GEMINI_EXECUTOR_MAX_QUEUE):
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self._executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+        self.pending = 0
+        self.completed = 0
+        self.cancelled = 0
+        self.abandoned = 0
+        self.abandoned_running = 0
+        self.abandoned_seconds = 0.0
+        self.rejected = 0
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix="llm")
+        return self._executor
+
+    def shutdown(self) -> None:
+        """Drop queued calls and stop accepting new ones. Called from the FastAPI lifespan."""
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+        self._executor = None
+
+    def _submit(self, func: Callable, *args, **kwargs) -> Future:
+        if self.pending >= self.max_workers + self.max_queue:
+            self.rejected += 1
+            logger.warning(f"LLM executor saturated ({self.pending} calls, {self.abandoned_running} abandoned)")
+            raise HTTPException(
+                status_code=503,
+                detail="AI service is busy. Please retry shortly.",
+                headers={"Retry-After": "5"}
+            )
+        with self._lock:
+            self.pending += 1
+        future = self._get_executor().submit(functools.partial(func, *args, **kwargs))
+        future.add_done_callback(self._finished)
+        return future
+
+    def _finished(self, future: Future) -> None:
+        # Runs on the worker thread (or the canceller's)
+        with self._lock:
+            self.pending -= 1
+            if future.cancelled():
+                self.cancelled += 1
+            else:
+                self.completed += 1
+
+    def abandon(self, future: Future) -> None:
+        """The caller is gone; cancel if still queued, otherwise account for the orphaned thread."""
+        if future.done() or future.cancel():
+            return
+        started = time.monotonic()
+        with self._lock:
+            self.abandoned += 1
+            self.abandoned_running += 1
+
+        def done(_):
+            with self._lock:
+                self.abandoned_running -= 1
+                self.abandoned_seconds += time.monotonic() - started
+
+        future.add_done_callback(done)
+
+    async def run(self, func: Callable, *args, **kwargs):
+        future = self._submit(func, *args, **kwargs)
+        try:
+            # Shielded so cancelling the await doesn't mark a running call cancelled
+            return await asyncio.shield(asyncio.wrap_future(future))
+        except asyncio.CancelledError:
+            self.abandon(future)
+            raise
+
+    def start(self, func: Callable, *args, **kwargs) -> Future:
+        """Submit a call (e.g. a stream producer) whose completion the caller tracks itself."""
+        return self._submit(func, *args, **kwargs)
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.max_workers,
+            "pending": self.pending,
+            "completed": self.completed,
+            "cancelled": self.cancelled,
+            "abandoned": self.abandoned,
+            "abandoned_running": self.abandoned_running,
+            "abandoned_seconds": round(self.abandoned_seconds, 3),
+            "rejected": self.rejected,
+        }
+
+
+llm_executor = LLMExecutor()
@@ -0,0 +1,150 @@
+import os
+import logging
+from typing import Iterable, List, Optional
+
+import httpx
+from dotenv import load_dotenv
+from fastapi import HTTPException
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db import models
+from services.arxiv_service import split_arxiv_id, fetch_arxiv_papers, is_valid_arxiv_id
+from services.cache_service import LRUCache
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Well-formed ids arXiv didn't return are remembered for this long, so
+# repeated lookups of a missing paper don't each cost a request
+PAPER_MISS_TTL_SECONDS = int(os.getenv("PAPER_MISS_TTL_SECONDS", "600"))
+
+_missing_papers = LRUCache(max_entries=4096, default_ttl=PAPER_MISS_TTL_SECONDS)
+
+_UPSERT_FIELDS = ("version", "title", "summary", "authors", "published", "pdf_url")
+
+
+def insert_for(db: AsyncSession):
+    """Dialect-specific INSERT that supports ON CONFLICT."""
+    dialect = db.get_bind().dialect.name
+    if dialect == "postgresql":
+        from sqlalchemy.dialects.postgresql import insert
+    else:
+        from sqlalchemy.dialects.sqlite import insert
+    return insert
+
+
+def _paper_row(paper: dict) -> Optional[dict]:
+    raw_id = paper.get("arxiv_id") or paper.get("id")
+    if not raw_id:
+        return None
+    arxiv_id, version = split_arxiv_id(raw_id)
+    return {
+        "arxiv_id": arxiv_id,
+        "version": paper.get("version") or version or 1,
+        "title": paper.get("title"),
+        "summary": paper.get("summary"),
+        "authors": paper.get("authors") or [],
+        "published": paper.get("published"),
+        "pdf_url": paper.get("pdf_url"),
+    }
+
+
+async def upsert_papers(db: AsyncSession, papers: Iterable[dict], commit: bool = True) -> int:
+    """
+    Bulk insert-or-update parsed arXiv results into the `papers` table.
+
+    One statement per batch; an existing row is only overwritten by the same
+    or a newer version of the paper.
+    """
+    rows = {}
+    for paper in papers:
+        row = _paper_row(paper)
+        if row:
+            rows[row["arxiv_id"]] = row
+    if not rows:
+        return 0
+
+    insert = insert_for(db)
+    stmt = insert(models.Paper).values(list(rows.values()))
+    stmt = stmt.on_conflict_do_update(
+        index_elements=[models.Paper.arxiv_id],
+        set_={field: getattr(stmt.excluded, field) for field in _UPSERT_FIELDS},
+        where=stmt.excluded.version >= models.Paper.version,
+    )
+    await db.execute(stmt)
+    if commit:
+        await db.commit()
+    return len(rows)
+
+
+async def ensure_papers(db: AsyncSession, arxiv_ids: Iterable[str], commit: bool = True) -> None:
+    """
+    Create placeholder `papers` rows (id only) for ids that aren't known yet,
+    in one statement, so collection items can reference papers arXiv can't
+    resolve. Client-supplied metadata never goes here: it is per item.
+    """
+    rows = [{"arxiv_id": arxiv_id, "version": 1, "authors": []} for arxiv_id in dict.fromkeys(arxiv_ids)]
+    if not rows:
+        return
+    insert = insert_for(db)
+    stmt = insert(models.Paper).values(rows)
+    await db.execute(stmt.on_conflict_do_nothing(index_elements=[models.Paper.arxiv_id]))
+    if commit:
+        await db.commit()
+
+
+async def ensure_paper(db: AsyncSession, arxiv_id: str, commit: bool = True) -> None:
+    """Create a placeholder `papers` row if the id isn't known yet (never overwrites)."""
+    await ensure_papers(db, [arxiv_id], commit=commit)
+
+
+def is_resolved(paper: models.Paper) -> bool:
+    """True once the row holds arXiv metadata rather than an `ensure_papers` placeholder."""
+    return paper.title is not None
+
+
+async def get_papers(db: AsyncSession, arxiv_ids: List[str], refresh: bool = False) -> List[models.Paper]:
+    if not arxiv_ids:
+        return []
+    query = select(models.Paper).where(models.Paper.arxiv_id.in_(arxiv_ids))
+    if refresh:
+        # Rows already in the session keep stale values otherwise, e.g. after an upsert
+        query = query.execution_options(populate_existing=True)
+    result = await db.scalars(query)
+    return result.all()
+
+
+async def get_or_fetch_papers(db: AsyncSession, arxiv_ids: List[str], commit: bool = True) -> List[models.Paper]:
+    """
+    Resolve papers from the local store, fetching only unknown ids from arXiv.
+
+    Only papers with arXiv metadata are returned; placeholders of valid ids
+    are looked up again. Malformed ids and ids arXiv recently didn't return
+    are skipped, and an unreachable or failing arXiv surfaces as a 502.
+
+    The arXiv request happens before anything is written, so callers that
+    pass commit=False should call this ahead of their own writes to avoid
+    holding a write transaction across the network round trip.
+    """
+    ids = [split_arxiv_id(raw)[0] for raw in arxiv_ids]
+    found = {paper.arxiv_id: paper for paper in await get_papers(db, ids) if is_resolved(paper)}
+    # Only well-formed ids that aren't known to be missing go to arXiv
+    missing = [
+        arxiv_id for arxiv_id in dict.fromkeys(ids)
+        if arxiv_id not in found and is_valid_arxiv_id(arxiv_id) and arxiv_id not in _missing_papers
+    ]
+    if missing:
+        logger.info(f"Fetching {len(missing)} papers from arXiv")
+        try:
+            fetched = await fetch_arxiv_papers(missing)
+        except httpx.HTTPError as e:
+            logger.warning(f"arXiv lookup failed: {e!r}")
+            raise HTTPException(status_code=502, detail="arXiv is unavailable, please try again later")
+        await upsert_papers(db, fetched, commit=commit)
+        found.update({paper.arxiv_id: paper for paper in await get_papers(db, missing, refresh=True) if is_resolved(paper)})
+        for arxiv_id in missing:
+            if arxiv_id not in found:
+                _missing_papers.set(arxiv_id, True)
+    return [found[arxiv_id] for arxiv_id in dict.fromkeys(ids) if arxiv_id in found]
@@ -0,0 +1,68 @@
+import os
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional, Tuple
+
+from dotenv import load_dotenv
+from fastapi import HTTPException
+
+from utils.security import get_password_hash, verify_and_update_password
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# bcrypt releases the GIL while hashing, so a small thread pool runs hashes in
+# parallel without blocking the event loop or the default executor
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(min(4, os.cpu_count() or 1))))
+PASSWORD_HASH_MAX_QUEUE = int(os.getenv("PASSWORD_HASH_MAX_QUEUE", str(PASSWORD_HASH_WORKERS * 16)))
+
+_executor: Optional[ThreadPoolExecutor] = None
+_slots: Optional[asyncio.Semaphore] = None
+
+
+def _get_executor() -> ThreadPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+    return _executor
+
+
+def _get_slots() -> asyncio.Semaphore:
+    global _slots
+    if _slots is None:
+        _slots = asyncio.Semaphore(PASSWORD_HASH_WORKERS + PASSWORD_HASH_MAX_QUEUE)
+    return _slots
+
+
+def shutdown_password_executor() -> None:
+    """Stop hashing threads. Called from the FastAPI lifespan."""
+    global _executor, _slots
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+    _executor = None
+    _slots = None
+
+
+async def _run(func, *args):
+    slots = _get_slots()
+    if slots.locked():
+        # A login burst beyond the queue is shed rather than queued without bound
+        logger.warning("Password hashing queue is full; rejecting request")
+        raise HTTPException(
+            status_code=503,
+            detail="Too many sign-in attempts in progress. Please retry shortly.",
+            headers={"Retry-After": "2"}
+        )
+    async with slots:
+        return await asyncio.get_running_loop().run_in_executor(_get_executor(), func, *args)
+
+
+async def hash_password(password: str) -> str:
+    return await _run(get_password_hash, password)
+
+
+async def verify_password(password: str, hashed_password: str) -> Tuple[bool, Optional[str]]:
+    """Returns (valid, new_hash); new_hash is set when the stored hash should be replaced."""
+    return await _run(verify_and_update_password, password, hashed_password)
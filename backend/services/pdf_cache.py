@@ -0,0 +1,193 @@
+import os
+import json
+import asyncio
+import time
+import hashlib
+import logging
+import tempfile
+import threading
+from collections import OrderedDict
+from typing import List, Optional
+
+from dotenv import load_dotenv
+
+from services.arxiv_service import is_valid_arxiv_id, split_arxiv_id
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+PDF_CACHE_DIR = os.getenv("PDF_CACHE_DIR", "./pdf_cache")
+PDF_CACHE_MAX_BYTES = int(os.getenv("PDF_CACHE_MAX_BYTES", str(2 * 1024 ** 3)))
+# URLs that don't pin a version (arxiv.org/pdf/<id>, other sites) can start
+# serving a new document; their entries are refetched after this long (0 = never)
+PDF_CACHE_UNVERSIONED_TTL_SECONDS = int(os.getenv("PDF_CACHE_UNVERSIONED_TTL_SECONDS", str(24 * 3600)))
+
+_PDF_SUFFIX = ".pdf"
+_PAGES_SUFFIX = ".pages.json"
+
+
+def cache_key_for_url(pdf_url: str) -> str:
+    """
+    Stable file-name-safe key for a PDF.
+
+    Versioned arXiv URLs map to "<id>v<version>" so every mirror/variant of
+    the same version shares an entry for good. Unversioned arXiv URLs key on
+    the id and anything else on a hash of the URL; both also carry the
+    current PDF_CACHE_UNVERSIONED_TTL_SECONDS window, so a newer upload is
+    picked up once the window rolls over and stale entries age out.
+
+    Only ids `is_valid_arxiv_id` accepts make it into a file name; any other
+    URL text (long paths, query strings) is hashed.
+    """
+    arxiv_id, version = split_arxiv_id(pdf_url)
+    if is_valid_arxiv_id(arxiv_id):
+        if version:
+            return "arxiv-" + f"{arxiv_id}v{version}".replace("/", "_")
+        key = "arxiv-" + arxiv_id.replace("/", "_")
+    else:
+        key = "url-" + hashlib.sha256(pdf_url.encode("utf-8")).hexdigest()
+    if PDF_CACHE_UNVERSIONED_TTL_SECONDS > 0:
+        key += f"-t{int(time.time()) // PDF_CACHE_UNVERSIONED_TTL_SECONDS}"
+    return key
+
+
+class PDFDiskCache:
+    """
+    Size-capped on-disk cache of raw PDFs and their extracted per-page text.
+
+    File sizes and recency live in an in-memory LRU index, seeded from the
+    directory once at startup, so writes never rescan it; the least recently
+    used files are removed once `max_bytes` is exceeded. File I/O runs in a
+    thread to keep it off the event loop. Hits still touch the file mtime so
+    recency survives a restart.
+    """
+
+    def __init__(self, directory: str = PDF_CACHE_DIR, max_bytes: int = PDF_CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        # file name -> size, least recently used first
+        self._files: "OrderedDict[str, int]" = OrderedDict()
+        self._bytes = 0
+        self._loaded = False
+        self._lock = threading.Lock()
+        os.makedirs(self.directory, exist_ok=True)
+
+    def load_index(self) -> None:
+        """Seed the index from the directory. Called from the FastAPI lifespan; later calls are no-ops."""
+        with self._lock:
+            if self._loaded:
+                return
+            entries = []
+            for entry in os.scandir(self.directory):
+                if not entry.is_file() or entry.name.endswith(".tmp"):
+                    continue
+                stat = entry.stat()
+                entries.append((stat.st_mtime, entry.name, stat.st_size))
+            for _, name, size in sorted(entries):
+                self._track(name, size)
+            self._loaded = True
+            self._evict()
+
+    def _path(self, key: str, suffix: str) -> str:
+        return os.path.join(self.directory, key + suffix)
+
+    def _read(self, key: str, suffix: str, binary: bool):
+        self.load_index()
+        name = key + suffix
+        path = os.path.join(self.directory, name)
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+        except FileNotFoundError:
+            with self._lock:
+                self.misses += 1
+                # Removed behind our back (e.g. by another worker process)
+                self._bytes -= self._files.pop(name, 0)
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        with self._lock:
+            self.hits += 1
+            self._track(name, len(data))
+        return data if binary else data.decode("utf-8")
+
+    def _write(self, key: str, suffix: str, data: bytes) -> None:
+        self.load_index()
+        # Write to a temp file and rename so readers never see partial files
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, self._path(key, suffix))
+        except BaseException:
+            try:
+                os.remove(tmp_path)
+            except OSError:
+                pass
+            raise
+        with self._lock:
+            self._track(key + suffix, len(data))
+            self._evict()
+
+    def _read_pages(self, key: str) -> Optional[List[str]]:
+        data = self._read(key, _PAGES_SUFFIX, binary=False)
+        return json.loads(data) if data is not None else None
+
+    def _write_pages(self, key: str, pages: List[str]) -> None:
+        self._write(key, _PAGES_SUFFIX, json.dumps(pages).encode("utf-8"))
+
+    async def get_pdf(self, key: str) -> Optional[bytes]:
+        return await asyncio.to_thread(self._read, key, _PDF_SUFFIX, True)
+
+    async def put_pdf(self, key: str, content: bytes) -> None:
+        await asyncio.to_thread(self._write, key, _PDF_SUFFIX, content)
+
+    def pdf_path(self, key: str) -> Optional[str]:
+        """Path of the cached PDF, for worker processes to read directly; not counted as a lookup."""
+        with self._lock:
+            if key + _PDF_SUFFIX not in self._files:
+                return None
+        return self._path(key, _PDF_SUFFIX)
+
+    async def get_pages(self, key: str) -> Optional[List[str]]:
+        return await asyncio.to_thread(self._read_pages, key)
+
+    async def put_pages(self, key: str, pages: List[str]) -> None:
+        await asyncio.to_thread(self._write_pages, key, pages)
+
+    def _track(self, name: str, size: int) -> None:
+        # Caller holds the lock; marks `name` most recently used
+        self._bytes += size - self._files.pop(name, 0)
+        self._files[name] = size
+
+    def _evict(self) -> None:
+        # Caller holds the lock
+        while self._bytes > self.max_bytes and self._files:
+            name, size = self._files.popitem(last=False)
+            self._bytes -= size
+            try:
+                os.remove(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            self.evictions += 1
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_ratio": round(self.hits / lookups, 4) if lookups else 0.0,
+            "bytes": self._bytes,
+            "files": len(self._files),
+            "max_bytes": self.max_bytes,
+        }
+
+
+pdf_cache = PDFDiskCache()
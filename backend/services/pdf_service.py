@@ -1,17 +1,362 @@
-import httpx
 import io
+import os
+import time
+import asyncio
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import AsyncIterator, Dict, List, Optional, Set, Tuple, Union
+from dotenv import load_dotenv
+from fastapi import HTTPException
 from pypdf import PdfReader
+from services.cache_service import ResultCache
+from services.http_client import get_http_client
+from services.pdf_cache import pdf_cache, cache_key_for_url
+from services.metrics import time_upstream
 
-async def extract_text_from_pdf(pdf_url: str) -> str:
-    async with httpx.AsyncClient() as client:
-        response = await client.get(pdf_url)
-        response.raise_for_status()
-        
-    pdf_file = io.BytesIO(response.content)
-    reader = PdfReader(pdf_file)
-    
-    text = ""
-    for page in reader.pages:
-        text += page.extract_text() + "\n"
-        
-    return text
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Extraction runs in worker processes so pypdf never blocks the event loop
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", str(os.cpu_count() or 2)))
+PDF_MAX_QUEUE = int(os.getenv("PDF_MAX_QUEUE", str(PDF_WORKERS * 2)))
+# Time budget of one worker job (a batch of pages)
+PDF_JOB_TIMEOUT_SECONDS = float(os.getenv("PDF_JOB_TIMEOUT_SECONDS", "60"))
+PDF_MAX_PAGES = int(os.getenv("PDF_MAX_PAGES", "200"))
+# Pages per worker job after the first (which is always a single page)
+PDF_PAGE_BATCH = int(os.getenv("PDF_PAGE_BATCH", "8"))
+
+_executor: Optional[ProcessPoolExecutor] = None
+_slots: Optional[asyncio.Semaphore] = None
+# Shared extraction jobs; full parses outlive callers that stop early, so their pages still get cached
+_background: Set[asyncio.Task] = set()
+
+# Worker-process memo of the last parsed PDF: (path, inode, size, reader).
+# Batches of one job that land on the same worker reuse the reader.
+_worker_reader: Optional[Tuple[str, int, int, PdfReader]] = None
+
+
+class PDFTimeoutError(Exception):
+    pass
+
+
+def parse_page_range(spec: str) -> List[int]:
+    """
+    Parse a 1-based page selection like "1-3,7" into sorted 0-based indices.
+
+    Pages past PDF_MAX_PAGES are never extracted, so ranges are clamped to it
+    before being expanded; "1-1000000000" costs the same as "1-200".
+    Raises ValueError for malformed input.
+    """
+    indices = set()
+    for part in spec.split(","):
+        part = part.strip()
+        if not part:
+            continue
+        if "-" in part:
+            first, last = (int(x) for x in part.split("-", 1))
+        else:
+            first = last = int(part)
+        if first < 1 or last < first:
+            raise ValueError(f"Invalid page range: {part}")
+        indices.update(range(first - 1, min(last, PDF_MAX_PAGES)))
+    return sorted(indices)
+
+
+def _open_reader(source: Union[str, bytes]) -> PdfReader:
+    global _worker_reader
+    if isinstance(source, bytes):
+        return PdfReader(io.BytesIO(source))
+    stat = os.stat(source)
+    if _worker_reader is not None and _worker_reader[:3] == (source, stat.st_ino, stat.st_size):
+        return _worker_reader[3]
+    # PdfReader reads the whole file up front, so a later eviction can't pull it from under us
+    reader = PdfReader(source)
+    _worker_reader = (source, stat.st_ino, stat.st_size, reader)
+    return reader
+
+
+def _extract_pages(source: Union[str, bytes], indices: Optional[List[int]], timeout: float) -> Tuple[int, List[Tuple[int, str]]]:
+    """
+    Runs in a worker process. Returns (page_count, [(index, text), ...]) for the
+    requested 0-based indices (all pages up to PDF_MAX_PAGES when None), and
+    stops between pages once the time budget is spent.
+
+    `source` is the cached PDF's path (only the path is pickled to the worker)
+    or, if the file couldn't be cached, its bytes.
+    """
+    deadline = time.monotonic() + timeout
+    reader = _open_reader(source)
+    total = len(reader.pages)
+    if indices is None:
+        indices = range(min(total, PDF_MAX_PAGES))
+    pages = []
+    for index in indices:
+        if index >= total:
+            continue
+        if time.monotonic() > deadline:
+            raise PDFTimeoutError(f"PDF extraction exceeded {timeout:.0f}s")
+        pages.append((index, reader.pages[index].extract_text()))
+    return total, pages
+
+
+def _get_executor() -> ProcessPoolExecutor:
+    global _executor
+    if _executor is None:
+        _executor = ProcessPoolExecutor(max_workers=PDF_WORKERS)
+    return _executor
+
+
+def _get_slots() -> asyncio.Semaphore:
+    global _slots
+    if _slots is None:
+        _slots = asyncio.Semaphore(PDF_WORKERS + PDF_MAX_QUEUE)
+    return _slots
+
+
+def shutdown_pdf_executor() -> None:
+    """Stop worker processes. Called from the FastAPI lifespan."""
+    global _executor, _slots
+    for task in list(_background):
+        task.cancel()
+    if _executor is not None:
+        _executor.shutdown(wait=False, cancel_futures=True)
+    _executor = None
+    _slots = None
+
+
+async def _run_extraction(source: Union[str, bytes], indices: Optional[List[int]], shed_load: bool = False) -> Tuple[int, List[Tuple[int, str]]]:
+    """
+    Run one batch in a worker. The slot is held for this batch only and each
+    batch gets the full PDF_JOB_TIMEOUT_SECONDS, so a slow consumer between
+    batches never ties up a slot or eats into the next batch's budget.
+    """
+    slots = _get_slots()
+    if shed_load and slots.locked():
+        # Every worker is busy and the queue is full: shed load instead of piling up
+        raise HTTPException(
+            status_code=503,
+            detail="PDF extraction is busy. Please retry shortly.",
+            headers={"Retry-After": "5"}
+        )
+    async with slots:
+        loop = asyncio.get_running_loop()
+        future = loop.run_in_executor(_get_executor(), _extract_pages, source, indices, PDF_JOB_TIMEOUT_SECONDS)
+        try:
+            # Small grace period on top of the in-worker deadline for process overhead
+            with time_upstream("pdf_parse"):
+                return await asyncio.wait_for(future, timeout=PDF_JOB_TIMEOUT_SECONDS + 5)
+        except (asyncio.TimeoutError, PDFTimeoutError):
+            logger.error(f"PDF extraction timed out after {PDF_JOB_TIMEOUT_SECONDS}s")
+            raise HTTPException(
+                status_code=504,
+                detail=f"PDF extraction timed out after {PDF_JOB_TIMEOUT_SECONDS:.0f} seconds."
+            )
+
+
+class _PDFContentBackend:
+    """ResultCache backend over the PDF disk cache, so concurrent misses share one download."""
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await pdf_cache.get_pdf(key)
+
+    async def set(self, key: str, value: bytes, ttl: Optional[float] = None) -> None:
+        await pdf_cache.put_pdf(key, value)
+
+
+_downloads = ResultCache(_PDFContentBackend(), name="pdf download")
+
+
+async def _get_pdf_content(pdf_url: str, key: str) -> bytes:
+    async def download() -> bytes:
+        client = get_http_client()
+        with time_upstream("pdf_download"):
+            response = await client.get(pdf_url)
+            response.raise_for_status()
+        return response.content
+
+    return await _downloads.get_or_set(key, download)
+
+
+async def _iter_uncached_pages(content: bytes, key: str, pages: Optional[List[int]]) -> AsyncIterator[Tuple[int, str]]:
+    # Oversized PDFs are evicted as soon as they're written; send those as bytes
+    source = pdf_cache.pdf_path(key) or content
+    extracted = {}
+    # Page count is unknown until the first batch comes back, and a
+    # one-page first batch gets text to streaming clients quickly
+    wanted = list(pages) if pages is not None else [0]
+    total = None
+    position = 0
+    batch_size = 1
+    while position < len(wanted):
+        batch = wanted[position:position + batch_size]
+        # Only a new job is turned away when busy; one under way waits its turn
+        total, batch_pages = await _run_extraction(source, batch, shed_load=position == 0)
+        if position == 0:
+            limit = min(total, PDF_MAX_PAGES)
+            wanted = [i for i in (pages if pages is not None else range(limit)) if i < limit]
+        for index, text in batch_pages:
+            extracted[index] = text
+            yield index, text
+        position += len(batch)
+        batch_size = PDF_PAGE_BATCH
+
+    # Only a complete extraction is worth caching
+    limit = min(total or 0, PDF_MAX_PAGES)
+    if total is not None and len(extracted) == limit:
+        await pdf_cache.put_pages(key, [extracted[i] for i in range(limit)])
+
+
+async def _iter_cached_pages(cached: List[str], pages: Optional[List[int]]) -> AsyncIterator[Tuple[int, str]]:
+    for index in (pages if pages is not None else range(len(cached))):
+        if index < len(cached):
+            yield index, cached[index]
+
+
+class _SharedExtraction:
+    """
+    One extraction job that any number of callers follow as pages come in.
+
+    A full parse (`pages` None) runs to the end even if every follower stops
+    early, so its pages get cached; a page selection is cancelled once its
+    last follower leaves.
+    """
+
+    def __init__(self, ident: Tuple[str, Optional[Tuple[int, ...]]]):
+        self.ident = ident
+        self.extracted: List[Tuple[int, str]] = []
+        self.done = False
+        self.error: Optional[BaseException] = None
+        self.followers = 0
+        self.task: Optional[asyncio.Task] = None
+        self._changed = asyncio.Event()
+
+    def publish(self, index: int, text: str) -> None:
+        self.extracted.append((index, text))
+        self._wake()
+
+    def finish(self, error: Optional[BaseException] = None) -> None:
+        self.done = True
+        self.error = error
+        self._wake()
+
+    def _wake(self) -> None:
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def follow(self, pages: Optional[List[int]]) -> AsyncIterator[Tuple[int, str]]:
+        """Yield the extracted (index, text) pairs in `pages` (all when None), in order."""
+        wanted = set(pages) if pages is not None else None
+        last = max(pages, default=-1) if pages is not None else None
+        self.followers += 1
+        try:
+            position = 0
+            while True:
+                while position < len(self.extracted):
+                    index, text = self.extracted[position]
+                    position += 1
+                    if wanted is None or index in wanted:
+                        yield index, text
+                    # Pages come back in order, so nothing later is wanted
+                    if last is not None and index >= last:
+                        return
+                if self.done:
+                    if self.error is not None:
+                        raise self.error
+                    return
+                await self._changed.wait()
+        finally:
+            self.followers -= 1
+            if self.followers == 0 and self.ident[1] is not None and not self.done:
+                _extractions.pop(self.ident, None)
+                self.task.cancel()
+
+
+# In-flight extractions by (cache key, selected pages or None for a full parse)
+_extractions: Dict[Tuple[str, Optional[Tuple[int, ...]]], _SharedExtraction] = {}
+
+
+def _find_extraction(key: str, pages: Optional[List[int]]) -> Optional[_SharedExtraction]:
+    # A full parse in flight covers any selection
+    extraction = _extractions.get((key, None))
+    if extraction is None and pages is not None:
+        extraction = _extractions.get((key, tuple(pages)))
+    return extraction
+
+
+def _start_extraction(content: bytes, key: str, pages: Optional[List[int]]) -> _SharedExtraction:
+    extraction = _SharedExtraction((key, tuple(pages) if pages is not None else None))
+    _extractions[extraction.ident] = extraction
+
+    async def run():
+        try:
+            async for index, text in _iter_uncached_pages(content, key, pages):
+                extraction.publish(index, text)
+        except Exception as e:
+            if extraction.followers == 0:
+                logger.warning(f"Background PDF extraction failed: {e}")
+            extraction.finish(e)
+        else:
+            extraction.finish()
+
+    def cleanup(task: asyncio.Task) -> None:
+        _background.discard(task)
+        if _extractions.get(extraction.ident) is extraction:
+            del _extractions[extraction.ident]
+        if not extraction.done:
+            # Cancelled: by shutdown, or its last follower left
+            extraction.finish(HTTPException(status_code=503, detail="PDF extraction was cancelled."))
+
+    extraction.task = asyncio.get_running_loop().create_task(run())
+    _background.add(extraction.task)
+    extraction.task.add_done_callback(cleanup)
+    return extraction
+
+
+async def _iter_extracted_pages(pdf_url: str, key: str, pages: Optional[List[int]]) -> AsyncIterator[Tuple[int, str]]:
+    extraction = _find_extraction(key, pages)
+    if extraction is None:
+        content = await _get_pdf_content(pdf_url, key)
+        # Someone may have started one while we waited for the download
+        extraction = _find_extraction(key, pages) or _start_extraction(content, key, pages)
+    async for item in extraction.follow(pages):
+        yield item
+
+
+async def iter_pdf_pages(pdf_url: str, pages: Optional[List[int]] = None, max_chars: Optional[int] = None) -> AsyncIterator[Tuple[int, str]]:
+    """
+    Yield (page_number, text) for a PDF, 1-based, as each page is extracted.
+
+    `pages` selects 0-based page indices; `max_chars` stops extraction as soon
+    as that many characters have been produced (the last page is truncated).
+    Concurrent callers for the same PDF share one download and one parse.
+    """
+    key = cache_key_for_url(pdf_url)
+
+    # Extracted text is cached per paper version (or TTL window), so each PDF is parsed once
+    cached = await pdf_cache.get_pages(key)
+    if cached is not None:
+        source = _iter_cached_pages(cached, pages)
+    else:
+        source = _iter_extracted_pages(pdf_url, key, pages)
+
+    remaining = max_chars
+    try:
+        async for index, text in source:
+            if remaining is not None:
+                text = text[:remaining]
+                remaining -= len(text)
+            yield index + 1, text
+            if remaining is not None and remaining <= 0:
+                return
+    finally:
+        await source.aclose()
+
+
+async def extract_text_from_pdf(pdf_url: str, pages: Optional[List[int]] = None, max_chars: Optional[int] = None) -> str:
+    parts = []
+    async for _, text in iter_pdf_pages(pdf_url, pages=pages, max_chars=max_chars):
+        parts.append(text)
+        parts.append("\n")
+    text = "".join(parts)
+    return text[:max_chars] if max_chars is not None else text
@@ -0,0 +1,289 @@
+import os
+import math
+import time
+import asyncio
+import logging
+from collections import OrderedDict, deque
+from contextlib import asynccontextmanager
+from typing import Any, Callable, Deque, Dict, Optional
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Per Gemini API key: request rate, burst, concurrent calls and the wait queue
+GEMINI_KEY_RPM = float(os.getenv("GEMINI_KEY_RPM", "60"))
+GEMINI_KEY_BURST = int(os.getenv("GEMINI_KEY_BURST", "10"))
+GEMINI_KEY_MAX_CONCURRENT = int(os.getenv("GEMINI_KEY_MAX_CONCURRENT", "8"))
+GEMINI_QUEUE_MAX = int(os.getenv("GEMINI_QUEUE_MAX", "64"))
+GEMINI_QUEUE_MAX_PER_USER = int(os.getenv("GEMINI_QUEUE_MAX_PER_USER", "8"))
+GEMINI_QUEUE_TIMEOUT_SECONDS = float(os.getenv("GEMINI_QUEUE_TIMEOUT_SECONDS", "30"))
+# Per user, across keys: a user sharing the server key can't spend everyone's quota
+GEMINI_USER_RPM = float(os.getenv("GEMINI_USER_RPM", "20"))
+GEMINI_USER_BURST = int(os.getenv("GEMINI_USER_BURST", "5"))
+GEMINI_LIMITER_MAX_KEYS = int(os.getenv("GEMINI_LIMITER_MAX_KEYS", "1024"))
+GEMINI_LIMITER_MAX_USERS = int(os.getenv("GEMINI_LIMITER_MAX_USERS", "10000"))
+
+
+class RateLimitExceeded(Exception):
+    """Over quota; `retry_after` is the suggested wait in seconds."""
+
+    def __init__(self, retry_after: float, scope: str):
+        super().__init__(f"{scope} rate limit exceeded; retry after {retry_after:.1f}s")
+        self.retry_after = retry_after
+        self.scope = scope
+
+    @property
+    def retry_after_header(self) -> str:
+        return str(max(1, math.ceil(self.retry_after)))
+
+
+class TokenBucket:
+    """
+    Classic token bucket: `rate` tokens per second up to `capacity`.
+
+    A rate of 0 disables the limit. `pause` empties the bucket until a
+    deadline, for when the upstream itself asks us to back off; it applies
+    whatever the rate.
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0.0
+
+    def _refill(self, now: float) -> None:
+        if now > self.updated:
+            self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+
+    def wait_time(self) -> float:
+        """Seconds until a token is available, without taking one."""
+        now = time.monotonic()
+        # An upstream backoff applies even when the local limit is disabled
+        if now < self.paused_until:
+            return self.paused_until - now
+        if self.rate <= 0:
+            return 0.0
+        self._refill(now)
+        return 0.0 if self.tokens >= 1 else (1 - self.tokens) / self.rate
+
+    def try_acquire(self) -> float:
+        """Take a token. Returns 0 on success, otherwise the seconds to wait."""
+        wait = self.wait_time()
+        if wait == 0 and self.rate > 0:
+            self.tokens -= 1
+        return wait
+
+    def pause(self, seconds: float) -> None:
+        self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+        self.tokens = 0.0
+        self.updated = self.paused_until
+
+
+class FairLimiter:
+    """
+    Rate and concurrency limit for one upstream key, with a bounded wait queue.
+
+    Callers that can't start immediately wait in per-user lines that are
+    served round-robin, so one user's burst can't starve everyone else
+    sharing the key. A full queue, a full per-user line or a wait longer
+    than `queue_timeout` raises `RateLimitExceeded`.
+    """
+
+    def __init__(self, bucket: TokenBucket, max_concurrent: int, max_queue: int, max_queue_per_user: int, queue_timeout: float):
+        self.bucket = bucket
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_queue_per_user = max_queue_per_user
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self.queued = 0
+        self._waiters: "OrderedDict[Any, Deque[asyncio.Future]]" = OrderedDict()
+        self._timer: Optional[asyncio.TimerHandle] = None
+
+    def idle(self) -> bool:
+        return not self.in_flight and not self.queued
+
+    def _retry_after(self) -> float:
+        per_second = self.bucket.rate or self.max_concurrent
+        return max(self.bucket.wait_time(), (self.queued + 1) / per_second)
+
+    def _check_queue(self, user_id: Any) -> None:
+        line = self._waiters.get(user_id)
+        if self.queued >= self.max_queue or (line is not None and len(line) >= self.max_queue_per_user):
+            raise RateLimitExceeded(self._retry_after(), "key")
+
+    def check(self, user_id: Any) -> None:
+        """Raise `RateLimitExceeded` if `acquire` would be refused right now, without taking anything."""
+        if not self._waiters and self.in_flight < self.max_concurrent and self.bucket.wait_time() == 0:
+            return
+        self._check_queue(user_id)
+
+    async def acquire(self, user_id: Any) -> None:
+        # Fast path only when nobody is waiting, so arrivals can't jump the queue
+        if not self._waiters and self.in_flight < self.max_concurrent and self.bucket.try_acquire() == 0:
+            self.in_flight += 1
+            return
+        self._check_queue(user_id)
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.setdefault(user_id, deque()).append(future)
+        self.queued += 1
+        self._dispatch()
+        try:
+            await asyncio.wait_for(asyncio.shield(future), self.queue_timeout)
+        except asyncio.TimeoutError:
+            if future.done():
+                # Granted just as the wait ran out
+                return
+            self._discard(user_id, future)
+            raise RateLimitExceeded(self._retry_after(), "key")
+        except asyncio.CancelledError:
+            if future.done():
+                self.release()
+            else:
+                self._discard(user_id, future)
+            raise
+
+    def release(self) -> None:
+        self.in_flight -= 1
+        self._dispatch()
+
+    def _discard(self, user_id: Any, future: asyncio.Future) -> None:
+        line = self._waiters.get(user_id)
+        if line is not None and future in line:
+            line.remove(future)
+            self.queued -= 1
+            if not line:
+                del self._waiters[user_id]
+
+    def _dispatch(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        while self._waiters and self.in_flight < self.max_concurrent:
+            wait = self.bucket.try_acquire()
+            if wait:
+                self._timer = asyncio.get_running_loop().call_later(wait, self._dispatch)
+                return
+            # Round-robin: serve the first user in line, then send them to the back
+            user_id, line = next(iter(self._waiters.items()))
+            future = line.popleft()
+            self.queued -= 1
+            if line:
+                self._waiters.move_to_end(user_id)
+            else:
+                del self._waiters[user_id]
+            self.in_flight += 1
+            future.set_result(None)
+
+
+class GeminiRateLimiter:
+    """
+    Token buckets per user and per API key, plus a `FairLimiter` per key.
+
+    `check_user` charges the caller's per-user quota once per request;
+    `slot` holds one of the key's concurrent calls for a single upstream
+    attempt, so retries queue behind everybody else instead of piling on.
+    """
+
+    def __init__(self):
+        self._keys: "OrderedDict[str, FairLimiter]" = OrderedDict()
+        self._users: "OrderedDict[Any, TokenBucket]" = OrderedDict()
+        self.rejected_user = 0
+        self.rejected_key = 0
+        self.backoffs = 0
+
+    def _key_limiter(self, api_key: str) -> FairLimiter:
+        limiter = self._keys.get(api_key)
+        if limiter is None:
+            limiter = FairLimiter(
+                TokenBucket(GEMINI_KEY_RPM / 60, GEMINI_KEY_BURST),
+                GEMINI_KEY_MAX_CONCURRENT,
+                GEMINI_QUEUE_MAX,
+                GEMINI_QUEUE_MAX_PER_USER,
+                GEMINI_QUEUE_TIMEOUT_SECONDS,
+            )
+            self._keys[api_key] = limiter
+            # Forget idle keys first; busy ones keep their queue
+            for key in [k for k, v in self._keys.items() if v.idle()][:max(0, len(self._keys) - GEMINI_LIMITER_MAX_KEYS)]:
+                del self._keys[key]
+        else:
+            self._keys.move_to_end(api_key)
+        return limiter
+
+    def check_user(self, user_id: Any) -> None:
+        if user_id is None:
+            return
+        bucket = self._users.get(user_id)
+        if bucket is None:
+            bucket = self._users[user_id] = TokenBucket(GEMINI_USER_RPM / 60, GEMINI_USER_BURST)
+            while len(self._users) > GEMINI_LIMITER_MAX_USERS:
+                self._users.popitem(last=False)
+        else:
+            self._users.move_to_end(user_id)
+        wait = bucket.try_acquire()
+        if wait:
+            self.rejected_user += 1
+            raise RateLimitExceeded(wait, "user")
+
+    def check_key(self, api_key: str, user_id: Any = None) -> None:
+        """Refuse up front when the key's queue is already full, e.g. before a stream's headers go out."""
+        try:
+            self._key_limiter(api_key).check(user_id)
+        except RateLimitExceeded:
+            self.rejected_key += 1
+            raise
+
+    async def acquire(self, api_key: str, user_id: Any = None) -> Callable[[], None]:
+        """
+        Take one of the key's slots and return its release function, for
+        callers whose slot outlives a `with` block (streams). Releasing more
+        than once is harmless.
+        """
+        limiter = self._key_limiter(api_key)
+        try:
+            await limiter.acquire(user_id)
+        except RateLimitExceeded:
+            self.rejected_key += 1
+            raise
+        released = False
+
+        def release() -> None:
+            nonlocal released
+            if not released:
+                released = True
+                limiter.release()
+
+        return release
+
+    @asynccontextmanager
+    async def slot(self, api_key: str, user_id: Any = None):
+        release = await self.acquire(api_key, user_id)
+        try:
+            yield
+        finally:
+            release()
+
+    def backoff(self, api_key: str, seconds: float) -> None:
+        """The upstream rate-limited this key: stop sending on it for `seconds`."""
+        self.backoffs += 1
+        self._key_limiter(api_key).bucket.pause(seconds)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "keys": len(self._keys),
+            "in_flight": sum(limiter.in_flight for limiter in self._keys.values()),
+            "queued": sum(limiter.queued for limiter in self._keys.values()),
+            "rejected_user": self.rejected_user,
+            "rejected_key": self.rejected_key,
+            "upstream_backoffs": self.backoffs,
+        }
+
+
+gemini_limiter = GeminiRateLimiter()
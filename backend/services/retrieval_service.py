@@ -0,0 +1,185 @@
+import os
+import re
+import json
+import zlib
+import asyncio
+import logging
+import tempfile
+import weakref
+from typing import List, Optional, Tuple
+
+import numpy as np
+from dotenv import load_dotenv
+
+from services.arxiv_service import is_valid_arxiv_id, split_arxiv_id
+from services.pdf_service import extract_text_from_pdf
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+RAG_INDEX_DIR = os.getenv("RAG_INDEX_DIR", "./rag_index")
+RAG_EMBEDDING_DIM = int(os.getenv("RAG_EMBEDDING_DIM", "1024"))
+RAG_CHUNK_WORDS = int(os.getenv("RAG_CHUNK_WORDS", "200"))
+RAG_CHUNK_OVERLAP = int(os.getenv("RAG_CHUNK_OVERLAP", "40"))
+RAG_TOP_K = int(os.getenv("RAG_TOP_K", "6"))
+# Raw context up to this size is sent as-is; anything larger goes through retrieval
+RAG_MAX_RAW_CONTEXT_CHARS = int(os.getenv("RAG_MAX_RAW_CONTEXT_CHARS", "4000"))
+# Papers searched per chat turn; each one may cost a PDF download and parse
+RAG_MAX_PAPERS = int(os.getenv("RAG_MAX_PAPERS", "10"))
+
+# Bump when chunking or embedding changes so stale indexes are rebuilt
+_INDEX_VERSION = f"h{RAG_EMBEDDING_DIM}-c{RAG_CHUNK_WORDS}-o{RAG_CHUNK_OVERLAP}"
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+# One build per paper at a time; a lock lives only while some request holds it
+_index_locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+
+def chunk_text(text: str, chunk_words: int = RAG_CHUNK_WORDS, overlap: int = RAG_CHUNK_OVERLAP) -> List[str]:
+    """Split text into overlapping windows of roughly `chunk_words` words."""
+    words = text.split()
+    if not words:
+        return []
+    step = max(chunk_words - overlap, 1)
+    chunks = []
+    for start in range(0, len(words), step):
+        chunks.append(" ".join(words[start:start + chunk_words]))
+        if start + chunk_words >= len(words):
+            break
+    return chunks
+
+
+def embed_texts(texts: List[str], dim: int = RAG_EMBEDDING_DIM) -> np.ndarray:
+    """
+    Hashing-vectorizer embeddings: unigrams and bigrams are hashed (stable
+    CRC32, signed) into `dim` buckets with sublinear TF, then L2-normalised.
+    CPU-only, no model download, and deterministic across processes.
+    """
+    matrix = np.zeros((len(texts), dim), dtype=np.float32)
+    for row, text in enumerate(texts):
+        tokens = _TOKEN_RE.findall(text.lower())
+        features = tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        for feature in features:
+            h = zlib.crc32(feature.encode("utf-8"))
+            matrix[row, h % dim] += 1.0 if (h >> 31) & 1 else -1.0
+    matrix = np.sign(matrix) * np.log1p(np.abs(matrix))
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return (matrix / norms).astype(np.float32)
+
+
+def _index_paths(arxiv_id: str) -> Tuple[str, str]:
+    base = os.path.join(RAG_INDEX_DIR, f"{arxiv_id.replace('/', '_')}.{_INDEX_VERSION}")
+    return base + ".npy", base + ".chunks.json"
+
+
+def _load_index(arxiv_id: str) -> Optional[Tuple[np.ndarray, List[str]]]:
+    vectors_path, chunks_path = _index_paths(arxiv_id)
+    if not (os.path.exists(vectors_path) and os.path.exists(chunks_path)):
+        return None
+    # Memory-mapped so large indexes aren't copied into every worker's heap
+    try:
+        vectors = np.load(vectors_path, mmap_mode="r")
+    except ValueError:
+        # Zero-chunk indexes can't be mapped
+        vectors = np.load(vectors_path)
+    with open(chunks_path, "r", encoding="utf-8") as f:
+        chunks = json.load(f)
+    return vectors, chunks
+
+
+def _save_index(arxiv_id: str, vectors: np.ndarray, chunks: List[str]) -> None:
+    os.makedirs(RAG_INDEX_DIR, exist_ok=True)
+    vectors_path, chunks_path = _index_paths(arxiv_id)
+    for path, write in (
+        (vectors_path, lambda f: np.save(f, vectors)),
+        (chunks_path, lambda f: f.write(json.dumps(chunks).encode("utf-8"))),
+    ):
+        fd, tmp_path = tempfile.mkstemp(dir=RAG_INDEX_DIR, suffix=".tmp")
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+        os.replace(tmp_path, path)
+
+
+def _build_index(arxiv_id: str, text: str) -> Tuple[np.ndarray, List[str]]:
+    chunks = chunk_text(text)
+    vectors = embed_texts(chunks) if chunks else np.zeros((0, RAG_EMBEDDING_DIM), dtype=np.float32)
+    _save_index(arxiv_id, vectors, chunks)
+    return vectors, chunks
+
+
+async def ensure_paper_index(arxiv_id: str) -> Tuple[np.ndarray, List[str]]:
+    """Load a paper's chunk index, extracting and embedding its PDF on first use."""
+    index = _load_index(arxiv_id)
+    if index is not None:
+        return index
+
+    lock = _index_locks.get(arxiv_id)
+    if lock is None:
+        lock = _index_locks[arxiv_id] = asyncio.Lock()
+    async with lock:
+        # Another request may have built it while we waited
+        index = _load_index(arxiv_id)
+        if index is not None:
+            return index
+        logger.info(f"Indexing paper {arxiv_id} for retrieval")
+        text = await extract_text_from_pdf(f"https://arxiv.org/pdf/{arxiv_id}")
+        return await asyncio.to_thread(_build_index, arxiv_id, text)
+
+
+def _top_k(query_vector: np.ndarray, candidates: List[Tuple[str, np.ndarray, List[str]]], k: int) -> List[Tuple[float, str, int, str]]:
+    scored = []
+    for label, vectors, chunks in candidates:
+        if len(chunks) == 0:
+            continue
+        scores = np.asarray(vectors @ query_vector)
+        take = min(k, len(chunks))
+        best = np.argpartition(-scores, take - 1)[:take]
+        scored.extend((float(scores[i]), label, int(i), chunks[i]) for i in best)
+    scored.sort(key=lambda item: item[0], reverse=True)
+    return scored[:k]
+
+
+async def build_context(query: str, context: str = "", paper_ids: Optional[List[str]] = None, k: int = RAG_TOP_K) -> str:
+    """
+    Build the prompt context for a question.
+
+    Small raw context is passed through untouched. Large raw context and the
+    full text of `paper_ids` (valid arXiv ids only, at most RAG_MAX_PAPERS)
+    are chunked and embedded, and only the `k` chunks most similar to the
+    query are returned.
+    """
+    candidates = []
+    if context and len(context) > RAG_MAX_RAW_CONTEXT_CHARS:
+        chunks = chunk_text(context)
+        vectors = await asyncio.to_thread(embed_texts, chunks)
+        candidates.append(("context", vectors, chunks))
+        context = ""
+
+    seen = set()
+    for raw_id in paper_ids or []:
+        arxiv_id, _ = split_arxiv_id(raw_id)
+        # Only real arXiv ids get a PDF fetched, and each one only once
+        if not is_valid_arxiv_id(arxiv_id) or arxiv_id in seen:
+            continue
+        if len(seen) == RAG_MAX_PAPERS:
+            break
+        seen.add(arxiv_id)
+        try:
+            vectors, chunks = await ensure_paper_index(arxiv_id)
+        except Exception as e:
+            # One unreachable PDF shouldn't fail the whole chat turn
+            logger.warning(f"Could not index paper {arxiv_id}: {e}")
+            continue
+        candidates.append((arxiv_id, vectors, chunks))
+
+    if not candidates:
+        return context
+
+    query_vector = embed_texts([query])[0]
+    passages = [
+        f"[{label}, passage {index + 1}]\n{text}"
+        for _, label, index, text in _top_k(query_vector, candidates, k)
+    ]
+    return "\n\n".join(part for part in [context] + passages if part)
@@ -0,0 +1,112 @@
+import uuid
+import logging
+from datetime import timedelta
+from typing import Optional
+
+from sqlalchemy import delete, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.models import RefreshToken, User, utcnow
+from services.user_cache import user_cache
+from utils.security import (
+    ACCESS_TOKEN_EXPIRE_MINUTES,
+    REFRESH_TOKEN_EXPIRE_DAYS,
+    create_access_token,
+    hash_refresh_token,
+    new_refresh_token,
+)
+
+logger = logging.getLogger(__name__)
+
+
+async def issue_tokens(db: AsyncSession, user: User, family_id: Optional[str] = None) -> dict:
+    """
+    Access token plus a new refresh token for `user` (profile loaded).
+
+    A fresh login starts a new refresh-token family; rotations pass the
+    family along. The caller commits.
+    """
+    now = utcnow()
+    token, token_hash = new_refresh_token()
+    # Housekeeping on the user's own (indexed) rows keeps the table from growing
+    await db.execute(delete(RefreshToken).where(
+        RefreshToken.user_id == user.id,
+        RefreshToken.expires_at < now
+    ))
+    db.add(RefreshToken(
+        user_id=user.id,
+        token_hash=token_hash,
+        family_id=family_id or uuid.uuid4().hex,
+        created_at=now,
+        expires_at=now + timedelta(days=REFRESH_TOKEN_EXPIRE_DAYS),
+    ))
+    return {
+        "access_token": create_access_token(user),
+        "token_type": "bearer",
+        "refresh_token": token,
+        "expires_in": ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+    }
+
+
+async def rotate_refresh_token(db: AsyncSession, token: str) -> Optional[dict]:
+    """
+    Exchange a refresh token for a new token pair, revoking the old one.
+
+    Returns None when the token is unknown, expired or already used. Reuse of
+    a rotated token means it leaked, so its whole family is revoked.
+    """
+    now = utcnow()
+    stored = await db.scalar(select(RefreshToken).where(
+        RefreshToken.token_hash == hash_refresh_token(token),
+        RefreshToken.expires_at > now
+    ))
+    if stored is None:
+        return None
+
+    # Conditional update so two concurrent refreshes can't both rotate the same token
+    result = await db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.id == stored.id, RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=now)
+    )
+    if result.rowcount != 1:
+        logger.warning(f"Refresh token reuse for user {stored.user_id}; revoking family {stored.family_id}")
+        await revoke_family(db, stored.family_id)
+        await db.commit()
+        return None
+
+    user = await user_cache.get_user(stored.user_id)
+    if user is None:
+        await db.rollback()
+        return None
+    tokens = await issue_tokens(db, user, family_id=stored.family_id)
+    await db.commit()
+    return tokens
+
+
+async def revoke_family(db: AsyncSession, family_id: str) -> None:
+    await db.execute(
+        update(RefreshToken)
+        .where(RefreshToken.family_id == family_id, RefreshToken.revoked_at.is_(None))
+        .values(revoked_at=utcnow())
+    )
+
+
+async def revoke_refresh_token(db: AsyncSession, token: str, everywhere: bool = False) -> bool:
+    """
+    Log out: revoke the token's family, or every token of its user when
+    `everywhere` is set. Returns False for an unknown token.
+    """
+    stored = await db.scalar(select(RefreshToken).where(RefreshToken.token_hash == hash_refresh_token(token)))
+    if stored is None:
+        return False
+    if everywhere:
+        await db.execute(
+            update(RefreshToken)
+            .where(RefreshToken.user_id == stored.user_id, RefreshToken.revoked_at.is_(None))
+            .values(revoked_at=utcnow())
+        )
+    else:
+        await revoke_family(db, stored.family_id)
+    await db.commit()
+    return True
@@ -0,0 +1,88 @@
+import os
+import logging
+from typing import Dict, NamedTuple, Optional
+
+from dotenv import load_dotenv
+from sqlalchemy import select
+from sqlalchemy.orm import selectinload
+
+from db.models import PromptTemplate, User
+from db.session import SessionLocal
+from services.cache_service import LRUCache
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+# Short TTL: invalidation is per-process, so other workers see edits after at most this long
+USER_CACHE_TTL_SECONDS = float(os.getenv("USER_CACHE_TTL_SECONDS", "30"))
+USER_CACHE_MAX_ENTRIES = int(os.getenv("USER_CACHE_MAX_ENTRIES", "10000"))
+
+
+class CachedUser(NamedTuple):
+    user: User
+    # Active template per type ("chat", "eli5", "summarize")
+    prompts: Dict[str, PromptTemplate]
+
+
+class UserCache:
+    """
+    Resolved identity and config per user id (the access token subject).
+
+    On a miss the user, its profile and its active prompt templates are loaded
+    in a short-lived session of their own, so the cached objects are detached
+    and can be shared between requests. Treat them as read-only: handlers that
+    change a profile or template load their own copy and call `invalidate`.
+    """
+
+    def __init__(self, max_entries: int = USER_CACHE_MAX_ENTRIES, ttl: float = USER_CACHE_TTL_SECONDS, session_factory=SessionLocal):
+        self._cache = LRUCache(max_entries=max_entries, default_ttl=ttl)
+        self.session_factory = session_factory
+        # Bumped on every invalidation so a load that raced with an edit isn't stored
+        self._generation = 0
+
+    async def get(self, user_id: int) -> Optional[CachedUser]:
+        entry = self._cache.get(user_id)
+        if entry is not None:
+            return entry
+
+        generation = self._generation
+        async with self.session_factory() as db:
+            user = await db.scalar(
+                select(User).options(selectinload(User.profile)).where(User.id == user_id)
+            )
+            if user is None:
+                return None
+            prompts = await db.scalars(select(PromptTemplate).where(
+                PromptTemplate.user_id == user_id,
+                PromptTemplate.is_active == True
+            ))
+            entry = CachedUser(user, {prompt.type: prompt for prompt in prompts})
+
+        if generation == self._generation:
+            self._cache.set(user_id, entry)
+        return entry
+
+    async def get_user(self, user_id: int) -> Optional[User]:
+        entry = await self.get(user_id)
+        return entry.user if entry else None
+
+    async def get_active_prompt(self, user: User, prompt_type: str) -> Optional[PromptTemplate]:
+        entry = await self.get(user.id)
+        return entry.prompts.get(prompt_type) if entry else None
+
+    def invalidate(self, user_id: int) -> None:
+        self._generation += 1
+        self._cache.delete(user_id)
+
+    def stats(self) -> dict:
+        lookups = self._cache.hits + self._cache.misses
+        return {
+            "hits": self._cache.hits,
+            "misses": self._cache.misses,
+            "hit_ratio": round(self._cache.hits / lookups, 4) if lookups else 0.0,
+            **self._cache.stats(),
+        }
+
+
+user_cache = UserCache()
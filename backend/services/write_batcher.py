@@ -0,0 +1,87 @@
+import os
+import asyncio
+import logging
+from typing import List, Optional, Tuple
+
+from dotenv import load_dotenv
+from sqlalchemy import insert
+
+from db.models import PaperView
+from db.session import SessionLocal
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+WRITE_BATCH_MAX_ROWS = int(os.getenv("WRITE_BATCH_MAX_ROWS", "500"))
+# How long the writer waits for more rows before committing a batch
+WRITE_BATCH_MAX_DELAY_MS = float(os.getenv("WRITE_BATCH_MAX_DELAY_MS", "2"))
+
+
+class WriteBatcher:
+    """
+    Group commit for append-only rows.
+
+    `add` queues a row and waits until it is durably written. A single
+    writer task drains the queue: everything that arrived while the previous
+    batch was committing goes out as one multi-row INSERT in one transaction,
+    so N concurrent requests cost one commit instead of N.
+    """
+
+    def __init__(self, model, session_factory=SessionLocal, max_rows: int = WRITE_BATCH_MAX_ROWS, max_delay_ms: float = WRITE_BATCH_MAX_DELAY_MS):
+        self.model = model
+        self.session_factory = session_factory
+        self.max_rows = max_rows
+        self.max_delay = max_delay_ms / 1000
+        self._pending: List[Tuple[dict, asyncio.Future]] = []
+        self._writer: Optional[asyncio.Task] = None
+        self.rows_written = 0
+        self.batches = 0
+        self.errors = 0
+
+    async def add(self, row: dict) -> None:
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((row, future))
+        if self._writer is None or self._writer.done():
+            self._writer = asyncio.create_task(self._drain())
+        # A client disconnect shouldn't drop a row that is already queued
+        await asyncio.shield(future)
+
+    async def _drain(self) -> None:
+        if self.max_delay:
+            await asyncio.sleep(self.max_delay)
+        while self._pending:
+            batch, self._pending = self._pending[:self.max_rows], self._pending[self.max_rows:]
+            try:
+                async with self.session_factory() as db:
+                    await db.execute(insert(self.model), [row for row, _ in batch])
+                    await db.commit()
+            except Exception as e:
+                self.errors += 1
+                logger.error(f"Batched write of {len(batch)} {self.model.__tablename__} rows failed: {e}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                continue
+            self.rows_written += len(batch)
+            self.batches += 1
+            for _, future in batch:
+                if not future.done():
+                    future.set_result(None)
+
+    async def close(self) -> None:
+        """Wait for queued rows to be written. Called from the FastAPI lifespan."""
+        if self._writer is not None:
+            await self._writer
+        self._writer = None
+
+    def stats(self) -> dict:
+        return {
+            "rows": self.rows_written,
+            "batches": self.batches,
+            "rows_per_batch": round(self.rows_written / self.batches, 2) if self.batches else 0.0,
+            "errors": self.errors,
+        }
+
+
+paper_view_writer = WriteBatcher(PaperView)
@@ -0,0 +1,12 @@
+"""
+Shared test setup. db.session reads DATABASE_URL once, at import, so it is
+pointed at a throwaway SQLite file here, before any test module imports
+the app.
+"""
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+os.environ["DATABASE_URL"] = f"sqlite:///{os.path.join(tempfile.mkdtemp(prefix='synapse-tests-'), 'synapse.db')}"
@@ -0,0 +1,40 @@
+"""
+arXiv-backed routes answer with the right status when arXiv fails or finds
+nothing, instead of a blanket 500. Run from the backend directory:
+
+    python -m pytest tests/test_arxiv_errors.py
+"""
+import httpx
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from api.routers import research
+
+
+@pytest.fixture
+def client():
+    with TestClient(main.app) as client:
+        yield client
+
+
+async def _arxiv_down(*args, **kwargs):
+    raise httpx.ConnectError("connection refused")
+
+
+async def _nothing(*args, **kwargs):
+    return None
+
+
+def test_random_paper_statuses(client, monkeypatch):
+    monkeypatch.setattr(research, "get_random_paper", _nothing)
+    assert client.get("/random").status_code == 404
+
+    monkeypatch.setattr(research, "get_random_paper", _arxiv_down)
+    assert client.get("/random").status_code == 502
+
+
+def test_search_maps_arxiv_failures_to_502(client, monkeypatch):
+    monkeypatch.setattr(research, "search_arxiv", _arxiv_down)
+    response = client.get("/search", params={"query": "arxiv down"})
+    assert response.status_code == 502
@@ -0,0 +1,63 @@
+"""
+Keyset pagination over chat sessions whose updated_at was written by
+SQLite's CURRENT_TIMESTAMP (second precision) before the app set it itself.
+Run from the backend directory:
+
+    python -m pytest tests/test_chat_pagination.py
+"""
+import asyncio
+
+from alembic import command
+from alembic.config import Config
+from sqlalchemy import create_engine, text
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+
+from db.migrate import ALEMBIC_INI, upgrade_database
+from db.session import make_engine
+from db.models import ChatSession, User
+from api.routers.chat import get_sessions
+
+
+def _seed_legacy_sessions(url: str) -> None:
+    engine = create_engine(url)
+    with engine.begin() as connection:
+        config = Config(ALEMBIC_INI)
+        config.attributes["connection"] = connection
+        command.upgrade(config, "0007")
+        connection.execute(text("INSERT INTO users (id, email) VALUES (1, 'legacy@example.com')"))
+        # Same second, server-side format: the case that used to repeat forever
+        for session_id in (1, 2, 3):
+            connection.execute(text(
+                "INSERT INTO chat_sessions (id, user_id, title, updated_at) "
+                "VALUES (:id, 1, 'legacy', '2026-01-02 03:04:05')"
+            ), {"id": session_id})
+    with engine.begin() as connection:
+        upgrade_database(connection)
+    engine.dispose()
+
+
+async def _page_through(url: str) -> list:
+    engine = make_engine(url.replace("sqlite:", "sqlite+aiosqlite:"))
+    sessions = async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    try:
+        async with sessions() as db:
+            user = await db.get(User, 1)
+            db.add(ChatSession(user_id=1, title="new"))
+            await db.commit()
+
+            seen, cursor = [], None
+            for _ in range(10):
+                page = await get_sessions(limit=1, cursor=cursor, db=db, current_user=user)
+                seen.extend(session.id for session in page["items"])
+                cursor = page["next_cursor"]
+                if cursor is None:
+                    break
+            return seen
+    finally:
+        await engine.dispose()
+
+
+def test_legacy_sessions_page_without_repeats(tmp_path):
+    url = f"sqlite:///{tmp_path / 'synapse.db'}"
+    _seed_legacy_sessions(url)
+    assert asyncio.run(_page_through(url)) == [4, 3, 2, 1]
@@ -0,0 +1,57 @@
+"""
+Collection listing: pages of a user's collections with per-collection item
+counts, where each count reads only that collection's index range instead
+of aggregating every row in collection_items. Run from the backend directory:
+
+    python -m pytest tests/test_collection_listing.py
+"""
+import sqlite3
+
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+import main
+from db.session import engine
+
+DB_PATH = engine.url.database
+
+
+def _user(client: TestClient, email: str, item_counts: list) -> dict:
+    token = client.post("/auth/signup", json={"email": email, "password": "pw"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    for number, count in enumerate(item_counts):
+        collection = client.post("/collections/", json={"name": f"list {number}"}, headers=headers).json()["id"]
+        for item in range(count):
+            client.post(f"/collections/{collection}/items", json={
+                "paper_id": f"listing-{number}-{item}", "paper_title": "Listing note"
+            }, headers=headers)
+    return headers
+
+
+def test_pages_carry_each_collections_own_count():
+    statements = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        statements.append((statement, tuple(parameters or ())))
+
+    with TestClient(main.app) as client:
+        _user(client, "other-lister@example.com", [4])
+        headers = _user(client, "lister@example.com", [2, 0, 3])
+
+        event.listen(engine.sync_engine, "before_cursor_execute", record)
+        try:
+            first = client.get("/collections/", params={"limit": 2}, headers=headers).json()
+            second = client.get("/collections/", params={"limit": 2, "cursor": first["next_cursor"]}, headers=headers).json()
+        finally:
+            event.remove(engine.sync_engine, "before_cursor_execute", record)
+
+    pages = [[(c["name"], c["item_count"]) for c in page["items"]] for page in (first, second)]
+    assert pages == [[("list 0", 2), ("list 1", 0)], [("list 2", 3)]]
+    assert second["next_cursor"] is None
+
+    statement, parameters = next((s, p) for s, p in statements if "count(collection_items.id)" in s)
+    with sqlite3.connect(DB_PATH) as connection:
+        plan = [row[3] for row in connection.execute("EXPLAIN QUERY PLAN " + statement, parameters)]
+    assert any(step.startswith("CORRELATED SCALAR SUBQUERY") for step in plan), plan
+    assert any(step.startswith("SEARCH collection_items") for step in plan), plan
+    assert not any(step.startswith("SCAN collection_items") for step in plan), plan
@@ -0,0 +1,79 @@
+"""
+Client-supplied paper metadata stays with the collection item that carried
+it: papers arXiv knows always show arXiv's title, and for the rest each
+user sees only their own values. Run from the backend directory:
+
+    python -m pytest tests/test_collection_metadata.py
+"""
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from services import paper_service
+
+ARXIV = {
+    "2401.00001": {"id": "http://arxiv.org/abs/2401.00001v1", "title": "Real title", "summary": "real abstract",
+                   "authors": ["A. Author"], "published": "2024-01-01T00:00:00Z", "pdf_url": None},
+}
+
+
+@pytest.fixture
+def client(monkeypatch):
+    async def fake_fetch(arxiv_ids):
+        return [ARXIV[arxiv_id] for arxiv_id in arxiv_ids if arxiv_id in ARXIV]
+
+    monkeypatch.setattr(paper_service, "fetch_arxiv_papers", fake_fetch)
+    with TestClient(main.app) as client:
+        yield client
+
+
+def _user(client: TestClient, email: str) -> tuple:
+    token = client.post("/auth/signup", json={"email": email, "password": "pw"}).json()["access_token"]
+    headers = {"Authorization": f"Bearer {token}"}
+    collection = client.post("/collections/", json={"name": "reading"}, headers=headers).json()["id"]
+    return headers, collection
+
+
+def _titles(client: TestClient, headers: dict, collection: int) -> dict:
+    items = client.get(f"/collections/{collection}", headers=headers).json()["items"]
+    return {item["paper_id"]: item["paper_title"] for item in items}
+
+
+def test_client_metadata_stays_on_the_item(client):
+    alice, alice_reading = _user(client, "alice-meta@example.com")
+    bob, bob_reading = _user(client, "bob-meta@example.com")
+
+    # arXiv knows this one: the client's title is ignored
+    response = client.post(f"/collections/{alice_reading}/items", json={
+        "paper_id": "2401.00001", "paper_title": "Spoofed", "paper_summary": "spoofed"
+    }, headers=alice)
+    assert response.status_code == 200, response.text
+    assert response.json()["paper_title"] == "Real title"
+
+    # arXiv doesn't: each user keeps their own metadata
+    client.post(f"/collections/{alice_reading}/items", json={"paper_id": "my-notes", "paper_title": "Alice's"}, headers=alice)
+    client.post("/collections/batch", json={"operations": [
+        {"action": "add", "paper_id": "my-notes", "collection_id": bob_reading, "paper_title": "Bob's"},
+        {"action": "add", "paper_id": "2401.00001", "collection_id": bob_reading, "paper_title": "Spoofed again"},
+    ]}, headers=bob)
+
+    assert _titles(client, alice, alice_reading) == {"2401.00001": "Real title", "my-notes": "Alice's"}
+    assert _titles(client, bob, bob_reading) == {"my-notes": "Bob's", "2401.00001": "Real title"}
+    assert client.get("/library/search", params={"q": "Bob"}, headers=alice).json() == []
+
+    # Without metadata an unknown id is still not found
+    response = client.post(f"/collections/{alice_reading}/items", json={"paper_id": "bobs-other"}, headers=alice)
+    assert response.status_code == 404
+
+
+def test_moves_keep_item_metadata(client):
+    headers, reading = _user(client, "mover-meta@example.com")
+    archive = client.post("/collections/", json={"name": "archive"}, headers=headers).json()["id"]
+    client.post(f"/collections/{reading}/items", json={"paper_id": "lecture-notes", "paper_title": "Notes"}, headers=headers)
+
+    response = client.post("/collections/batch", json={"operations": [
+        {"action": "move", "paper_id": "lecture-notes", "collection_id": reading, "target_collection_id": archive},
+    ]}, headers=headers)
+    assert response.json()["results"][0]["status"] == "moved"
+    assert _titles(client, headers, archive) == {"lecture-notes": "Notes"}
+    assert [hit["parent_id"] for hit in client.get("/library/search", params={"q": "notes"}, headers=headers).json()] == [archive]
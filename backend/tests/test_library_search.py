@@ -0,0 +1,29 @@
+"""
+Library search paging: limit is clamped like every other list endpoint and
+a negative offset is refused. Run from the backend directory:
+
+    python -m pytest tests/test_library_search.py
+"""
+from fastapi.testclient import TestClient
+
+import main
+
+
+def test_limit_is_clamped_and_negative_offset_refused():
+    with TestClient(main.app) as client:
+        token = client.post("/auth/signup", json={"email": "pager@example.com", "password": "pw"}).json()["access_token"]
+        headers = {"Authorization": f"Bearer {token}"}
+        collection = client.post("/collections/", json={"name": "notes"}, headers=headers).json()["id"]
+        for number in range(3):
+            client.post(f"/collections/{collection}/items", json={
+                "paper_id": f"pager-{number}", "paper_title": f"Pager note {number}"
+            }, headers=headers)
+
+        def search(**params):
+            return client.get("/library/search", params={"q": "pager", **params}, headers=headers)
+
+        assert len(search().json()) == 3
+        # limit=-1 used to reach SQLite as LIMIT -1, i.e. no limit at all
+        assert len(search(limit=-1).json()) == 1
+        assert len(search(limit=2, offset=2).json()) == 1
+        assert search(offset=-1).status_code == 400
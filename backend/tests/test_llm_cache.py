@@ -0,0 +1,50 @@
+"""
+LLM response cache expiry: fresh answers are served, expired ones are
+misses and get evicted on the next write. Run from the backend directory:
+
+    python -m pytest tests/test_llm_cache.py
+"""
+import asyncio
+import datetime
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import select, update
+
+import main
+from db.models import LLMResponseCache, utcnow
+from db.session import SessionLocal
+from services.llm_cache import LLMResponseStore
+
+
+@pytest.fixture(autouse=True)
+def database():
+    # Startup runs the migrations
+    with TestClient(main.app):
+        yield
+
+
+def test_fresh_answers_hit_and_expired_ones_miss():
+    async def scenario():
+        store = LLMResponseStore(ttl=60, max_entries=100)
+        await store.set("summarize", "fresh", "model", "cached answer")
+        await store.set("summarize", "stale", "model", "old answer")
+        async with SessionLocal() as db:
+            await db.execute(
+                update(LLMResponseCache)
+                .where(LLMResponseCache.cache_key == "stale")
+                .values(expires_at=utcnow() - datetime.timedelta(seconds=1))
+            )
+            await db.commit()
+            results = (await store.get(db, "summarize", "fresh"), await store.get(db, "summarize", "stale"))
+
+        # The next write evicts the expired row
+        await store.set("summarize", "other", "model", "answer")
+        async with SessionLocal() as db:
+            keys = set(await db.scalars(select(LLMResponseCache.cache_key)))
+        return results, keys, store.stats()["summarize"]
+
+    results, keys, stats = asyncio.run(scenario())
+    assert results == ("cached answer", None)
+    assert "stale" not in keys and {"fresh", "other"} <= keys
+    assert (stats["hits"], stats["misses"]) == (1, 1)
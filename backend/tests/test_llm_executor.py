@@ -0,0 +1,108 @@
+"""
+LLMExecutor accounting: callers that go away cancel queued calls outright,
+running ones are counted as abandoned until their thread returns, and
+submissions past the queue bound are refused. Run from the backend directory:
+
+    python -m pytest tests/test_llm_executor.py
+"""
+import asyncio
+import threading
+import time
+
+import pytest
+from fastapi import HTTPException
+
+from services.llm_executor import LLMExecutor
+
+
+def _wait_for(predicate, timeout: float = 2.0) -> None:
+    # Done callbacks run on the worker thread, just after the result is set
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline, "timed out waiting for the executor"
+        time.sleep(0.005)
+
+
+@pytest.fixture
+def executor():
+    executor = LLMExecutor(max_workers=1, max_queue=1)
+    yield executor
+    executor.shutdown()
+
+
+def test_completed_calls_are_counted(executor):
+    assert asyncio.run(executor.run(lambda x: x * 2, 21)) == 42
+    _wait_for(lambda: executor.pending == 0)
+    assert executor.stats()["completed"] == 1
+
+
+def test_cancelling_a_queued_call_cancels_it(executor):
+    release = threading.Event()
+
+    async def scenario():
+        running = asyncio.create_task(executor.run(release.wait))
+        queued = asyncio.create_task(executor.run(lambda: "never"))
+        await asyncio.sleep(0.05)
+        queued.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await queued
+        release.set()
+        return await running
+
+    assert asyncio.run(scenario()) is True
+    _wait_for(lambda: executor.pending == 0)
+    stats = executor.stats()
+    assert (stats["cancelled"], stats["abandoned"], stats["completed"]) == (1, 0, 1)
+
+
+def test_cancelling_a_running_call_abandons_it(executor):
+    release = threading.Event()
+
+    async def scenario():
+        task = asyncio.create_task(executor.run(release.wait))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(scenario())
+    stats = executor.stats()
+    # The thread can't be interrupted: it stays busy and is tracked until it returns
+    assert (stats["abandoned"], stats["abandoned_running"], stats["pending"]) == (1, 1, 1)
+
+    time.sleep(0.02)
+    release.set()
+    _wait_for(lambda: executor.abandoned_running == 0)
+    _wait_for(lambda: executor.pending == 0)
+    stats = executor.stats()
+    assert (stats["abandoned"], stats["cancelled"], stats["completed"]) == (1, 0, 1)
+    assert stats["abandoned_seconds"] >= 0.02
+
+
+def test_submissions_past_the_queue_are_refused(executor):
+    release = threading.Event()
+    running = executor.start(release.wait)
+    queued = executor.start(lambda: None)
+
+    with pytest.raises(HTTPException) as refused:
+        executor.start(lambda: None)
+    assert refused.value.status_code == 503
+    assert refused.value.headers["Retry-After"]
+    assert executor.stats()["rejected"] == 1
+
+    release.set()
+    running.result(timeout=2)
+    queued.result(timeout=2)
+
+
+def test_shutdown_cancels_queued_calls(executor):
+    release = threading.Event()
+    running = executor.start(release.wait)
+    queued = executor.start(lambda: None)
+
+    executor.shutdown()
+    assert queued.cancelled()
+    release.set()
+    running.result(timeout=2)
+    _wait_for(lambda: executor.pending == 0)
+    assert (executor.cancelled, executor.completed) == (1, 1)
@@ -0,0 +1,128 @@
+"""
+Migration tests: a database built by the original create_all (before
+migrations existed) and a fresh one must both end up at the current models,
+with saved collection items carried over into `papers`. Run from the
+backend directory:
+
+    python -m pytest tests/test_migrations.py
+"""
+from alembic.autogenerate import compare_metadata
+from alembic.runtime.migration import MigrationContext
+from sqlalchemy import create_engine, inspect, text
+
+from db.migrate import upgrade_database
+
+# What create_all produced from the original models (users .. paper_views)
+BASELINE_DDL = """
+CREATE TABLE users (
+    id INTEGER NOT NULL, email VARCHAR, hashed_password VARCHAR,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP, PRIMARY KEY (id)
+);
+CREATE UNIQUE INDEX ix_users_email ON users (email);
+CREATE INDEX ix_users_id ON users (id);
+CREATE TABLE profiles (
+    id INTEGER NOT NULL, user_id INTEGER, full_name VARCHAR, gemini_api_key VARCHAR,
+    profile_image VARCHAR, preferred_model VARCHAR, onboarding_data JSON,
+    PRIMARY KEY (id), UNIQUE (user_id), FOREIGN KEY(user_id) REFERENCES users (id)
+);
+CREATE INDEX ix_profiles_id ON profiles (id);
+CREATE TABLE prompt_templates (
+    id INTEGER NOT NULL, user_id INTEGER, name VARCHAR, type VARCHAR, content TEXT,
+    model VARCHAR, is_active BOOLEAN, created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id), FOREIGN KEY(user_id) REFERENCES users (id)
+);
+CREATE INDEX ix_prompt_templates_id ON prompt_templates (id);
+CREATE TABLE collections (
+    id INTEGER NOT NULL, user_id INTEGER, name VARCHAR, description VARCHAR,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id), FOREIGN KEY(user_id) REFERENCES users (id)
+);
+CREATE INDEX ix_collections_id ON collections (id);
+CREATE TABLE chat_sessions (
+    id INTEGER NOT NULL, user_id INTEGER, title VARCHAR,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP, updated_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id), FOREIGN KEY(user_id) REFERENCES users (id)
+);
+CREATE INDEX ix_chat_sessions_id ON chat_sessions (id);
+CREATE TABLE paper_views (
+    id INTEGER NOT NULL, user_id INTEGER, paper_id VARCHAR,
+    viewed_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id), FOREIGN KEY(user_id) REFERENCES users (id)
+);
+CREATE INDEX ix_paper_views_id ON paper_views (id);
+CREATE TABLE collection_items (
+    id INTEGER NOT NULL, collection_id INTEGER, paper_id VARCHAR, paper_title VARCHAR,
+    paper_summary TEXT, added_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id), FOREIGN KEY(collection_id) REFERENCES collections (id)
+);
+CREATE INDEX ix_collection_items_id ON collection_items (id);
+CREATE TABLE chat_messages (
+    id INTEGER NOT NULL, session_id INTEGER, role VARCHAR, content TEXT,
+    created_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+    PRIMARY KEY (id), FOREIGN KEY(session_id) REFERENCES chat_sessions (id)
+);
+CREATE INDEX ix_chat_messages_id ON chat_messages (id);
+"""
+
+BASELINE_ROWS = """
+INSERT INTO users (id, email, hashed_password) VALUES (1, 'old@example.com', 'x');
+INSERT INTO collections (id, user_id, name) VALUES (1, 1, 'reading');
+INSERT INTO collection_items (id, collection_id, paper_id, paper_title, paper_summary) VALUES
+    (1, 1, 'http://arxiv.org/abs/2310.00001v1', 'Old title', 'old abstract'),
+    (2, 1, 'http://arxiv.org/abs/2310.00001v2', 'New title', 'new abstract'),
+    (3, 1, 'hep-th/9901001', 'Strings', 'abstract');
+INSERT INTO paper_views (id, user_id, paper_id) VALUES (1, 1, 'http://arxiv.org/abs/2310.00001v2');
+INSERT INTO chat_sessions (id, user_id, title) VALUES (1, 1, 'old chat');
+"""
+
+
+def _engine(tmp_path):
+    return create_engine(f"sqlite:///{tmp_path / 'synapse.db'}")
+
+
+def _schema_diff(connection) -> list:
+    from db.session import Base
+    from db import models  # noqa: F401
+
+    diff = compare_metadata(MigrationContext.configure(connection), Base.metadata)
+    # alembic_version is alembic's own bookkeeping
+    return [change for change in diff if not (change[0] == "remove_table" and change[1].name == "alembic_version")]
+
+
+def test_fresh_database_matches_models(tmp_path):
+    with _engine(tmp_path).begin() as connection:
+        upgrade_database(connection)
+        assert _schema_diff(connection) == []
+
+
+def test_baseline_database_is_upgraded_in_place(tmp_path):
+    engine = _engine(tmp_path)
+    with engine.begin() as connection:
+        for statement in (BASELINE_DDL + BASELINE_ROWS).split(";"):
+            if statement.strip():
+                connection.execute(text(statement))
+
+    with engine.begin() as connection:
+        upgrade_database(connection)
+
+    with engine.connect() as connection:
+        assert _schema_diff(connection) == []
+        assert "paper_title" not in {column["name"] for column in inspect(connection).get_columns("collection_items")}
+
+        # Saved metadata came from clients, so it stays on the items and the
+        # shared rows are placeholders until arXiv fills them
+        papers = connection.execute(text("SELECT arxiv_id, version, title, summary FROM papers ORDER BY arxiv_id")).all()
+        assert [tuple(row) for row in papers] == [
+            ("2310.00001", 2, None, None),
+            ("hep-th/9901001", 1, None, None),
+        ]
+        # Both versions of 2310.00001 collapse into the first saved item
+        items = connection.execute(text(
+            "SELECT id, paper_id, title_override, summary_override FROM collection_items ORDER BY id"
+        )).all()
+        assert [tuple(row) for row in items] == [
+            (1, "2310.00001", "New title", "new abstract"),
+            (3, "hep-th/9901001", "Strings", "abstract"),
+        ]
+        assert connection.execute(text("SELECT paper_id FROM paper_views")).scalar() == "2310.00001"
+        assert connection.execute(text("SELECT summary_until_id FROM chat_sessions")).scalar() == 0
@@ -0,0 +1,50 @@
+"""
+PDF disk cache keys: arXiv URLs key on the paper id, anything else on a
+hash, so arbitrary URL text never ends up in a file name. Run from the
+backend directory:
+
+    python -m pytest tests/test_pdf_cache.py
+"""
+import asyncio
+
+import pytest
+
+from services import pdf_cache
+
+
+@pytest.mark.parametrize("url, key", [
+    ("https://arxiv.org/pdf/2310.12345v2", "arxiv-2310.12345v2"),
+    ("http://export.arxiv.org/abs/hep-th/9901001v1", "arxiv-hep-th_9901001v1"),
+])
+def test_versioned_arxiv_urls_key_on_the_id(url, key):
+    assert pdf_cache.cache_key_for_url(url) == key
+
+
+@pytest.mark.parametrize("url", [
+    "https://arxiv.org/pdf/" + "a" * 1000,
+    "https://arxiv.org/pdf/../../etc/passwd",
+    "https://example.com/mirror/arxiv.org/2310.12345v2.pdf",
+])
+def test_other_urls_are_hashed(monkeypatch, url):
+    monkeypatch.setattr(pdf_cache, "PDF_CACHE_UNVERSIONED_TTL_SECONDS", 0)
+    key = pdf_cache.cache_key_for_url(url)
+    assert key.startswith("url-") and len(key) == 68
+
+
+def test_index_evicts_least_recently_used_without_rescanning(tmp_path, monkeypatch):
+    (tmp_path / "old.pdf").write_bytes(b"x" * 40)
+    cache = pdf_cache.PDFDiskCache(str(tmp_path), max_bytes=100)
+
+    async def scenario():
+        await cache.put_pdf("a", b"a" * 40)
+        assert await cache.get_pdf("old") == b"x" * 40
+        # The directory was indexed once; writes only consult the index
+        monkeypatch.setattr(pdf_cache.os, "scandir", None)
+        await cache.put_pages("b", ["page"] * 5)
+
+    asyncio.run(scenario())
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["b.pages.json", "old.pdf"]
+    stats = cache.stats()
+    assert (stats["evictions"], stats["files"]) == (1, 2)
+    assert stats["bytes"] == 40 + len(b'["page", "page", "page", "page", "page"]')
+    assert cache.pdf_path("old") == str(tmp_path / "old.pdf") and cache.pdf_path("a") is None
@@ -0,0 +1,93 @@
+"""
+PDF extraction coalescing: concurrent requests for one PDF share a single
+download and a single parse, even when each stops after a few characters.
+Run from the backend directory:
+
+    python -m pytest tests/test_pdf_extraction.py
+"""
+import asyncio
+
+import httpx
+import pytest
+
+from services import pdf_service
+from services.pdf_cache import PDFDiskCache
+
+PDF_URL = "https://arxiv.org/pdf/2401.00001v1"
+
+
+def _make_pdf(page_count: int) -> bytes:
+    objects = ["<< /Type /Catalog /Pages 2 0 R >>",
+               f"<< /Type /Pages /Kids [{' '.join(f'{3 + 2 * i} 0 R' for i in range(page_count))}] /Count {page_count} >>"]
+    font = 3 + 2 * page_count
+    for i in range(page_count):
+        stream = f"BT /F1 12 Tf 50 700 Td (Page {i + 1} text) Tj ET\n"
+        objects.append(f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents {4 + 2 * i} 0 R "
+                       f"/Resources << /Font << /F1 {font} 0 R >> >> >>")
+        objects.append(f"<< /Length {len(stream)} >>\nstream\n{stream}endstream")
+    objects.append("<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>")
+    out, offsets = "%PDF-1.4\n", []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += f"{number} 0 obj\n{body}\nendobj\n"
+    xref = len(out)
+    out += f"xref\n0 {len(objects) + 1}\n0000000000 65535 f \n" + "".join(f"{offset:010d} 00000 n \n" for offset in offsets)
+    out += f"trailer\n<< /Size {len(objects) + 1} /Root 1 0 R >>\nstartxref\n{xref}\n%%EOF\n"
+    return out.encode("latin-1")
+
+
+@pytest.fixture
+def counters(tmp_path, monkeypatch):
+    counts = {"downloads": 0, "parses": 0}
+    content = _make_pdf(12)
+
+    async def serve(request):
+        counts["downloads"] += 1
+        await asyncio.sleep(0.05)
+        return httpx.Response(200, content=content)
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(serve))
+    monkeypatch.setattr(pdf_service, "get_http_client", lambda: client)
+    monkeypatch.setattr(pdf_service, "pdf_cache", PDFDiskCache(str(tmp_path)))
+
+    iter_uncached_pages = pdf_service._iter_uncached_pages
+
+    def counting(*args):
+        counts["parses"] += 1
+        return iter_uncached_pages(*args)
+
+    monkeypatch.setattr(pdf_service, "_iter_uncached_pages", counting)
+    yield counts
+    pdf_service.shutdown_pdf_executor()
+
+
+def test_concurrent_requests_share_one_download_and_parse(counters):
+    async def scenario():
+        texts = await asyncio.gather(
+            *(pdf_service.extract_text_from_pdf(PDF_URL, max_chars=10) for _ in range(4)),
+            pdf_service.extract_text_from_pdf(PDF_URL, pages=[10]),
+        )
+        # The truncated callers left; the shared parse still finishes and caches
+        await asyncio.gather(*pdf_service._background)
+        return texts, await pdf_service.pdf_cache.get_pages(pdf_service.cache_key_for_url(PDF_URL))
+
+    texts, cached = asyncio.run(scenario())
+    assert texts[:4] == ["Page 1 tex"] * 4
+    assert texts[4].strip() == "Page 11 text"
+    assert len(cached) == 12
+    assert counters == {"downloads": 1, "parses": 1}
+    assert not pdf_service._extractions
+
+
+def test_slots_are_held_per_batch_not_per_job(counters):
+    async def scenario():
+        content = await pdf_service._get_pdf_content(PDF_URL, "job")
+        slots = pdf_service._get_slots()
+        free = slots._value
+        held = []
+        async for _ in pdf_service._iter_uncached_pages(content, "job", None):
+            # Between batches the job keeps no worker slot
+            held.append(free - slots._value)
+        return held
+
+    assert asyncio.run(scenario()) == [0] * 12
@@ -0,0 +1,164 @@
+"""
+EXPLAIN QUERY PLAN regression test.
+
+Drives the routers against a fresh, migrated SQLite database, records every
+statement they send, and fails if SQLite would answer any of them with a
+full table scan, including an unconstrained scan of the FTS5 library index.
+Run from the backend directory:
+
+    python -m pytest tests/test_query_plans.py
+"""
+import re
+import sqlite3
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import event
+
+import main
+from db.session import engine
+from api.routers import chat as chat_router
+
+# The throwaway database conftest.py points DATABASE_URL at
+DB_PATH = engine.url.database
+
+# App tables only; alembic_version and sqlite_master housekeeping is ignored
+APP_TABLES = re.compile(
+    r"\b(users|profiles|prompt_templates|collections|collection_items|papers|"
+    r"chat_sessions|chat_messages|paper_views|llm_response_cache|refresh_tokens|library_fts)\b"
+)
+# "SCAN t" / "SCAN t USING INDEX ..." walk the whole table (or index).
+# Subquery results and constant rows have their own planners.
+TABLE_SCAN = re.compile(r"^SCAN (?!\(|CONSTANT ROW)(\w+)\b(?! VIRTUAL TABLE)")
+# FTS5 always reports "SCAN t VIRTUAL TABLE INDEX n:<plan>"; an empty plan
+# means no MATCH or rowid constraint, i.e. every row is read
+VIRTUAL_SCAN = re.compile(r"^SCAN (\w+) VIRTUAL TABLE INDEX \d+:$")
+
+
+@pytest.fixture(scope="module")
+def statements():
+    captured = []
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        if executemany:
+            parameters = parameters[0] if parameters else ()
+        captured.append((statement, tuple(parameters or ())))
+
+    async def fake_gemini_response(message, *args, **kwargs):
+        return f"echo: {message}"
+
+    original = chat_router.get_gemini_response
+    chat_router.get_gemini_response = fake_gemini_response
+    try:
+        with TestClient(main.app) as client:
+            event.listen(engine.sync_engine, "before_cursor_execute", record)
+            try:
+                _exercise_routers(client)
+            finally:
+                event.remove(engine.sync_engine, "before_cursor_execute", record)
+    finally:
+        chat_router.get_gemini_response = original
+    return captured
+
+
+def _ok(response, status: int = None):
+    """Fail on an unexpected status, so every plan comes from a real code path."""
+    request = response.request
+    if status is None:
+        assert response.is_success, f"{request.method} {request.url}: {response.status_code} {response.text}"
+    else:
+        assert response.status_code == status, f"{request.method} {request.url}: {response.status_code} {response.text}"
+    return response
+
+
+def _exercise_routers(client: TestClient) -> None:
+    _ok(client.post("/auth/signup", json={"email": "plans@example.com", "password": "pw"}))
+    tokens = _ok(client.post("/auth/login", data={"username": "plans@example.com", "password": "pw"})).json()
+    tokens = _ok(client.post("/auth/refresh", json={"refresh_token": tokens["refresh_token"]})).json()
+    headers = {"Authorization": f"Bearer {tokens['access_token']}"}
+
+    # Profile and prompt templates
+    _ok(client.get("/user/me", headers=headers))
+    _ok(client.patch("/user/profile", json={"full_name": "Plan Checker"}, headers=headers))
+    _ok(client.post("/user/api-key", params={"api_key": "test-key"}, headers=headers))
+    prompt = _ok(client.post("/user/prompts", json={"name": "p", "type": "chat", "content": "be brief"}, headers=headers)).json()
+    _ok(client.put(f"/user/prompts/{prompt['id']}", json={"is_active": True}, headers=headers))
+    _ok(client.get("/user/prompts", headers=headers))
+
+    # Papers the app already knows, so nothing goes to arXiv
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        conn.executemany(
+            "INSERT INTO papers (arxiv_id, version, title, summary, authors, published) VALUES (?, 1, ?, ?, '[]', '2023-10-01')",
+            [(f"2310.0000{i}", f"Paper {i}", f"abstract {i}") for i in (1, 2, 3)],
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+    # Collections, single and batch writes; ids arXiv can't resolve keep
+    # their client metadata on the item
+    first = _ok(client.post("/collections/", json={"name": "first"}, headers=headers)).json()["id"]
+    second = _ok(client.post("/collections/", json={"name": "second"}, headers=headers)).json()["id"]
+    _ok(client.post(f"/collections/{first}/items", json={"paper_id": "2310.00001", "paper_title": "A", "paper_summary": "a"}, headers=headers))
+    _ok(client.post(f"/collections/{first}/items", json={"paper_id": "2310.00001", "paper_title": "A"}, headers=headers), 400)
+    _ok(client.post(f"/collections/{first}/items", json={"paper_id": "local-note", "paper_title": "N"}, headers=headers))
+    _ok(client.post("/collections/batch", json={"operations": [
+        {"action": "add", "paper_id": "2310.00002", "collection_id": first, "paper_title": "B"},
+        {"action": "add", "paper_id": "local-batch", "collection_id": first, "paper_title": "L"},
+        {"action": "add", "paper_id": "2310.00003", "collection_id": first, "paper_title": "C"},
+        {"action": "move", "paper_id": "2310.00002", "collection_id": first, "target_collection_id": second},
+        {"action": "remove", "paper_id": "2310.00003", "collection_id": first},
+    ]}, headers=headers))
+    page = _ok(client.get("/collections/", params={"limit": 1}, headers=headers)).json()
+    _ok(client.get("/collections/", params={"limit": 1, "cursor": page["next_cursor"]}, headers=headers))
+    _ok(client.get(f"/collections/{first}", params={"include_summary": False}, headers=headers))
+    items = _ok(client.get(f"/collections/{first}/items", params={"limit": 1}, headers=headers)).json()
+    if items["next_cursor"]:
+        _ok(client.get(f"/collections/{first}/items", params={"cursor": items["next_cursor"]}, headers=headers))
+    _ok(client.delete(f"/collections/{first}/items/2310.00001", headers=headers))
+    _ok(client.delete(f"/collections/{second}", headers=headers))
+
+    # Papers (local store only) and recently viewed
+    _ok(client.post("/papers/views", json={"paper_id": "2310.00002"}, headers=headers))
+    _ok(client.get("/papers/recent", headers=headers))
+    _ok(client.get("/papers/2310.00002"))
+
+    # Chat sessions and messages
+    session = _ok(client.post("/chat/sessions", json={"title": "plans"}, headers=headers)).json()["id"]
+    for i in range(3):
+        _ok(client.post(f"/chat/sessions/{session}/message", json={"message": f"question {i}"}, headers=headers))
+    sessions = _ok(client.get("/chat/sessions", params={"limit": 1}, headers=headers)).json()
+    if sessions["next_cursor"]:
+        _ok(client.get("/chat/sessions", params={"cursor": sessions["next_cursor"]}, headers=headers))
+    _ok(client.get(f"/chat/sessions/{session}", headers=headers))
+    messages = _ok(client.get(f"/chat/sessions/{session}/messages", params={"limit": 2}, headers=headers)).json()
+    _ok(client.get(f"/chat/sessions/{session}/messages", params={"cursor": messages["next_cursor"]}, headers=headers))
+
+    # Library search, then teardown paths
+    assert _ok(client.get("/library/search", params={"q": "question"}, headers=headers)).json()
+    _ok(client.delete(f"/chat/sessions/{session}", headers=headers))
+    _ok(client.post("/auth/logout", json={"refresh_token": tokens["refresh_token"], "everywhere": True}))
+
+
+def _query_plan(conn: sqlite3.Connection, statement: str, parameters: tuple) -> list:
+    return [row[3] for row in conn.execute(f"EXPLAIN QUERY PLAN {statement}", parameters)]
+
+
+def test_router_queries_use_indexes(statements):
+    conn = sqlite3.connect(DB_PATH)
+    checked, scans = 0, []
+    try:
+        for statement, parameters in statements:
+            verb = statement.lstrip().split(None, 1)[0].upper()
+            if verb not in ("SELECT", "UPDATE", "DELETE") or not APP_TABLES.search(statement):
+                continue
+            checked += 1
+            for detail in _query_plan(conn, statement, parameters):
+                if TABLE_SCAN.match(detail) or VIRTUAL_SCAN.match(detail):
+                    scans.append(f"{detail}\n    {' '.join(statement.split())}")
+    finally:
+        conn.close()
+
+    assert checked > 30, f"only {checked} statements were checked; did the routers run?"
+    assert not scans, "full table scans:\n" + "\n".join(sorted(set(scans)))
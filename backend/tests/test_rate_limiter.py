@@ -0,0 +1,188 @@
+"""
+Gemini rate limiter: token buckets, the fair per-key queue and upstream
+backoff hints. Run from the backend directory:
+
+    python -m pytest tests/test_rate_limiter.py
+"""
+import asyncio
+import time
+
+import pytest
+from fastapi import HTTPException
+from google.api_core import exceptions as google_exceptions
+
+from services import gemini_service
+from services.rate_limiter import FairLimiter, GeminiRateLimiter, RateLimitExceeded, TokenBucket
+
+
+def _limiter(rate: float = 0, max_concurrent: int = 1, max_queue: int = 16, max_queue_per_user: int = 16, queue_timeout: float = 5) -> FairLimiter:
+    return FairLimiter(TokenBucket(rate, 1), max_concurrent, max_queue, max_queue_per_user, queue_timeout)
+
+
+async def _enqueue(limiter: FairLimiter, user_ids: list, granted: list) -> list:
+    async def call(user_id):
+        await limiter.acquire(user_id)
+        granted.append(user_id)
+        limiter.release()
+
+    tasks = [asyncio.create_task(call(user_id)) for user_id in user_ids]
+    # Let every task reach the queue before anything is released
+    await asyncio.sleep(0)
+    return tasks
+
+
+def test_bucket_refuses_when_empty_and_refills():
+    bucket = TokenBucket(rate=20, capacity=2)
+    assert bucket.try_acquire() == 0
+    assert bucket.try_acquire() == 0
+    wait = bucket.try_acquire()
+    assert 0 < wait <= 0.05
+    time.sleep(wait)
+    assert bucket.try_acquire() == 0
+
+
+def test_waiting_users_are_served_round_robin():
+    async def scenario():
+        limiter = _limiter()
+        await limiter.acquire("holder")
+        granted = []
+        tasks = await _enqueue(limiter, ["a", "a", "a", "b", "b", "c"], granted)
+        assert limiter.queued == 6
+        limiter.release()
+        await asyncio.gather(*tasks)
+        return granted, limiter
+
+    granted, limiter = asyncio.run(scenario())
+    assert granted == ["a", "b", "c", "a", "b", "a"]
+    assert limiter.idle()
+
+
+def test_full_queue_is_refused():
+    async def scenario():
+        limiter = _limiter(max_queue=2, max_queue_per_user=1)
+        await limiter.acquire("holder")
+        tasks = await _enqueue(limiter, ["a", "b"], [])
+        with pytest.raises(RateLimitExceeded) as total:
+            await limiter.acquire("c")
+        limiter.max_queue = 16
+        with pytest.raises(RateLimitExceeded) as per_user:
+            await limiter.acquire("a")
+        limiter.release()
+        await asyncio.gather(*tasks)
+        return total.value, per_user.value
+
+    total, per_user = asyncio.run(scenario())
+    assert total.scope == per_user.scope == "key"
+    response = gemini_service._too_many_requests(total)
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
+
+
+def test_queue_timeout_is_refused_and_leaves_the_queue():
+    async def scenario():
+        limiter = _limiter(queue_timeout=0.05)
+        await limiter.acquire("holder")
+        started = time.monotonic()
+        with pytest.raises(RateLimitExceeded):
+            await limiter.acquire("a")
+        return time.monotonic() - started, limiter
+
+    waited, limiter = asyncio.run(scenario())
+    assert waited >= 0.05
+    assert limiter.queued == 0 and limiter.in_flight == 1
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    async def scenario():
+        limiter = _limiter()
+        await limiter.acquire("holder")
+        task = asyncio.create_task(limiter.acquire("a"))
+        await asyncio.sleep(0)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+        limiter.release()
+        return limiter
+
+    assert asyncio.run(asyncio.wait_for(scenario(), 1)).idle()
+
+
+def test_paused_bucket_holds_the_queue_until_the_deadline():
+    async def scenario():
+        limiter = _limiter(rate=100)
+        limiter.bucket.pause(0.1)
+        started = time.monotonic()
+        await limiter.acquire("a")
+        limiter.release()
+        return time.monotonic() - started
+
+    assert asyncio.run(scenario()) >= 0.09
+
+
+@pytest.mark.parametrize("rate", [1, 0])
+def test_upstream_retry_hint_pauses_the_key(monkeypatch, rate):
+    limiter = GeminiRateLimiter()
+    monkeypatch.setattr(gemini_service, "gemini_limiter", limiter)
+    monkeypatch.setattr("services.rate_limiter.GEMINI_KEY_RPM", rate * 60)
+
+    error = gemini_service._upstream_rate_limited(
+        google_exceptions.ResourceExhausted("Quota exceeded. Please retry in 7.5s."), "key"
+    )
+
+    assert error.retry_after == 7.5
+    # Holds even when local rate limiting is switched off
+    assert 7 < limiter._key_limiter("key").bucket.wait_time() <= 7.5
+    assert limiter._key_limiter("other").bucket.wait_time() == 0
+    assert limiter.stats()["upstream_backoffs"] == 1
+
+
+def test_stream_is_refused_up_front_when_the_key_queue_is_full(monkeypatch):
+    limiter = GeminiRateLimiter()
+    monkeypatch.setattr(gemini_service, "gemini_limiter", limiter)
+    monkeypatch.setattr("services.rate_limiter.GEMINI_KEY_MAX_CONCURRENT", 1)
+    monkeypatch.setattr("services.rate_limiter.GEMINI_QUEUE_MAX", 0)
+
+    async def scenario():
+        release = await limiter.acquire("key", "holder")
+        try:
+            gemini_service.stream_gemini_response("hi", api_key="key", user_id=1)
+        finally:
+            release()
+
+    # Raised before any StreamingResponse exists, so the caller sees a real 429
+    with pytest.raises(HTTPException) as refused:
+        asyncio.run(scenario())
+    assert refused.value.status_code == 429
+    assert refused.value.headers["Retry-After"]
+    assert limiter.stats()["rejected_key"] == 1
+
+
+class _Chunk:
+    def __init__(self, text):
+        self.text = text
+
+
+class _StreamingChat:
+    def send_message(self, message, stream, request_options):
+        return iter([_Chunk("one"), _Chunk("two"), _Chunk("three")])
+
+
+def test_stream_frees_its_slot_when_the_upstream_call_ends(monkeypatch):
+    limiter = GeminiRateLimiter()
+    monkeypatch.setattr(gemini_service, "gemini_limiter", limiter)
+
+    async def scenario():
+        stream = gemini_service._stream_chat(_StreamingChat(), "hi", "key", 1)
+        first = await stream.__anext__()
+        # The reader is still on the first chunk; the call itself is over
+        for _ in range(100):
+            if limiter.stats()["in_flight"] == 0:
+                break
+            await asyncio.sleep(0.01)
+        in_flight = limiter.stats()["in_flight"]
+        rest = [chunk async for chunk in stream]
+        return [first, *rest], in_flight, limiter.stats()["in_flight"]
+
+    chunks, while_reading, after = asyncio.run(scenario())
+    assert chunks == ["one", "two", "three"]
+    assert (while_reading, after) == (0, 0)
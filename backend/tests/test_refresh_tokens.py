@@ -0,0 +1,77 @@
+"""
+Refresh-token rotation through the auth routes: each refresh hands out a new
+pair and retires the old token, replaying a retired token revokes its whole
+family, and expired tokens are refused. Run from the backend directory:
+
+    python -m pytest tests/test_refresh_tokens.py
+"""
+import sqlite3
+
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+from db.session import engine
+from utils.security import hash_refresh_token
+
+DB_PATH = engine.url.database
+
+
+@pytest.fixture
+def client():
+    with TestClient(main.app) as client:
+        yield client
+
+
+def _login(client: TestClient, email: str) -> dict:
+    client.post("/auth/signup", json={"email": email, "password": "pw"})
+    response = client.post("/auth/login", data={"username": email, "password": "pw"})
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def _refresh(client: TestClient, token: str):
+    return client.post("/auth/refresh", json={"refresh_token": token})
+
+
+def test_refresh_rotates_the_token(client):
+    first = _login(client, "rotate@example.com")
+
+    response = _refresh(client, first["refresh_token"])
+    assert response.status_code == 200, response.text
+    second = response.json()
+    assert second["refresh_token"] != first["refresh_token"]
+    me = client.get("/user/me", headers={"Authorization": f"Bearer {second['access_token']}"})
+    assert me.status_code == 200
+    assert me.json()["email"] == "rotate@example.com"
+
+    # The new token rotates in turn
+    assert _refresh(client, second["refresh_token"]).status_code == 200
+
+
+def test_replayed_token_revokes_the_family(client):
+    stolen = _login(client, "replay@example.com")["refresh_token"]
+    current = _refresh(client, stolen).json()["refresh_token"]
+
+    # Reusing the rotated token means it leaked: it fails, and so does the
+    # legitimate holder's current token from the same family
+    assert _refresh(client, stolen).status_code == 401
+    assert _refresh(client, current).status_code == 401
+
+    # A fresh login starts a new family and is unaffected
+    assert _refresh(client, _login(client, "replay@example.com")["refresh_token"]).status_code == 200
+
+
+def test_expired_token_is_refused(client):
+    token = _login(client, "expired@example.com")["refresh_token"]
+    conn = sqlite3.connect(DB_PATH)
+    try:
+        conn.execute(
+            "UPDATE refresh_tokens SET expires_at = '2000-01-01 00:00:00.000000' WHERE token_hash = ?",
+            (hash_refresh_token(token),),
+        )
+        conn.commit()
+    finally:
+        conn.close()
+
+    assert _refresh(client, token).status_code == 401
@@ -0,0 +1,72 @@
+"""
+ResultCache request coalescing: concurrent misses share one fetch, and
+cancelling whichever caller runs it doesn't fail the others. Run from the
+backend directory:
+
+    python -m pytest tests/test_result_cache.py
+"""
+import asyncio
+
+import pytest
+
+from services.cache_service import MemoryCacheBackend, ResultCache
+
+
+def _counting_factory(calls: list):
+    async def factory():
+        calls.append(None)
+        await asyncio.sleep(0.05)
+        return f"value {len(calls)}"
+    return factory
+
+
+def test_concurrent_misses_share_one_fetch():
+    async def scenario():
+        cache = ResultCache(MemoryCacheBackend(16), ttl=60)
+        calls = []
+        results = await asyncio.gather(*(cache.get_or_set("k", _counting_factory(calls)) for _ in range(5)))
+        return results, calls, cache.stats()
+
+    results, calls, stats = asyncio.run(scenario())
+    assert results == ["value 1"] * 5
+    assert len(calls) == 1
+    assert (stats["misses"], stats["coalesced"]) == (1, 4)
+
+
+def test_waiters_survive_the_leader_being_cancelled():
+    async def scenario():
+        cache = ResultCache(MemoryCacheBackend(16), ttl=60)
+        calls = []
+        factory = _counting_factory(calls)
+        leader = asyncio.create_task(cache.get_or_set("k", factory))
+        await asyncio.sleep(0.01)
+        waiters = [asyncio.create_task(cache.get_or_set("k", factory)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await asyncio.gather(*waiters), calls, await cache.get("k")
+
+    results, calls, cached = asyncio.run(scenario())
+    # One waiter took over the fill and the rest coalesced onto it
+    assert results == ["value 2"] * 3
+    assert len(calls) == 2
+    assert cached == "value 2"
+
+
+def test_cancelled_waiter_leaves_the_fetch_running():
+    async def scenario():
+        cache = ResultCache(MemoryCacheBackend(16), ttl=60)
+        calls = []
+        leader = asyncio.create_task(cache.get_or_set("k", _counting_factory(calls)))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(cache.get_or_set("k", _counting_factory(calls)))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await waiter
+        return await leader, calls
+
+    result, calls = asyncio.run(scenario())
+    assert result == "value 1"
+    assert len(calls) == 1
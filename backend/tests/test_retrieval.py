@@ -0,0 +1,35 @@
+"""
+Paper retrieval for chat turns: only valid arXiv ids are indexed, each
+once, and at most RAG_MAX_PAPERS of them. Run from the backend directory:
+
+    python -m pytest tests/test_retrieval.py
+"""
+import asyncio
+
+import numpy as np
+from pydantic import ValidationError
+import pytest
+
+from api.routers.chat import MessageCreate
+from services import retrieval_service
+
+
+def test_only_valid_ids_are_indexed_once(monkeypatch):
+    indexed = []
+
+    async def fake_index(arxiv_id):
+        indexed.append(arxiv_id)
+        return np.zeros((0, retrieval_service.RAG_EMBEDDING_DIM), dtype=np.float32), []
+
+    monkeypatch.setattr(retrieval_service, "ensure_paper_index", fake_index)
+    monkeypatch.setattr(retrieval_service, "RAG_MAX_PAPERS", 2)
+    paper_ids = ["../../etc/passwd", "2401.00001v2", "2401.00001", "not an id", "hep-th/9901001", "2401.00002"]
+
+    asyncio.run(retrieval_service.build_context("question", paper_ids=paper_ids))
+    assert indexed == ["2401.00001", "hep-th/9901001"]
+
+
+def test_message_paper_ids_are_capped():
+    MessageCreate(message="hi", paper_ids=["2401.00001"] * retrieval_service.RAG_MAX_PAPERS)
+    with pytest.raises(ValidationError):
+        MessageCreate(message="hi", paper_ids=["2401.00001"] * (retrieval_service.RAG_MAX_PAPERS + 1))
@@ -0,0 +1,42 @@
+import os
+import asyncio
+import logging
+from typing import Awaitable, TypeVar
+
+from dotenv import load_dotenv
+from fastapi import HTTPException, Request
+
+load_dotenv()
+
+logger = logging.getLogger(__name__)
+
+DISCONNECT_POLL_SECONDS = float(os.getenv("DISCONNECT_POLL_SECONDS", "0.5"))
+
+# nginx's "client closed request"; never reaches the client, but shows up in logs and metrics
+CLIENT_CLOSED_REQUEST = 499
+
+T = TypeVar("T")
+
+
+async def cancel_on_disconnect(request: Request, awaitable: Awaitable[T], poll_interval: float = DISCONNECT_POLL_SECONDS) -> T:
+    """
+    Await `awaitable`, cancelling it if the client disconnects first.
+
+    Starlette only notices disconnects for streaming responses; plain
+    handlers run to completion for nobody. Use this around expensive
+    upstream calls (LLM generations) so a closed tab frees its slot.
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll_interval)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                logger.info(f"Client disconnected from {request.url.path}; cancelling upstream call")
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+                raise HTTPException(status_code=CLIENT_CLOSED_REQUEST, detail="Client closed request")
+    except asyncio.CancelledError:
+        task.cancel()
+        raise
@@ -0,0 +1,40 @@
+import json
+import base64
+import datetime
+from typing import Any, Generic, List, Optional, TypeVar
+from fastapi import HTTPException
+from pydantic import BaseModel
+
+T = TypeVar("T")
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+class Page(BaseModel, Generic[T]):
+    items: List[T]
+    next_cursor: Optional[str] = None
+
+
+def clamp_limit(limit: int) -> int:
+    return max(1, min(limit, MAX_PAGE_SIZE))
+
+
+def encode_cursor(*values: Any) -> str:
+    """Opaque keyset cursor: the sort-key values of the last row on a page."""
+    payload = [v.isoformat() if isinstance(v, datetime.datetime) else v for v in values]
+    return base64.urlsafe_b64encode(json.dumps(payload).encode("utf-8")).decode("ascii")
+
+
+def decode_cursor(cursor: str, *types: type) -> list:
+    """Decode a cursor back into typed values (datetime/int/str) or raise 400."""
+    try:
+        raw = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+        if len(raw) != len(types):
+            raise ValueError("cursor arity")
+        return [
+            datetime.datetime.fromisoformat(value) if kind is datetime.datetime else kind(value)
+            for kind, value in zip(types, raw)
+        ]
+    except (ValueError, TypeError, json.JSONDecodeError, UnicodeError):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
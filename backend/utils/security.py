@@ -1,26 +1,125 @@
+import os
+import secrets
+import hashlib
 from datetime import datetime, timedelta
-from typing import Optional
-from jose import jwt
+from typing import Dict, Optional, Tuple
+from dotenv import load_dotenv
+from jose import JWTError, jwt
 from passlib.context import CryptContext
 
-SECRET_KEY = "your-secret-key-keep-it-secret" # In production, use env var
-ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 30
+load_dotenv()
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-keep-it-secret")
+ALGORITHM = os.getenv("JWT_ALGORITHM", "HS256")
+# "kid:secret,kid:secret". The first key signs, every listed key verifies, so a
+# key is rotated by prepending its replacement and dropping it once old tokens expire
+JWT_SIGNING_KEYS = os.getenv("JWT_SIGNING_KEYS", "")
+ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", "30"))
+REFRESH_TOKEN_EXPIRE_DAYS = int(os.getenv("REFRESH_TOKEN_EXPIRE_DAYS", "30"))
+
+TOKEN_TYPE_ACCESS = "access"
+
+# bcrypt work factor (log2 of iterations); each +1 doubles the cost of a hash
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+# Pinning min/max to the default makes hashes at any other cost "need update",
+# so changing BCRYPT_ROUNDS migrates users on their next login
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__default_rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
 
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
 
+def verify_and_update_password(plain_password, hashed_password) -> Tuple[bool, Optional[str]]:
+    """Verify, and return a replacement hash when the stored one uses an outdated cost."""
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
 def get_password_hash(password):
     return pwd_context.hash(password)
 
-def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
-    to_encode = data.copy()
-    if expires_delta:
-        expire = datetime.utcnow() + expires_delta
-    else:
-        expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
-    to_encode.update({"exp": expire})
-    encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
-    return encoded_jwt
+class TokenSigner:
+    """
+    Signs JWTs with the active key and verifies them against any known key.
+
+    Every token carries its key id in the `kid` header; tokens without one
+    predate key ids and are checked against `fallback_kid`.
+    """
+
+    def __init__(self, keys: Dict[str, str], active_kid: str, algorithm: str = ALGORITHM, fallback_kid: Optional[str] = None):
+        if active_kid not in keys:
+            raise ValueError(f"Active signing key {active_kid!r} is not configured")
+        self.keys = keys
+        self.active_kid = active_kid
+        self.algorithm = algorithm
+        self.fallback_kid = fallback_kid or active_kid
+
+    def encode(self, claims: dict) -> str:
+        return jwt.encode(claims, self.keys[self.active_kid], algorithm=self.algorithm, headers={"kid": self.active_kid})
+
+    def decode(self, token: str) -> dict:
+        """Verified claims; raises JWTError for bad signatures, unknown keys and expired tokens."""
+        kid = jwt.get_unverified_header(token).get("kid") or self.fallback_kid
+        key = self.keys.get(kid)
+        if key is None:
+            raise JWTError(f"Unknown signing key {kid!r}")
+        return jwt.decode(token, key, algorithms=[self.algorithm])
+
+
+def _parse_signing_keys(spec: str) -> Tuple[Dict[str, str], str]:
+    keys = {}
+    for entry in spec.split(","):
+        kid, sep, secret = entry.strip().partition(":")
+        if sep and kid and secret:
+            keys[kid] = secret
+    if not keys:
+        return {"default": SECRET_KEY}, "default"
+    return keys, next(iter(keys))
+
+
+token_signer = TokenSigner(*_parse_signing_keys(JWT_SIGNING_KEYS))
+
+
+def create_access_token(user, expires_delta: Optional[timedelta] = None) -> str:
+    """
+    Short-lived access token for `user` (with its profile loaded).
+
+    `sub` is the user id, so the server resolves identity by primary key. The
+    profile claims are for clients to render without a round trip; the server
+    keeps reading config from the database, as claims go stale until refresh.
+    """
+    profile = user.profile
+    now = datetime.utcnow()
+    claims = {
+        "sub": str(user.id),
+        "type": TOKEN_TYPE_ACCESS,
+        "email": user.email,
+        "name": profile.full_name if profile else None,
+        "model": profile.preferred_model if profile else None,
+        "api_key_set": bool(profile and profile.gemini_api_key),
+        "iat": now,
+        "exp": now + (expires_delta or timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)),
+    }
+    return token_signer.encode(claims)
+
+
+def decode_access_token(token: str) -> dict:
+    claims = token_signer.decode(token)
+    if claims.get("type") != TOKEN_TYPE_ACCESS:
+        raise JWTError("Not an access token")
+    return claims
+
+
+def new_refresh_token() -> Tuple[str, str]:
+    """Returns (token, token_hash); only the hash is stored."""
+    token = secrets.token_urlsafe(32)
+    return token, hash_refresh_token(token)
+
+
+def hash_refresh_token(token: str) -> str:
+    # Tokens are 256 random bits, so a fast unsalted hash is enough to keep a DB leak useless
+    return hashlib.sha256(token.encode("utf-8")).hexdigest()
@@ -0,0 +1,66 @@
+import json
+import logging
+from typing import AsyncIterator, Awaitable, Callable, Optional
+from fastapi import HTTPException
+from fastapi.responses import StreamingResponse
+
+logger = logging.getLogger(__name__)
+
+
+def format_sse(data: dict, event: Optional[str] = None) -> str:
+    """Encode one Server-Sent Event."""
+    message = f"data: {json.dumps(data)}\n\n"
+    if event:
+        message = f"event: {event}\n" + message
+    return message
+
+
+async def _sse_events(chunks: AsyncIterator[str], on_complete: Optional[Callable[[str], Awaitable[None]]]):
+    parts = []
+    try:
+        async for text in chunks:
+            parts.append(text)
+            yield format_sse({"text": text})
+    except HTTPException as e:
+        error = {"status": e.status_code, "detail": e.detail}
+        # Headers can't change once streaming started, so backoff hints travel in the event
+        if e.headers and "Retry-After" in e.headers:
+            error["retry_after"] = int(e.headers["Retry-After"])
+        yield format_sse(error, event="error")
+        return
+    except Exception as e:
+        logger.error(f"Stream error: {str(e)}")
+        yield format_sse({"status": 500, "detail": str(e)}, event="error")
+        return
+
+    full_text = "".join(parts)
+    if on_complete:
+        try:
+            await on_complete(full_text)
+        except Exception as e:
+            logger.error(f"Failed to finalize stream: {str(e)}")
+            yield format_sse({"status": 500, "detail": "Failed to save the response"}, event="error")
+            return
+    yield format_sse({"text": full_text}, event="done")
+
+
+def sse_response(chunks: AsyncIterator[str], on_complete: Optional[Callable[[str], Awaitable[None]]] = None) -> StreamingResponse:
+    """
+    Stream text chunks as `data:` events, then a final `done` event carrying
+    the full text (or an `error` event). `on_complete` is awaited with the full
+    text once the stream finishes successfully, e.g. to persist it.
+    """
+    return StreamingResponse(
+        _sse_events(chunks, on_complete),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+async def _single(text: str):
+    yield text
+
+
+def sse_text_response(text: str) -> StreamingResponse:
+    """SSE response for an answer that is already complete (e.g. a cache hit)."""
+    return sse_response(_single(text))